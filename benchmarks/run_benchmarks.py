@@ -0,0 +1,290 @@
+import argparse
+import json
+import os
+import platform
+import resource
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict
+from typing import Dict, List, Optional
+from urllib.parse import urlparse
+
+from benchmarks.stub_server import StubConfig, StubState, start_stub_servers
+
+REPO_ROOT: str = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR: str = os.path.join(REPO_ROOT, "benchmarks", "results")
+MB: int = 1024 * 1024
+
+
+def peak_rss_mb() -> float:
+    """进程的峰值常驻内存（Linux下ru_maxrss单位为KB，macOS下为字节）"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / MB if sys.platform == "darwin" else peak / 1024
+
+
+def summarize(seconds: List[float]) -> Dict[str, float]:
+    """把一组耗时汇总为毫秒统计"""
+    ordered = sorted(seconds)
+    return {
+        "count": len(ordered),
+        "mean_ms": round(statistics.mean(ordered) * 1000, 2),
+        "p50_ms": round(ordered[len(ordered) // 2] * 1000, 2),
+        "p95_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000, 2),
+        "max_ms": round(ordered[-1] * 1000, 2),
+        "total_s": round(sum(ordered), 3),
+    }
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+# ------------------- 各项基准 -------------------
+def bench_scan(repos: int, max_versions: int) -> Dict:
+    """逐仓库获取Releases的延迟：冷缓存一次、条件请求缓存命中（304）一次"""
+    from model import github
+
+    result = {}
+    for phase in ("cold", "warm"):
+        per_repo = {}
+        for index in range(repos):
+            owner, name = f"owner{index}", f"repo{index}"
+            started = time.perf_counter()
+            github.fetch_repo_releases(owner, name, max_versions)
+            per_repo[f"{owner}/{name}"] = time.perf_counter() - started
+        result[phase] = summarize(list(per_repo.values()))
+        result[phase]["per_repo_ms"] = {key: round(value * 1000, 2) for key, value in per_repo.items()}
+    result["cache"] = github.API_CACHE.report()
+    return result
+
+
+def _timed_download(url: str, save_path: str, segments: int, size: int) -> Dict:
+    from model.download import download_resumable
+
+    started = time.perf_counter()
+    download_resumable(url, save_path, segments=segments, expected_size=size, show_progress=False)
+    elapsed = time.perf_counter() - started
+    os.remove(save_path)
+    return {"seconds": round(elapsed, 3), "mb_per_s": round(size / MB / elapsed, 2)}
+
+
+def bench_download(cdn_url: str, work_dir: str, size: int, streams: int, state: StubState,
+                   failure_rate: float) -> Dict:
+    """下载吞吐：单连接、单文件多连接分段、多文件并发、注入故障后的单连接"""
+    url = lambda name: f"{cdn_url}/cdn/{size}/{name}"
+    result = {
+        "file_mb": round(size / MB, 2),
+        "single_stream": _timed_download(url("single.bin"), os.path.join(work_dir, "single.bin"), 1, size),
+        "segmented": _timed_download(url("segmented.bin"), os.path.join(work_dir, "segmented.bin"), streams, size),
+    }
+    result["segmented"]["segments"] = streams
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=streams) as pool:
+        list(pool.map(lambda index: _timed_download(url(f"parallel-{index}.bin"),
+                                                    os.path.join(work_dir, f"parallel-{index}.bin"), 1, size),
+                      range(streams)))
+    elapsed = time.perf_counter() - started
+    result["parallel_files"] = {"files": streams, "seconds": round(elapsed, 3),
+                                "mb_per_s": round(size * streams / MB / elapsed, 2)}
+
+    if failure_rate:
+        state.config.failure_rate = failure_rate
+        failures_before = state.injected_failures
+        try:
+            result["with_failures"] = _timed_download(url("flaky.bin"), os.path.join(work_dir, "flaky.bin"), 1, size)
+        finally:
+            state.config.failure_rate = 0.0
+        result["with_failures"]["failure_rate"] = failure_rate
+        result["with_failures"]["injected_failures"] = state.injected_failures - failures_before
+    return result
+
+
+def bench_jetbrains(api_url: str) -> Dict:
+    """JetBrains releases 接口的探测耗时"""
+    from model import pycharm
+
+    pycharm.RELEASES_API_URL = f"{api_url}/products/releases"
+    started = time.perf_counter()
+    versions = pycharm.get_jetbrains_versions(["PCP", "IIU", "GO"], 2)
+    return {"seconds": round(time.perf_counter() - started, 4), "files": len(versions)}
+
+
+def bench_state(work_dir: str, assets: int) -> Dict:
+    """状态库：逐条写入、重放加载、压缩与压缩后加载的耗时，与旧版整体JSON对比"""
+    from model.state_store import StateStore
+
+    journal = os.path.join(work_dir, "state_bench.jsonl")
+    started = time.perf_counter()
+    store = StateStore(journal)
+    for asset_id in range(assets):
+        store.mark_downloaded(f"repo{asset_id % 50}", asset_id, f"asset-{asset_id}.zip")
+    store.close()
+    write_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    store = StateStore(journal)
+    load_seconds = time.perf_counter() - started
+    started = time.perf_counter()
+    store.compact()
+    compact_seconds = time.perf_counter() - started
+    store.close()
+    started = time.perf_counter()
+    StateStore(journal).close()
+    load_compacted_seconds = time.perf_counter() - started
+
+    legacy = {}
+    for asset_id in range(assets):
+        legacy.setdefault(f"repo{asset_id % 50}", {})[str(asset_id)] = f"asset-{asset_id}.zip"
+    legacy_path = os.path.join(work_dir, "state_bench.json")
+    started = time.perf_counter()
+    with open(legacy_path, "w", encoding="utf-8") as f:
+        json.dump(legacy, f, ensure_ascii=False, indent=2)
+    legacy_save_seconds = time.perf_counter() - started
+    started = time.perf_counter()
+    with open(legacy_path, "r", encoding="utf-8") as f:
+        json.load(f)
+    legacy_load_seconds = time.perf_counter() - started
+
+    return {
+        "assets": assets,
+        "journal_write_s": round(write_seconds, 4),
+        "journal_write_per_asset_ms": round(write_seconds / assets * 1000, 4),
+        "journal_load_s": round(load_seconds, 4),
+        "compact_s": round(compact_seconds, 4),
+        "compacted_load_s": round(load_compacted_seconds, 4),
+        "legacy_json_full_save_s": round(legacy_save_seconds, 4),
+        "legacy_json_load_s": round(legacy_load_seconds, 4),
+    }
+
+
+# ------------------- 运行与对比 -------------------
+def run(args: argparse.Namespace) -> Dict:
+    config = StubConfig(
+        latency_ms=args.latency_ms,
+        bandwidth_bps=int(args.bandwidth_mbps * MB) if args.bandwidth_mbps else None,
+        rate_limit=args.rate_limit,
+        repos=args.repos,
+        asset_size=int(args.file_mb * MB),
+    )
+    api_server, cdn_server = start_stub_servers(config)
+
+    # 模块在导入时读取 GITHUB_API_URL 并用相对路径创建缓存/存储目录，因此先设置环境并切换到临时工作目录
+    os.environ["GITHUB_API_URL"] = api_server.url
+    os.environ.pop("GITHUB_TOKEN", None)
+    work_dir = tempfile.mkdtemp(prefix="monitoring-bench-")
+    os.chdir(work_dir)
+    from model import request_scheduler
+
+    # 模拟的API主机沿用 api.github.com 的限速配置，使扫描延迟反映真实调度
+    api_host = urlparse(api_server.url).netloc
+    request_scheduler.HOST_RATES[api_host] = request_scheduler.HOST_RATES["api.github.com"]
+
+    results = {"rss_mb": {}}
+    print("🚀 基准测试开始（工作目录：%s）" % work_dir)
+    results["scan"] = bench_scan(args.repos, args.max_versions)
+    results["rss_mb"]["after_scan"] = round(peak_rss_mb(), 1)
+    print(f"  - 扫描：冷 p50 {results['scan']['cold']['p50_ms']}ms，热 p50 {results['scan']['warm']['p50_ms']}ms")
+
+    results["jetbrains"] = bench_jetbrains(api_server.url)
+    print(f"  - JetBrains 探测：{results['jetbrains']['seconds'] * 1000:.1f}ms")
+
+    results["download"] = bench_download(cdn_server.url, work_dir, config.asset_size, args.streams,
+                                         api_server.state, args.failure_rate)
+    results["rss_mb"]["after_download"] = round(peak_rss_mb(), 1)
+    download = results["download"]
+    print(f"  - 下载：单连接 {download['single_stream']['mb_per_s']}MB/s，"
+          f"分段 {download['segmented']['mb_per_s']}MB/s，并发 {download['parallel_files']['mb_per_s']}MB/s")
+
+    results["state"] = bench_state(work_dir, args.state_assets)
+    results["rss_mb"]["after_state"] = round(peak_rss_mb(), 1)
+    print(f"  - 状态库（{args.state_assets} 条）：写入 {results['state']['journal_write_s']}s，"
+          f"加载 {results['state']['journal_load_s']}s")
+
+    from model import http_client
+    os.chdir(REPO_ROOT)
+    shutil.rmtree(work_dir, ignore_errors=True)
+    return {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "stub": asdict(config),
+            "failure_rate": args.failure_rate,
+            "streams": args.streams,
+            "scheduler": http_client.SCHEDULER.report(),
+            "stub_requests": api_server.state.requests,
+        },
+        "results": results,
+    }
+
+
+def _flatten(data, prefix: str = "") -> Dict[str, float]:
+    flat = {}
+    for key, value in data.items():
+        path = f"{prefix}{key}"
+        if isinstance(value, dict):
+            if key != "per_repo_ms":
+                flat.update(_flatten(value, path + "."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[path] = value
+    return flat
+
+
+def compare(old_path: str, new_path: str) -> None:
+    """对比两次基准结果中的数值指标"""
+    with open(old_path, "r", encoding="utf-8") as f:
+        old = json.load(f)
+    with open(new_path, "r", encoding="utf-8") as f:
+        new = json.load(f)
+    old_flat, new_flat = _flatten(old["results"]), _flatten(new["results"])
+    print(f"📊 {old['meta']['commit']} -> {new['meta']['commit']}")
+    for key in sorted(old_flat.keys() & new_flat.keys()):
+        before, after = old_flat[key], new_flat[key]
+        change = f"{(after - before) / before * 100:+.1f}%" if before else "n/a"
+        print(f"  {key:<50} {before:>12} -> {after:<12} {change}")
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="使用本地模拟的 GitHub/JetBrains/CDN 服务运行基准测试")
+    parser.add_argument("--repos", type=int, default=20, help="扫描的仓库数量")
+    parser.add_argument("--max-versions", type=int, default=5, help="每个仓库获取的版本数量")
+    parser.add_argument("--file-mb", type=float, default=64, help="下载测试的文件大小（MB）")
+    parser.add_argument("--streams", type=int, default=4, help="分段下载的连接数 / 并发下载的文件数")
+    parser.add_argument("--latency-ms", type=float, default=20, help="每个请求的模拟延迟")
+    parser.add_argument("--bandwidth-mbps", type=float, default=50, help="单个连接的带宽上限（MB/s，0表示不限速）")
+    parser.add_argument("--rate-limit", type=int, default=5000, help="模拟API每分钟的请求额度")
+    parser.add_argument("--failure-rate", type=float, default=0.2, help="故障注入下载的失败概率（0表示跳过）")
+    parser.add_argument("--state-assets", type=int, default=10000, help="状态库基准的附件数量")
+    parser.add_argument("--quick", action="store_true", help="快速模式：缩小规模用于冒烟检查")
+    parser.add_argument("--output", help="结果JSON路径（默认 benchmarks/results/<时间>-<提交>.json）")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="对比两份结果JSON后退出")
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        compare(*args.compare)
+        return
+    if args.quick:
+        args.repos, args.file_mb, args.state_assets = 5, 8, 1000
+
+    output = os.path.abspath(args.output) if args.output else None  # run() 会切换工作目录，先解析为绝对路径
+    report = run(args)
+    output = output or os.path.join(RESULTS_DIR, f"{time.strftime('%Y%m%d-%H%M%S')}-{report['meta']['commit']}.json")
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"✅ 结果已保存：{output}")
+
+
+if __name__ == "__main__":
+    main()
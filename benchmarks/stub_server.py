@@ -0,0 +1,329 @@
+import base64
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+PATTERN_SIZE: int = 1024 * 1024  # 模拟文件内容由这段固定的伪随机字节循环构成
+WRITE_CHUNK: int = 64 * 1024  # 响应体每次写出的字节数（带宽限速的粒度）
+RANGE_PATTERN = re.compile(r"bytes=(\d+)-(\d*)$")
+RELEASES_PATH = re.compile(r"^/repos/([^/]+)/([^/]+)/releases$")
+README_PATH = re.compile(r"^/repos/([^/]+)/([^/]+)/readme$")
+CDN_PATH = re.compile(r"^/cdn/(\d+)/([^/]+)$")
+CHECKSUM_PATH = re.compile(r"^/checksum/(\d+)/([^/]+)$")
+
+
+@dataclass
+class StubConfig:
+    """
+    模拟服务的行为配置（运行中可直接修改，下一个请求生效）：
+    - latency_ms：每个请求的固定延迟
+    - bandwidth_bps：单个连接的带宽上限（None表示不限速）
+    - failure_rate：请求失败的概率（API返回503；文件下载随机返回503或传输一半时断开连接）
+    - rate_limit：每个窗口允许的API请求数（通过X-RateLimit-*头告知，用完后返回403）
+    """
+    latency_ms: float = 0.0
+    bandwidth_bps: Optional[int] = None
+    failure_rate: float = 0.0
+    rate_limit: int = 5000
+    rate_limit_window: float = 60.0
+    repos: int = 20
+    releases_per_repo: int = 10
+    assets_per_release: int = 4
+    asset_size: int = 1024 * 1024
+    seed: int = 0
+
+
+class StubState:
+    """模拟服务的共享状态：固定的文件内容、限流计数与请求统计"""
+
+    def __init__(self, config: StubConfig):
+        self.config = config
+        self.random = random.Random(config.seed)
+        self.pattern = random.Random(config.seed).randbytes(PATTERN_SIZE)
+        self.lock = threading.Lock()
+        self.window_start = time.time()
+        self.window_used = 0
+        self.requests = 0
+        self.injected_failures = 0
+        self._checksums: Dict[int, str] = {}
+
+    def content(self, start: int, end: int) -> bytes:
+        """返回模拟文件 [start, end] 区间的内容（所有文件内容相同，只与偏移有关）"""
+        chunks = []
+        position = start
+        while position <= end:
+            offset = position % PATTERN_SIZE
+            length = min(PATTERN_SIZE - offset, end - position + 1)
+            chunks.append(self.pattern[offset:offset + length])
+            position += length
+        return b"".join(chunks)
+
+    def checksum(self, size: int) -> str:
+        with self.lock:
+            if size not in self._checksums:
+                digest = hashlib.sha256()
+                for start in range(0, size, PATTERN_SIZE):
+                    digest.update(self.content(start, min(size, start + PATTERN_SIZE) - 1))
+                self._checksums[size] = digest.hexdigest()
+            return self._checksums[size]
+
+    def should_fail(self) -> bool:
+        with self.lock:
+            self.requests += 1
+            failed = self.random.random() < self.config.failure_rate
+            if failed:
+                self.injected_failures += 1
+            return failed
+
+    def take_rate_limit(self) -> Tuple[int, int]:
+        """消耗一次API额度，返回 (剩余额度, 重置时间戳)；额度用完时剩余额度为-1"""
+        with self.lock:
+            now = time.time()
+            if now - self.window_start >= self.config.rate_limit_window:
+                self.window_start, self.window_used = now, 0
+            reset_at = int(self.window_start + self.config.rate_limit_window)
+            if self.window_used >= self.config.rate_limit:
+                return -1, reset_at
+            self.window_used += 1
+            return self.config.rate_limit - self.window_used, reset_at
+
+
+def _repo_id(owner: str, name: str) -> int:
+    return int(hashlib.sha1(f"{owner}/{name}".encode()).hexdigest()[:6], 16)
+
+
+def build_releases(state: StubState, cdn_url: str, owner: str, name: str) -> List[Dict]:
+    """生成仓库的Releases（REST格式，最新的在前），附件指向模拟CDN"""
+    config = state.config
+    repo_id = _repo_id(owner, name)
+    releases = []
+    for index in range(config.releases_per_repo):
+        version = config.releases_per_repo - index
+        tag = f"v{version}.0.0"
+        release_id = repo_id * 1000 + version
+        assets = []
+        for asset_index in range(config.assets_per_release):
+            asset_name = f"{name}-{tag}-{asset_index}.bin"
+            assets.append({
+                "id": release_id * 100 + asset_index,
+                "name": asset_name,
+                "size": config.asset_size,
+                "content_type": "application/octet-stream",
+                "digest": f"sha256:{state.checksum(config.asset_size)}",
+                "browser_download_url": f"{cdn_url}/cdn/{config.asset_size}/{asset_name}",
+            })
+        releases.append({
+            "id": release_id,
+            "tag_name": tag,
+            "name": tag,
+            "draft": False,
+            "prerelease": False,
+            "published_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(1700000000 + version * 86400)),
+            "assets": assets,
+        })
+    return releases
+
+
+def build_jetbrains_releases(cdn_url: str, size: int, codes: List[str], latest: bool = False) -> Dict:
+    """生成 JetBrains products/releases 接口的响应（每个产品代码两个版本，每个版本两个平台；latest 时只返回最新版本）"""
+    response = {}
+    for code in codes:
+        releases = []
+        for minor in (2, 1):
+            build = f"25{minor}.1000.{minor}"
+            downloads = {}
+            for platform in ("linux", "windows"):
+                file_name = f"{code.lower()}-{build}-{platform}.bin"
+                downloads[platform] = {
+                    "link": f"{cdn_url}/cdn/{size}/{file_name}",
+                    "size": size,
+                    "checksumLink": f"{cdn_url}/checksum/{size}/{file_name}.sha256",
+                }
+            releases.append({"version": f"2025.{minor}", "build": build, "date": f"2025-0{minor}-01",
+                             "type": "release", "downloads": downloads})
+        response[code] = releases[:1] if latest else releases
+    return response
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """同时模拟 GitHub API、JetBrains 接口与支持Range请求的文件CDN"""
+
+    protocol_version = "HTTP/1.1"
+    server: "StubServer"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status: int, payload, extra_headers: Optional[Dict[str, str]] = None) -> None:
+        body = json.dumps(payload).encode("utf-8")
+        etag = '"%s"' % hashlib.sha1(body).hexdigest()
+        if status == 200 and self.headers.get("If-None-Match") == etag:
+            status, body = 304, b""
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        if status in (200, 304):
+            self.send_header("ETag", etag)
+        for key, value in (extra_headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_error(self, status: int, extra_headers: Optional[Dict[str, str]] = None) -> None:
+        self.send_response(status)
+        self.send_header("Content-Length", "0")
+        for key, value in (extra_headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+
+    def _write_throttled(self, start: int, end: int, drop_midway: bool) -> None:
+        state = self.server.state
+        bandwidth = state.config.bandwidth_bps
+        total = end - start + 1
+        stop_at = start + total // 2 if drop_midway else end + 1
+        position = start
+        while position < stop_at:
+            chunk_end = min(position + WRITE_CHUNK, stop_at) - 1
+            chunk = state.content(position, chunk_end)
+            started = time.monotonic()
+            self.wfile.write(chunk)
+            position = chunk_end + 1
+            if bandwidth:
+                time.sleep(max(0.0, len(chunk) / bandwidth - (time.monotonic() - started)))
+        if drop_midway:
+            self.close_connection = True
+            self.wfile.flush()
+            self.connection.shutdown(2)
+
+    def _serve_file(self, size: int, name: str) -> None:
+        state = self.server.state
+        etag = '"%d-%s"' % (size, hashlib.sha1(name.encode()).hexdigest()[:12])
+        drop_midway = False
+        if state.should_fail():
+            if state.random.random() < 0.5:
+                self._send_error(503, {"Retry-After": "0"})
+                return
+            drop_midway = True
+
+        start, end, status = 0, size - 1, 200
+        range_header = self.headers.get("Range")
+        if_range = self.headers.get("If-Range")
+        match = RANGE_PATTERN.match(range_header or "")
+        if match and (if_range is None or if_range == etag):
+            start = int(match.group(1))
+            end = min(int(match.group(2)) if match.group(2) else size - 1, size - 1)
+            if start >= size:
+                self._send_error(416, {"Content-Range": f"bytes */{size}"})
+                return
+            status = 206
+
+        self.send_response(status)
+        self.send_header("Content-Type", "application/octet-stream")
+        self.send_header("Content-Length", str(end - start + 1))
+        self.send_header("Accept-Ranges", "bytes")
+        self.send_header("ETag", etag)
+        self.send_header("Last-Modified", "Mon, 01 Jan 2024 00:00:00 GMT")
+        if status == 206:
+            self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+        self.end_headers()
+        if self.command != "HEAD":
+            self._write_throttled(start, end, drop_midway)
+
+    def _serve_api(self, path: str, query: Dict[str, List[str]]) -> None:
+        state = self.server.state
+        remaining, reset_at = state.take_rate_limit()
+        rate_headers = {
+            "X-RateLimit-Limit": str(state.config.rate_limit),
+            "X-RateLimit-Remaining": str(max(remaining, 0)),
+            "X-RateLimit-Reset": str(reset_at),
+        }
+        if remaining < 0:
+            self._send_json(403, {"message": "API rate limit exceeded"}, rate_headers)
+            return
+        if state.should_fail():
+            self._send_error(503, rate_headers)
+            return
+
+        match = RELEASES_PATH.match(path)
+        if match:
+            releases = build_releases(state, self.server.cdn_url, *match.groups())
+            per_page = int(query.get("per_page", ["30"])[0])
+            page = int(query.get("page", ["1"])[0])
+            self._send_json(200, releases[(page - 1) * per_page:page * per_page], rate_headers)
+            return
+        match = README_PATH.match(path)
+        if match:
+            owner, name = match.groups()
+            content = f"# {owner}/{name}\n\nStub README for benchmarks.\n".encode("utf-8")
+            self._send_json(200, {
+                "sha": hashlib.sha1(content).hexdigest(),
+                "encoding": "base64",
+                "content": base64.b64encode(content).decode("ascii"),
+                "download_url": f"{self.server.cdn_url}/raw/{owner}/{name}/README.md",
+            }, rate_headers)
+            return
+        if path == "/products/releases":
+            codes = query.get("code", ["PCP"])[0].split(",")
+            latest = query.get("latest", ["false"])[0] == "true"
+            self._send_json(200, build_jetbrains_releases(self.server.cdn_url, state.config.asset_size, codes, latest))
+            return
+        self._send_json(404, {"message": "Not Found"}, rate_headers)
+
+    def _handle(self) -> None:
+        state = self.server.state
+        if state.config.latency_ms:
+            time.sleep(state.config.latency_ms / 1000)
+        parsed = urlparse(self.path)
+        match = CDN_PATH.match(parsed.path)
+        if match:
+            self._serve_file(int(match.group(1)), match.group(2))
+            return
+        match = CHECKSUM_PATH.match(parsed.path)
+        if match:
+            body = f"{state.checksum(int(match.group(1)))} *{match.group(2)[:-len('.sha256')]}\n".encode()
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+        self._serve_api(parsed.path, parse_qs(parsed.query))
+
+    def do_GET(self):
+        self._handle()
+
+    def do_HEAD(self):
+        self._handle()
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, state: StubState, cdn_url: Optional[str] = None):
+        super().__init__(("127.0.0.1", 0), StubHandler)
+        self.state = state
+        self.cdn_url = cdn_url or self.url
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+
+def start_stub_servers(config: StubConfig) -> Tuple[StubServer, StubServer]:
+    """
+    启动两个共享状态的模拟服务（不同端口即不同主机，便于按主机限流）：
+    API服务模拟 api.github.com 与 JetBrains 接口，CDN服务提供文件下载
+    :return: (api_server, cdn_server)
+    """
+    state = StubState(config)
+    cdn_server = StubServer(state)
+    api_server = StubServer(state, cdn_url=cdn_server.url)
+    for server in (api_server, cdn_server):
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+    return api_server, cdn_server
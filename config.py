@@ -18,25 +18,3 @@ browser_headers_list = [
         "Upgrade-Insecure-Requests": "1"
     }
 ]
-
-everything_version_option_list = {
-    'x86.msi',
-    'x64.msi',
-    'x86.zip',
-    'x64.zip',
-    'x86-Setup.exe',
-    'x64-Setup.exe',
-    'x86.Lite-Setup.exe',
-    'x64.Lite-Setup.exe'
-}
-
-AnyTxt_version_option_list = {
-    'x86.msi',
-    'x64.msi',
-    'x86.zip',
-    'x64.zip',
-    'x86-Setup.exe',
-    'x64-Setup.exe',
-    'x86.Lite-Setup.exe',
-    'x64.Lite-Setup.exe'
-}
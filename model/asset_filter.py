@@ -0,0 +1,134 @@
+import fnmatch
+import re
+import threading
+from typing import Dict, List, Optional, Pattern, Tuple
+
+# 根据附件名识别操作系统/架构的规则（识别不出的附件不受 os/arch 筛选影响）
+OS_PATTERNS: Dict[str, Pattern] = {
+    "windows": re.compile(r"windows|(?<![a-z])win(32|64)?(?![a-z])|\.(exe|msi|msix|appx)$", re.IGNORECASE),
+    "macos": re.compile(r"(?<![a-z])mac(os)?(?![a-z])|osx|darwin|\.(dmg|pkg)$", re.IGNORECASE),
+    "linux": re.compile(r"linux|\.(deb|rpm|appimage|flatpak|snap)$", re.IGNORECASE),
+    "android": re.compile(r"android|\.apk$", re.IGNORECASE),
+}
+ARCH_PATTERNS: Dict[str, Pattern] = {
+    "x64": re.compile(r"x64|x86[_-]64|amd64|win64", re.IGNORECASE),
+    "x86": re.compile(r"x86(?![_-]?64)|i[36]86|win32|x86[_-]32", re.IGNORECASE),
+    "arm64": re.compile(r"arm64|aarch64", re.IGNORECASE),
+    "arm": re.compile(r"armv7|armhf|arm32|armeabi", re.IGNORECASE),
+}
+
+FILTER_FIELDS = {"include", "exclude", "os", "arch", "skip_prerelease", "skip_draft", "max_asset_size_mb"}
+
+
+def _compile_name_pattern(pattern: str) -> Pattern:
+    """以 "re:" 开头的按正则处理，否则按glob（不区分大小写）处理"""
+    if pattern.startswith("re:"):
+        return re.compile(pattern[3:], re.IGNORECASE)
+    return re.compile(fnmatch.translate(pattern), re.IGNORECASE)
+
+
+def _detect(name: str, patterns: Dict[str, Pattern]) -> List[str]:
+    return [label for label, pattern in patterns.items() if pattern.search(name)]
+
+
+class AssetFilter:
+    """
+    单个仓库的附件筛选规则（在下载任何字节之前评估）：
+    - include / exclude：附件名的glob或正则（"re:"前缀）
+    - os / arch：按附件名识别的系统与架构白名单
+    - skip_prerelease / skip_draft：跳过预发布与草稿版本
+    - max_asset_size_mb：单个附件的大小上限
+    """
+
+    def __init__(self, include: Optional[List[str]] = None, exclude: Optional[List[str]] = None,
+                 os: Optional[List[str]] = None, arch: Optional[List[str]] = None,
+                 skip_prerelease: bool = False, skip_draft: bool = True,
+                 max_asset_size_mb: Optional[float] = None):
+        self.include = [_compile_name_pattern(p) for p in include or []]
+        self.exclude = [_compile_name_pattern(p) for p in exclude or []]
+        self.os = {value.lower() for value in os or []}
+        self.arch = {value.lower() for value in arch or []}
+        self.skip_prerelease = skip_prerelease
+        self.skip_draft = skip_draft
+        self.max_asset_size = max_asset_size_mb * 1024 * 1024 if max_asset_size_mb else None
+
+    @classmethod
+    def from_config(cls, config: Optional[Dict]) -> "AssetFilter":
+        """
+        从YAML中的 filters 字段构造筛选器
+        :raises ValueError: 字段未知、类型错误或正则非法
+        """
+        config = config or {}
+        if not isinstance(config, dict):
+            raise ValueError("『filters』必须为字典")
+        unknown = set(config) - FILTER_FIELDS
+        if unknown:
+            raise ValueError(f"『filters』包含未知字段：{', '.join(sorted(unknown))}")
+        for field in ("include", "exclude", "os", "arch"):
+            if field in config and not isinstance(config[field], list):
+                raise ValueError(f"『filters.{field}』必须为列表")
+        for field, known in (("os", OS_PATTERNS), ("arch", ARCH_PATTERNS)):
+            invalid = [value for value in config.get(field, []) if str(value).lower() not in known]
+            if invalid:
+                raise ValueError(f"『filters.{field}』取值非法：{', '.join(map(str, invalid))}（可选：{', '.join(known)}）")
+        try:
+            return cls(**config)
+        except re.error as e:
+            raise ValueError(f"『filters』中的正则表达式非法：{str(e)}")
+
+    def accepts_release(self, release: Dict) -> bool:
+        if self.skip_draft and release.get("draft"):
+            return False
+        if self.skip_prerelease and release.get("prerelease"):
+            return False
+        return True
+
+    def accepts_asset(self, asset: Dict) -> bool:
+        name = asset["name"]
+        if self.include and not any(pattern.search(name) for pattern in self.include):
+            return False
+        if any(pattern.search(name) for pattern in self.exclude):
+            return False
+        if self.os:
+            detected = _detect(name, OS_PATTERNS)
+            if detected and not self.os.intersection(detected):
+                return False
+        if self.arch:
+            detected = _detect(name, ARCH_PATTERNS)
+            if detected and not self.arch.intersection(detected):
+                return False
+        if self.max_asset_size and asset.get("size", 0) > self.max_asset_size:
+            return False
+        return True
+
+    def split(self, releases: List[Dict]) -> Tuple[List[Tuple[Dict, Dict]], List[Dict]]:
+        """
+        把Releases中的附件分为保留和跳过两组
+        :return: ([(release, asset), ...], [跳过的asset, ...])
+        """
+        kept, skipped = [], []
+        for release in releases:
+            release_ok = self.accepts_release(release)
+            for asset in release.get("assets", []):
+                if release_ok and self.accepts_asset(asset):
+                    kept.append((release, asset))
+                else:
+                    skipped.append(asset)
+        return kept, skipped
+
+
+class FilterReport:
+    """汇总本次运行被筛选规则跳过的附件数量与字节数（线程安全）"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.skipped_count = 0
+        self.skipped_bytes = 0
+
+    def record(self, skipped_assets: List[Dict]) -> None:
+        with self._lock:
+            self.skipped_count += len(skipped_assets)
+            self.skipped_bytes += sum(asset.get("size", 0) for asset in skipped_assets)
+
+    def report(self) -> str:
+        return f"筛选规则跳过：{self.skipped_count} 个附件（{self.skipped_bytes / (1024 * 1024):.2f}MB）"
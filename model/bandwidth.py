@@ -0,0 +1,85 @@
+import os
+import threading
+import time
+from typing import Dict, Optional
+from urllib.parse import urlparse
+
+from model.metrics import METRICS
+
+MB: int = 1024 * 1024
+MAX_BANDWIDTH_MBPS: float = float(os.environ.get("MAX_BANDWIDTH_MBPS", "0"))  # 所有下载的总带宽上限（MB/s），0 表示不限制
+HOST_BANDWIDTH_MBPS: float = float(os.environ.get("HOST_BANDWIDTH_MBPS", "0"))  # 单个主机的带宽上限（MB/s），0 表示不限制
+BURST_SECONDS: float = 0.5  # 空闲后允许的突发量（按该时长的额度计）
+SHAPED_CHUNK_SECONDS: float = 0.1  # 限速时单次读取不超过该时长的额度，使并发传输交替获得带宽
+
+
+class _Pacer:
+    """
+    按速率排队的时间片：每次消耗 n 字节，把下一个可用时刻后移 n/rate 秒。
+    各传输按到达顺序依次获得时间片，读取块大小相近时同时进行的传输平均分享带宽
+    """
+
+    def __init__(self, bytes_per_second: float):
+        self.rate = bytes_per_second
+        self.next_free = 0.0
+
+    def reserve(self, size: int, now: float) -> float:
+        """占用 size 字节的时间片，返回需要等待的秒数（调用方持有锁）"""
+        self.next_free = max(self.next_free, now - BURST_SECONDS) + size / self.rate
+        return max(0.0, self.next_free - now)
+
+
+class BandwidthShaper:
+    """全局带宽上限 + 单主机带宽上限，下载线程每读取一块调用一次 throttle"""
+
+    def __init__(self, max_mbps: float = MAX_BANDWIDTH_MBPS, host_mbps: float = HOST_BANDWIDTH_MBPS):
+        self._lock = threading.Lock()
+        self._hosts: Dict[str, _Pacer] = {}
+        self.configure(max_mbps, host_mbps)
+
+    def configure(self, max_mbps: float, host_mbps: float) -> None:
+        with self._lock:
+            self._global: Optional[_Pacer] = _Pacer(max_mbps * MB) if max_mbps > 0 else None
+            self.host_rate = host_mbps * MB if host_mbps > 0 else 0.0
+            self._hosts.clear()
+            self.wait_seconds = 0.0
+
+    @property
+    def enabled(self) -> bool:
+        return self._global is not None or self.host_rate > 0
+
+    def chunk_limit(self, chunk_size: int) -> int:
+        """限速时缩小单次读取的上限，避免一次读取占用过长的时间片"""
+        rates = [rate for rate in (self._global.rate if self._global else 0.0, self.host_rate) if rate]
+        if not rates:
+            return chunk_size
+        return min(chunk_size, int(min(rates) * SHAPED_CHUNK_SECONDS))
+
+    def throttle(self, url: str, size: int) -> None:
+        """记录刚读取的 size 字节，超出全局或主机的速率时阻塞到对应的时间片"""
+        if not self.enabled:
+            return
+        with self._lock:
+            now = time.monotonic()
+            delay = self._global.reserve(size, now) if self._global else 0.0
+            if self.host_rate:
+                host = urlparse(url).netloc.lower()
+                pacer = self._hosts.get(host)
+                if pacer is None:
+                    pacer = self._hosts[host] = _Pacer(self.host_rate)
+                delay = max(delay, pacer.reserve(size, now))
+            self.wait_seconds += delay
+        if delay > 0:
+            METRICS.observe("bandwidth_wait_seconds", delay)
+            time.sleep(delay)
+
+    def report(self) -> str:
+        limits = []
+        if self._global:
+            limits.append(f"总计 {self._global.rate / MB:.1f}MB/s")
+        if self.host_rate:
+            limits.append(f"单主机 {self.host_rate / MB:.1f}MB/s")
+        return f"带宽限制：{'，'.join(limits) or '不限'}，限速等待：{self.wait_seconds:.1f} 秒"
+
+
+SHAPER = BandwidthShaper()  # 进程内共享的带宽控制
@@ -0,0 +1,109 @@
+import hashlib
+import os
+import shutil
+import uuid
+from typing import Dict, Optional
+
+
+def parse_digest(asset: Dict) -> Optional[str]:
+    """从GitHub附件的digest字段（形如 "sha256:<hex>"）提取SHA-256，没有时返回None"""
+    digest = asset.get("digest") or ""
+    algorithm, _, value = digest.partition(":")
+    if algorithm.lower() == "sha256" and len(value) == 64:
+        return value.lower()
+    return None
+
+
+def file_sha256(path: str, chunk_size: int = 1024 * 1024) -> str:
+    """计算文件的SHA-256（仅用于无法流式计算的场景，如乱序写入的分段下载）"""
+    hasher = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+class BlobStore:
+    """
+    内容寻址存储：文件按SHA-256保存为 <root>/<前两位>/<sha256>，
+    版本目录下的文件是指向blob的硬链接，相同内容只落盘一次
+    （rsync 使用 -H 时同一批次内的硬链接也只传输一次）
+    """
+
+    def __init__(self, root: str):
+        """
+        初始化存储目录
+        :param root: 存储根目录（需与版本目录位于同一文件系统，才能建立硬链接）
+        """
+        self.root = root
+        self.tmp_dir = os.path.join(root, "tmp")
+        os.makedirs(self.tmp_dir, exist_ok=True)
+
+    def blob_path(self, sha256: str) -> str:
+        return os.path.join(self.root, sha256[:2], sha256)
+
+    def has(self, sha256: Optional[str]) -> bool:
+        return bool(sha256) and os.path.exists(self.blob_path(sha256))
+
+    def temp_path(self, name: str) -> str:
+        """返回固定的临时下载路径（与blob位于同一目录树，入库时只需rename；路径固定才能跨运行续传）"""
+        return os.path.join(self.tmp_dir, name)
+
+    def ingest(self, tmp_path: str, sha256: str) -> str:
+        """把已校验的临时文件移入存储；已有相同内容时直接丢弃临时文件，返回blob路径"""
+        blob_path = self.blob_path(sha256)
+        if os.path.exists(blob_path):
+            os.remove(tmp_path)
+        else:
+            os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+            os.replace(tmp_path, blob_path)
+        return blob_path
+
+    def adopt(self, path: str, sha256: str) -> str:
+        """把已校验摘要的现有文件纳入存储（建立硬链接，不支持时复制），已有相同内容时不变，返回blob路径"""
+        blob_path = self.blob_path(sha256)
+        if not os.path.exists(blob_path):
+            os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+            tmp_path = self.temp_path(f"{sha256}.{uuid.uuid4().hex[:8]}.adopt")
+            try:
+                os.link(path, tmp_path)
+            except OSError:
+                shutil.copy2(path, tmp_path)
+            os.replace(tmp_path, blob_path)
+        return blob_path
+
+    def link(self, sha256: str, dest_path: str) -> None:
+        """在目标路径建立指向blob的硬链接（不支持硬链接时退化为复制），原子替换已有文件"""
+        blob_path = self.blob_path(sha256)
+        tmp_dest = f"{dest_path}.{uuid.uuid4().hex[:8]}.link"
+        try:
+            os.link(blob_path, tmp_dest)
+        except OSError:
+            shutil.copy2(blob_path, tmp_dest)
+        os.replace(tmp_dest, dest_path)
+
+    def prune(self, max_bytes: int) -> int:
+        """
+        清理不再被任何版本目录引用（硬链接数为1）的blob，按修改时间从旧到新删除，直到总大小不超过max_bytes
+        :param max_bytes: 存储允许保留的最大字节数
+        :return: 释放的字节数
+        """
+        blobs = []
+        total = 0
+        for prefix in os.listdir(self.root):
+            prefix_dir = os.path.join(self.root, prefix)
+            if prefix == "tmp" or not os.path.isdir(prefix_dir):
+                continue
+            for name in os.listdir(prefix_dir):
+                stat = os.stat(os.path.join(prefix_dir, name))
+                total += stat.st_size
+                if stat.st_nlink <= 1:
+                    blobs.append((stat.st_mtime, stat.st_size, os.path.join(prefix_dir, name)))
+
+        freed = 0
+        for _, size, path in sorted(blobs):
+            if total - freed <= max_bytes:
+                break
+            os.remove(path)
+            freed += size
+        return freed
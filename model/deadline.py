@@ -0,0 +1,40 @@
+import os
+import time
+from typing import Optional
+
+RUN_DEADLINE_MINUTES: float = float(os.environ.get("RUN_DEADLINE_MINUTES", "0"))  # 下载阶段的时间预算（分钟），0 表示不限制
+DEADLINE_MARGIN_SECONDS: float = 60.0  # 距截止时间不足该值时不再开始新的传输（避免刚开始就被中断）
+
+
+class TransferInterrupted(Exception):
+    """到达运行截止时间：正在进行的传输已保存断点并中止，下次运行继续"""
+
+
+class RunDeadline:
+    """
+    运行截止时间：
+    - accepting：距截止时间超过 margin 时才开始新的传输
+    - expired：到达截止时间后，正在进行的传输在下一次读取后保存断点并抛出 TransferInterrupted
+    """
+
+    def __init__(self, minutes: float = RUN_DEADLINE_MINUTES, margin: float = DEADLINE_MARGIN_SECONDS):
+        self.configure(minutes, margin)
+
+    def configure(self, minutes: float, margin: float = DEADLINE_MARGIN_SECONDS) -> None:
+        """从现在开始计时，minutes 为0时不限制"""
+        self.deadline: Optional[float] = time.monotonic() + minutes * 60 if minutes > 0 else None
+        self.margin = min(margin, minutes * 60 / 2) if minutes > 0 else margin
+
+    def remaining(self) -> Optional[float]:
+        return None if self.deadline is None else self.deadline - time.monotonic()
+
+    def accepting(self) -> bool:
+        remaining = self.remaining()
+        return remaining is None or remaining > self.margin
+
+    def expired(self) -> bool:
+        remaining = self.remaining()
+        return remaining is not None and remaining <= 0
+
+
+DEADLINE = RunDeadline()  # 进程内共享的截止时间
@@ -1,23 +1,648 @@
+import errno
+import hashlib
+import json
 import os
+import re
+import threading
+import time
 import requests
-from tqdm import tqdm
+from contextlib import nullcontext
+from concurrent.futures import FIRST_EXCEPTION, ThreadPoolExecutor, as_completed, wait
+from typing import List, NamedTuple, Optional, Tuple
 from urllib.parse import urlparse
 import warnings
 import urllib3
 from urllib3.exceptions import InsecureRequestWarning
+
+from model import http_client
+from model.bandwidth import SHAPER
+from model.blob_store import file_sha256
+from model.deadline import DEADLINE, TransferInterrupted
+from model.metrics import METRICS
+from model.mirrors import mirror_urls
+from model.progress import PROGRESS, Transfer
+
 warnings.filterwarnings("ignore", category=InsecureRequestWarning)
 urllib3.disable_warnings()
 
-def download_file(url, save_dir=None, filename=None, chunk_size=1024 * 1024, timeout=10):
+MIN_SEGMENT_SIZE = 4 * 1024 * 1024  # 每个分段的最小字节数，过小的文件不值得拆分
+SEGMENT_RETRIES = 3  # 单个分段失败后的重试次数（从已写入的位置继续）
+CHECKPOINT_BYTES = 8 * 1024 * 1024  # 每写入这么多字节把进度落盘到旁路文件一次
+DEFAULT_CHUNK_SIZE = 4 * 1024 * 1024  # 单次读取的最大字节数（复用的缓冲区大小）
+MIN_CHUNK_SIZE = 64 * 1024  # 自适应读取块的下限与初始值
+FAST_READ_SECONDS = 0.05  # 填满一块的耗时低于该值时加倍块大小
+SLOW_READ_SECONDS = 0.5  # 填满一块的耗时高于该值时减半块大小（保证进度与检查点及时更新）
+MIRROR_PROBE_BYTES = 64 * 1024  # 镜像竞速时每个候选地址读取的首块字节数
+FAILOVER_WINDOW_SECONDS = 5.0  # 按累计读取耗时达到该值的窗口统计吞吐，判断是否需要切换镜像
+FAILOVER_RATIO = 0.2  # 窗口吞吐低于本次传输峰值的该比例时切换到下一个镜像
+FAILOVER_MIN_BPS = 64 * 1024  # 窗口吞吐低于该值（字节/秒）时切换到下一个镜像
+# 读取响应体时可能出现的网络错误（直接读取 raw 时 urllib3 的异常不会被 requests 包装）
+STREAM_ERRORS = (requests.exceptions.RequestException, urllib3.exceptions.HTTPError)
+CONTENT_RANGE_PATTERN = re.compile(r'bytes\s+(\d+)-(\d+)/(\d+|\*)')
+
+
+class RemoteFile(NamedTuple):
+    """Range探测结果"""
+    url: str  # 重定向后的最终URL
+    size: int  # 文件总大小（未知为0）
+    ranges_supported: bool  # 是否支持Range
+    etag: Optional[str]
+    last_modified: Optional[str]
+
+
+class TransferResult(NamedTuple):
+    """一次传输的结果"""
+    path: str  # 最终文件路径
+    size: int  # 文件大小
+    sha256: Optional[str]  # 需要时计算的SHA-256
+
+
+class RemoteChangedError(IOError):
+    """续传时服务器上的文件已变化（If-Range不匹配返回200，或校验值/大小变化）"""
+
+
+class ChecksumMismatchError(IOError):
+    """下载完成的内容与预期的SHA-256不一致（.part 文件已删除）"""
+
+
+class ThroughputCollapsed(IOError):
+    """传输中吞吐骤降（或其他分段已决定切换镜像）：已写入的数据与进度已落盘，换到下一个镜像继续"""
+
+
+def format_size(size_bytes):
+    """将字节大小转换为人类可读的格式"""
+    for unit in ['B', 'KB', 'MB', 'GB', 'TB']:
+        if size_bytes < 1024.0:
+            return f"{size_bytes:.2f} {unit}"
+        size_bytes /= 1024.0
+    return f"{size_bytes:.2f} PB"
+
+
+def _connection(limiter, url):
+    """占用 limiter 中该地址主机的一个连接槽位（limiter 为None时不限制），每个请求/分段各占一个"""
+    return limiter.slot(url) if limiter is not None else nullcontext()
+
+
+def probe_range_support(url, headers=None, timeout=10, limiter=None):
+    """
+    用 bytes=0-0 的Range请求探测服务器是否支持分段下载
+
+    参数:
+        url (str): 文件URL（会跟随重定向）
+        headers (dict, optional): 额外请求头
+        timeout (int, optional): 超时时间
+        limiter (optional): 连接限流器（提供 slot(url) 上下文），探测请求占用一个槽位
+
+    返回:
+        RemoteFile: 最终URL、文件大小、是否支持Range以及ETag/Last-Modified校验值
+    """
+    probe_headers = dict(headers or {})
+    probe_headers['Range'] = 'bytes=0-0'
+    with _connection(limiter, url), \
+            http_client.get(url, headers=probe_headers, stream=True, timeout=timeout, verify=False) as response:
+        response.raise_for_status()
+        etag = response.headers.get('ETag')
+        last_modified = response.headers.get('Last-Modified')
+        if response.status_code == 206:
+            match = CONTENT_RANGE_PATTERN.match(response.headers.get('Content-Range', ''))
+            if match and match.group(3) != '*':
+                return RemoteFile(response.url, int(match.group(3)), True, etag, last_modified)
+        # 服务器忽略了Range（返回200），只能整体下载
+        total_size = int(response.headers.get('content-length', 0))
+        return RemoteFile(response.url, total_size, False, etag, last_modified)
+
+
+def _probe_mirror(url, headers=None, timeout=10, limiter=None):
+    """读取候选地址的首块数据（bytes=0-MIRROR_PROBE_BYTES-1），返回与 probe_range_support 相同的探测结果"""
+    probe_headers = dict(headers or {})
+    probe_headers['Range'] = f'bytes=0-{MIRROR_PROBE_BYTES - 1}'
+    with _connection(limiter, url), \
+            http_client.get(url, headers=probe_headers, stream=True, timeout=timeout, verify=False) as response:
+        response.raise_for_status()
+        ranges_supported = False
+        size = int(response.headers.get('content-length', 0))
+        if response.status_code == 206:
+            match = CONTENT_RANGE_PATTERN.match(response.headers.get('Content-Range', ''))
+            if match and match.group(3) != '*':
+                ranges_supported, size = True, int(match.group(3))
+        # 不支持Range的服务器返回完整内容，只读取首块后关闭连接
+        response.raw.read(MIRROR_PROBE_BYTES)
+        return RemoteFile(response.url, size, ranges_supported, response.headers.get('ETag'),
+                          response.headers.get('Last-Modified'))
+
+
+def race_mirrors(urls, headers=None, timeout=10, expected_size=None,
+                 require_ranges=False, limiter=None) -> Tuple[str, RemoteFile, List[str]]:
+    """
+    并发读取各候选地址的首块数据，选用最先完成且大小一致的地址（其余探测在后台结束）；
+    require_ranges 为True时淘汰不支持Range的地址（传输中切换镜像需要从断点继续）
+
+    返回:
+        (选中的候选地址, 探测结果, 其余可用于切换的候选地址（按配置顺序，已失败的不再包含）)
+    """
+    started = time.perf_counter()
+    pool = ThreadPoolExecutor(max_workers=len(urls), thread_name_prefix="mirror-probe")
+    futures = {pool.submit(_probe_mirror, url, headers, timeout, limiter): url for url in urls}
+    winner = None
+    rejected = set()
+    errors = []
+    try:
+        for future in as_completed(futures):
+            url = futures[future]
+            mirror_host = urlparse(url).netloc.lower()
+            try:
+                remote = future.result()
+            except STREAM_ERRORS as e:
+                rejected.add(url)
+                errors.append(f"{mirror_host}：{e}")
+                continue
+            if expected_size and remote.size and remote.size != expected_size:
+                rejected.add(url)
+                errors.append(f"{mirror_host}：文件大小 {remote.size} 与预期 {expected_size} 不一致")
+                continue
+            if require_ranges and not remote.ranges_supported:
+                rejected.add(url)
+                errors.append(f"{mirror_host}：不支持Range，无法从断点继续")
+                continue
+            winner = url, remote
+            METRICS.inc("mirror_wins_total", host=mirror_host)
+            METRICS.observe("mirror_race_seconds", time.perf_counter() - started, host=mirror_host)
+            break
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+    if winner is None:
+        raise IOError(f"所有镜像均不可用：{'；'.join(errors)}")
+    for error in errors:
+        print(f"  ⚠️  镜像不可用：{error}")
+    return winner[0], winner[1], [url for url in urls if url != winner[0] and url not in rejected]
+
+
+def _select_source(url, part, headers, timeout, expected_size, limiter=None) -> Tuple[str, RemoteFile, List[str]]:
+    """
+    选择下载地址：没有镜像时直接探测原地址；有未完成的下载时沿用其记录的地址（ETag等校验值属于该地址）；
+    否则让所有候选地址竞速
+
+    返回:
+        (下载地址, 探测结果, 其余可用于切换的候选地址)
+    """
+    candidates = mirror_urls(url)
+    if len(candidates) == 1:
+        return url, probe_range_support(url, headers=headers, timeout=timeout, limiter=limiter), []
+    recorded_url = part.recorded_url()
+    if recorded_url in candidates:
+        try:
+            remote = probe_range_support(recorded_url, headers=headers, timeout=timeout, limiter=limiter)
+            return recorded_url, remote, [candidate for candidate in candidates if candidate != recorded_url]
+        except STREAM_ERRORS:
+            pass  # 上次使用的地址已不可用，重新竞速
+    return race_mirrors(candidates, headers, timeout, expected_size, limiter=limiter)
+
+
+def _next_mirror(alternates, current: RemoteFile, headers, timeout,
+                 limiter=None) -> Optional[Tuple[str, RemoteFile]]:
+    """剩余的候选地址重新竞速，返回最快的大小一致且支持Range的地址（从 alternates 中移除），都不可用时返回None"""
+    if not alternates:
+        return None
+    try:
+        url, remote, remaining = race_mirrors(alternates, headers, timeout, current.size, require_ranges=True,
+                                              limiter=limiter)
+    except IOError as e:
+        print(f"  ⚠️  {e}")
+        alternates.clear()
+        return None
+    alternates[:] = remaining
+    return url, remote
+
+
+class _PartFile:
+    """
+    .part 下载文件及其旁路进度文件（.part.json）：记录校验值、预期大小与各分段已持久化的位置。
+    每个分段只在自己的数据fsync之后才更新其持久化位置（并行分段之间互不代替），
+    因此旁路文件记录的位置一定不超过实际落盘的数据，崩溃后续传不会留下空洞
+    """
+
+    def __init__(self, save_path):
+        self.part_path = f"{save_path}.part"
+        self.meta_path = f"{save_path}.part.json"
+        self.meta = None
+        self._lock = threading.Lock()
+        self._positions = {}  # 分段序号 -> 内存中的写入位置（可能尚未fsync）
+        self._unsaved_bytes = {}  # 分段序号 -> 上次fsync后写入的字节数
+
+    def recorded_url(self):
+        """未完成的下载所使用的候选地址（没有记录时返回None）"""
+        try:
+            with open(self.meta_path, 'r', encoding='utf-8') as f:
+                return json.load(f).get('url')
+        except (OSError, json.JSONDecodeError):
+            return None
+
+    def load(self, remote: RemoteFile):
+        """读取旁路文件；远端文件的大小或校验值变化时返回False（需要重新下载）"""
+        if not (os.path.exists(self.part_path) and os.path.exists(self.meta_path)):
+            return False
+        try:
+            with open(self.meta_path, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return False
+        if meta.get('size') != remote.size or not remote.ranges_supported:
+            return False
+        if (meta.get('etag') or meta.get('last_modified')) is None:
+            return False  # 没有校验值无法安全续传
+        if meta.get('etag') != remote.etag or meta.get('last_modified') != remote.last_modified:
+            return False
+        if os.path.getsize(self.part_path) != meta['size']:
+            return False
+        self.meta = meta
+        return True
+
+    def create(self, remote: RemoteFile, segment_count, url=None):
+        """预分配 .part 文件并写入初始进度（url 为所使用的候选地址）"""
+        with open(self.part_path, 'wb') as file:
+            if remote.size:
+                _preallocate(file, remote.size)
+        if segment_count > 1:
+            segment_size = remote.size // segment_count
+            bounds = [
+                [index * segment_size,
+                 remote.size - 1 if index == segment_count - 1 else (index + 1) * segment_size - 1]
+                for index in range(segment_count)
+            ]
+        else:
+            bounds = [[0, remote.size - 1 if remote.size else None]]
+        self.meta = {
+            'url': url,
+            'etag': remote.etag,
+            'last_modified': remote.last_modified,
+            'size': remote.size,
+            # 每个分段：[起始位置, 已持久化的位置（之前的数据均已fsync，下一个要写的字节）, 结束位置（含）]
+            'segments': [[start, start, end] for start, end in bounds],
+        }
+        self.save()
+
+    def rebind(self, url, remote: RemoteFile):
+        """切换镜像：后续续传使用新地址的校验值"""
+        with self._lock:
+            self.meta.update(url=url, etag=remote.etag, last_modified=remote.last_modified)
+        self.save()
+
+    def position(self, index):
+        """分段当前的写入位置（内存中的位置优先）"""
+        with self._lock:
+            return self._positions.get(index, self.meta['segments'][index][1])
+
+    def downloaded_bytes(self):
+        return sum(self.position(index) - start for index, (start, _, _) in enumerate(self.meta['segments']))
+
+    def advance(self, index, position, file):
+        """更新分段在内存中的进度，该分段累计写入超过CHECKPOINT_BYTES时fsync并落盘进度"""
+        with self._lock:
+            previous = self._positions.get(index, self.meta['segments'][index][1])
+            self._positions[index] = position
+            self._unsaved_bytes[index] = self._unsaved_bytes.get(index, 0) + position - previous
+            if self._unsaved_bytes[index] < CHECKPOINT_BYTES:
+                return
+        self.sync(index, position, file)
+
+    def sync(self, index, position, file):
+        """fsync该分段写入的数据后，把该分段的持久化位置更新为 position 并落盘（其他分段保持各自fsync后的位置）"""
+        file.flush()
+        os.fsync(file.fileno())
+        with self._lock:
+            self._positions[index] = position
+            self._unsaved_bytes[index] = 0
+            self.meta['segments'][index][1] = position
+        self.save()
+
+    def save(self):
+        with self._lock:
+            tmp_path = f"{self.meta_path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self.meta, f)
+            os.replace(tmp_path, self.meta_path)
+
+    def finish(self, save_path):
+        """下载完成：原子重命名为最终文件并删除旁路文件"""
+        os.replace(self.part_path, save_path)
+        if os.path.exists(self.meta_path):
+            os.remove(self.meta_path)
+
+    def discard(self):
+        for path in (self.part_path, self.meta_path):
+            if os.path.exists(path):
+                os.remove(path)
+
+
+def _preallocate(file, size):
+    """预分配磁盘空间：支持时用 posix_fallocate 真正占用数据块（减少碎片，空间不足时立即失败），否则创建稀疏文件"""
+    if hasattr(os, 'posix_fallocate'):
+        try:
+            os.posix_fallocate(file.fileno(), 0, size)
+            return
+        except OSError as e:
+            if e.errno == errno.ENOSPC:
+                raise
+    file.truncate(size)
+
+
+class _ChunkReader:
+    """
+    把响应体读入一块复用的预分配缓冲区（readinto + memoryview，不为每块分配新对象），
+    并根据填满一块的耗时自适应调整块大小：快速链路用大块减少循环与系统调用，慢速链路用小块保证进度及时更新。
+    eager 为True时（有可切换的镜像）改用 read1：收到数据即返回而不是等待填满一块，吞吐骤降在一次读取内即可发现
+    """
+
+    def __init__(self, raw, max_chunk_size, eager=False):
+        self.raw = raw
+        self.eager = eager
+        # 只有响应经过压缩时才解码：不解码时urllib3直接读取套接字数据，不经过内部的解码缓冲区
+        self.raw.decode_content = raw.headers.get('Content-Encoding', 'identity').lower() not in ('', 'identity')
+        self.max_chunk_size = max(max_chunk_size, MIN_CHUNK_SIZE)
+        self.buffer = bytearray(self.max_chunk_size)
+        self.view = memoryview(self.buffer)
+        self.chunk_size = MIN_CHUNK_SIZE
+        self.elapsed = 0.0  # 最近一次读取的耗时
+
+    def read(self, limit=None):
+        """读取不超过 limit 字节，返回缓冲区的只读视图（下一次 read 前有效），流结束时返回空视图"""
+        size = self.chunk_size if limit is None else min(self.chunk_size, limit)
+        started = time.perf_counter()
+        if self.eager:
+            data = self.raw.read1(size)
+            self.elapsed = time.perf_counter() - started
+            return memoryview(data)
+        count = self.raw.readinto(self.view[:size])
+        elapsed = self.elapsed = time.perf_counter() - started
+        if count == self.chunk_size:
+            if elapsed < FAST_READ_SECONDS:
+                self.chunk_size = min(self.chunk_size * 2, self.max_chunk_size)
+            elif elapsed > SLOW_READ_SECONDS:
+                self.chunk_size = max(self.chunk_size // 2, MIN_CHUNK_SIZE)
+        return self.view[:count]
+
+
+class _ThroughputMonitor:
+    """
+    统计一次传输的窗口吞吐（只计读取响应体的耗时，不含限速等待与写盘），
+    窗口吞吐低于峰值的 FAILOVER_RATIO 或低于 FAILOVER_MIN_BPS 时判定为吞吐骤降
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.peak = 0.0
+        self._bytes = 0
+        self._seconds = 0.0
+
+    def record(self, size, seconds):
+        """记录一次读取，窗口结束且吞吐骤降时返回True"""
+        with self._lock:
+            self._bytes += size
+            self._seconds += seconds
+            if self._seconds < FAILOVER_WINDOW_SECONDS:
+                return False
+            rate = self._bytes / self._seconds
+            self._bytes, self._seconds = 0, 0.0
+            self.peak = max(self.peak, rate)
+            return rate < self.peak * FAILOVER_RATIO or rate < FAILOVER_MIN_BPS
+
+
+def _download_segment(remote: RemoteFile, part: _PartFile, index, headers, timeout, chunk_size,
+                      progress: Optional[Transfer], hasher=None, monitor: Optional[_ThroughputMonitor] = None,
+                      stop: Optional[threading.Event] = None, limiter=None):
+    """
+    下载一个分段并写入 .part 文件的对应偏移；带 If-Range 续传，必须收到起点正确的206响应，
+    失败时从已写入位置重试。有可切换的镜像时（monitor 不为None）吞吐骤降则通知所有分段（stop）
+    保存进度后抛出 ThroughputCollapsed。每次请求在传输期间占用 limiter 的一个连接槽位
+    """
+    start, _, end = part.meta['segments'][index]
+    position = part.position(index)
+    last_error = None
+    with open(part.part_path, 'r+b') as file:
+        for _ in range(SEGMENT_RETRIES):
+            if end is not None and position > end:
+                return
+            request_headers = dict(headers or {})
+            resuming = remote.ranges_supported and (position > 0 or end is not None and end < remote.size - 1)
+            if resuming:
+                request_headers['Range'] = f'bytes={position}-{end}'
+                # 远端文件已变化时服务器会返回200完整内容而不是206，从而避免把新旧内容拼接在一起；
+                # 弱ETag（W/"..."）不能用于If-Range（服务器会忽略Range返回200），改用Last-Modified，
+                # 都没有时不带If-Range，只校验Content-Range的起点
+                validator = remote.etag if remote.etag and not remote.etag.startswith('W/') else remote.last_modified
+                if validator:
+                    request_headers['If-Range'] = validator
+            try:
+                with _connection(limiter, remote.url), \
+                        http_client.get(remote.url, headers=request_headers, stream=True, timeout=timeout,
+                                        verify=False) as response:
+                    response.raise_for_status()
+                    if resuming:
+                        match = CONTENT_RANGE_PATTERN.match(response.headers.get('Content-Range', ''))
+                        if response.status_code != 206:
+                            raise RemoteChangedError(f"续传时服务器返回 {response.status_code}，远端文件可能已变化")
+                        if not match or int(match.group(1)) != position:
+                            raise RemoteChangedError("服务器返回的Content-Range与请求不一致")
+                    reader = _ChunkReader(response.raw, SHAPER.chunk_limit(chunk_size), eager=monitor is not None)
+                    file.seek(position)
+                    while end is None or position <= end:
+                        if DEADLINE.expired():
+                            # 到达截止时间：把已写入的数据与进度落盘后中止，下次运行从这里续传
+                            part.sync(index, position, file)
+                            raise TransferInterrupted(f"已到达运行截止时间（分段已写入至 {position}）")
+                        if stop is not None and stop.is_set():
+                            part.sync(index, position, file)
+                            raise ThroughputCollapsed(f"吞吐骤降，切换镜像（分段已写入至 {position}）")
+                        chunk = reader.read(None if end is None else end + 1 - position)
+                        if not chunk:
+                            break
+                        if monitor is not None and monitor.record(len(chunk), reader.elapsed):
+                            stop.set()
+                        file.write(chunk)
+                        if hasher is not None:
+                            hasher.update(chunk)
+                        position += len(chunk)
+                        if progress is not None:
+                            PROGRESS.update(progress, len(chunk))
+                        SHAPER.throttle(remote.url, len(chunk))
+                        part.advance(index, position, file)
+                    part.sync(index, position, file)
+                if end is None or position > end:
+                    return
+            except RemoteChangedError:
+                raise
+            except STREAM_ERRORS as e:
+                last_error = e
+                part.sync(index, position, file)  # 中断前已写入的数据先fsync再记录进度
+                if not remote.ranges_supported:
+                    break  # 不支持Range时无法从中间继续
+    raise IOError(f"分段 {start}-{end} 下载失败（已写入至 {position}）：{last_error}")
+
+
+def _run_segments(remote: RemoteFile, part: _PartFile, headers, timeout, chunk_size, progress: Optional[Transfer],
+                  hasher=None, monitor: Optional[_ThroughputMonitor] = None, limiter=None):
+    """下载所有未完成的分段（已完成的分段立即返回），任一分段失败时抛出异常"""
+    stop = threading.Event() if monitor is not None else None
+    segment_count = len(part.meta['segments'])
+    if segment_count == 1:
+        _download_segment(remote, part, 0, headers, timeout, chunk_size, progress, hasher, monitor, stop, limiter)
+        return
+    with ThreadPoolExecutor(max_workers=segment_count, thread_name_prefix="segment") as pool:
+        futures = [
+            pool.submit(_download_segment, remote, part, index, headers, timeout, chunk_size, progress,
+                        None, monitor, stop, limiter)
+            for index in range(segment_count)
+        ]
+        if stop is not None:
+            # 任一分段失败时通知其他分段保存进度后停止，尽快切换镜像
+            done, _ = wait(futures, return_when=FIRST_EXCEPTION)
+            if any(future.exception() for future in done):
+                stop.set()
+    # 优先抛出真正的失败：其他分段因 stop 停止时抛出的是 ThroughputCollapsed
+    errors = [future.exception() for future in futures if future.exception() is not None]
+    for error in errors:
+        if not isinstance(error, ThroughputCollapsed):
+            raise error
+    if errors:
+        raise errors[0]
+
+
+def download_resumable(url, save_path, segments=1, headers=None, timeout=10, chunk_size=DEFAULT_CHUNK_SIZE,
+                       expected_size=None, show_progress=True, compute_sha256=False, expected_sha256=None,
+                       limiter=None):
+    """
+    可断点续传的下载引擎：数据写入 <save_path>.part，旁路文件 <save_path>.part.json 记录
+    ETag/Last-Modified、预期大小和每个分段的进度；续传时使用 Range + If-Range 并校验206响应，
+    完成后原子重命名为最终文件。服务器支持Range时可拆分为多个分段并行下载。
+    mirrors.yaml 为该地址配置了镜像时，各候选地址先竞速首块数据，在最快的地址上下载；
+    传输中吞吐骤降或失败时切换到下一个候选地址，从已写入的位置继续。
+
+    参数:
+        url (str): 文件URL
+        save_path (str): 最终保存路径
+        segments (int, optional): 最大并行分段数，默认为1（单连接）
+        headers (dict, optional): 额外请求头
+        timeout (int, optional): 超时时间
+        chunk_size (int, optional): 单次读取的最大字节数（实际块大小按吞吐在 MIN_CHUNK_SIZE 与它之间自适应）
+        expected_size (int, optional): 已知的文件大小，用于校验（镜像竞速时淘汰大小不一致的地址）
+        show_progress (bool, optional): 是否输出进度（节流，并发时汇总为一行）
+        compute_sha256 (bool, optional): 是否计算SHA-256（单连接从头下载时边下载边计算）
+        expected_sha256 (str, optional): 预期的SHA-256，不一致时删除 .part 文件并抛出 ChecksumMismatchError
+        limiter (optional): 连接限流器（提供 slot(url) 上下文）：探测、镜像竞速与每个分段的请求各占一个槽位
+
+    返回:
+        TransferResult: 文件路径、大小与SHA-256；失败时抛出异常，.part文件保留以便下次续传
+    """
+    started = time.perf_counter()
+    host = urlparse(url).netloc.lower()
+    compute_sha256 = compute_sha256 or bool(expected_sha256)
+    part = _PartFile(save_path)
+    source_url, remote, alternates = _select_source(url, part, headers, timeout, expected_size, limiter)
+    if expected_size and remote.size and remote.size != expected_size:
+        raise IOError(f"文件大小不一致：预期 {expected_size} 字节，服务器返回 {remote.size} 字节")
+
+    # 已存在完整的最终文件（完成时才会重命名，因此存在即完整）
+    if os.path.exists(save_path) and remote.size and os.path.getsize(save_path) == remote.size:
+        sha256 = file_sha256(save_path) if compute_sha256 else None
+        if not expected_sha256 or sha256 == expected_sha256:
+            return TransferResult(save_path, remote.size, sha256)
+        os.remove(save_path)  # 内容与摘要不符，重新下载
+
+    if part.load(remote):
+        print(f"发现未完成的下载，从 {format_size(part.downloaded_bytes())} 处继续：{os.path.basename(save_path)}")
+    else:
+        segment_count = min(segments, remote.size // MIN_SEGMENT_SIZE) if remote.ranges_supported else 1
+        part.create(remote, max(1, segment_count), source_url)
+
+    # 只有单分段且从头开始下载时才能按顺序边写边算摘要
+    hasher = None
+    if compute_sha256 and len(part.meta['segments']) == 1 and part.downloaded_bytes() == 0:
+        hasher = hashlib.sha256()
+
+    segment_count = len(part.meta['segments'])
+    resumed_bytes = part.downloaded_bytes()
+    # 进度汇总到共享的 PROGRESS：按时间间隔节流输出，并发传输时只输出一行汇总
+    progress = PROGRESS.start(os.path.basename(save_path), remote.size, resumed_bytes) if show_progress else None
+    try:
+        # 吞吐监控只在可以切换到其他镜像、且当前地址支持从断点继续时启用
+        monitor = _ThroughputMonitor() if alternates and remote.ranges_supported else None
+        while True:
+            try:
+                _run_segments(remote, part, headers, timeout, chunk_size, progress, hasher, monitor, limiter)
+                break
+            except RemoteChangedError:
+                raise
+            except IOError as e:
+                switched = _next_mirror(alternates, remote, headers, timeout, limiter)
+                if switched is None:
+                    if not isinstance(e, ThroughputCollapsed):
+                        raise
+                    # 吞吐骤降只用于切换到更快的镜像：没有可用的镜像时停止监控，在当前地址从断点继续
+                    print(f"  ⚠️  没有可切换的镜像，继续从 {urlparse(source_url).netloc} 下载：{os.path.basename(save_path)}")
+                    monitor = None
+                    continue
+                previous_host = urlparse(source_url).netloc.lower()
+                source_url, remote = switched
+                part.rebind(source_url, remote)
+                monitor = _ThroughputMonitor() if alternates else None
+                METRICS.inc("mirror_failovers_total", host=previous_host)
+                print(f"🔀 {previous_host} 传输异常（{e}），切换到 {urlparse(source_url).netloc}，"
+                      f"从 {format_size(part.downloaded_bytes())} 处继续：{os.path.basename(save_path)}")
+    except RemoteChangedError:
+        part.discard()  # 远端已变化，旧的部分数据作废，下次从头下载
+        METRICS.inc("download_errors_total", host=host, error="remote_changed")
+        raise
+    except Exception as e:
+        METRICS.inc("download_errors_total", host=host, error=type(e).__name__)
+        raise
+    finally:
+        if progress is not None:
+            PROGRESS.finish(progress)
+
+    actual_size = os.path.getsize(part.part_path)
+    if remote.size and actual_size != remote.size:
+        raise IOError(f"下载不完整：{actual_size}/{remote.size} 字节")
+    sha256 = None
+    if compute_sha256:
+        # 分段乱序写入或续传时无法流式计算，刚写完的数据仍在页缓存中，读取代价很小
+        sha256 = hasher.hexdigest() if hasher is not None else file_sha256(part.part_path)
+    if expected_sha256 and sha256 != expected_sha256:
+        part.discard()  # 内容有误（如镜像提供了错误的文件），下次从头下载
+        METRICS.inc("checksum_mismatch_total", host=urlparse(source_url).netloc.lower())
+        raise ChecksumMismatchError(f"SHA-256校验失败：预期 {expected_sha256}，实际 {sha256}")
+    part.finish(save_path)
+    METRICS.inc("download_bytes_total", actual_size - resumed_bytes, host=host)
+    METRICS.observe("download_seconds", time.perf_counter() - started, host=host, segments=segment_count)
+    if resumed_bytes:
+        METRICS.inc("download_resumed_bytes_total", resumed_bytes, host=host)
+    return TransferResult(save_path, actual_size, sha256)
+
+
+def download_segmented(url, save_path, segments=4, headers=None, timeout=10, chunk_size=DEFAULT_CHUNK_SIZE,
+                       expected_size=None, show_progress=True):
     """
-    下载文件并显示进度条，优化了路径处理逻辑
+    多连接分段下载：探测Range支持后把文件拆成N个字节区间并行下载（可续传），
+    服务器不支持Range时退化为单连接流式下载
+
+    返回:
+        str: 保存的文件路径；失败时抛出异常
+    """
+    return download_resumable(url, save_path, segments=segments, headers=headers, timeout=timeout,
+                              chunk_size=chunk_size, expected_size=expected_size,
+                              show_progress=show_progress).path
+
+
+def download_file(url, save_dir=None, filename=None, chunk_size=DEFAULT_CHUNK_SIZE, timeout=10, segments=1):
+    """
+    下载文件并显示进度条，优化了路径处理逻辑（通过 .part 文件断点续传，完成后原子重命名）
 
     参数:
         url (str): 要下载的文件URL
         save_dir (str, optional): 保存文件的目录，默认为当前目录
         filename (str, optional): 保存的文件名，默认为从URL提取
-        chunk_size (int, optional): 下载块大小，默认为1MB
+        chunk_size (int, optional): 单次读取的最大字节数，默认为4MB
         timeout (int, optional): 连接超时时间，默认为10秒
+        segments (int, optional): 并行分段数，大于1时使用分段下载，默认为1
 
     返回:
         str: 下载成功返回保存的文件路径，失败返回None
@@ -46,56 +671,9 @@ def download_file(url, save_dir=None, filename=None, chunk_size=1024 * 1024, tim
         save_path = os.path.join(save_dir, final_filename)
         save_path = os.path.normpath(save_path)  # 确保路径格式正确
 
-        # 检查文件是否已存在及大小
-        resume_byte_pos = 0
-        if os.path.exists(save_path):
-            resume_byte_pos = os.path.getsize(save_path)
-            print(f"发现已存在文件，尝试从 {resume_byte_pos} 字节处继续下载...")
-
-        # 设置请求头，支持断点续传
-        headers = {}
-        if resume_byte_pos > 0:
-            headers['Range'] = f'bytes={resume_byte_pos}-'
-
-        # 发送请求
-        session = requests.Session()
-        session.verify = False
-        response = requests.get(url, headers=headers, stream=True, timeout=timeout,verify=False)
-        response.raise_for_status()  # 检查请求是否成功
-
-        # 获取文件总大小
-        total_size = int(response.headers.get('content-length', 0)) + resume_byte_pos
-
-        # 显示友好的文件大小
-        def format_size(size_bytes):
-            """将字节大小转换为人类可读的格式"""
-            for unit in ['B', 'KB', 'MB', 'GB', 'TB']:
-                if size_bytes < 1024.0:
-                    return f"{size_bytes:.2f} {unit}"
-                size_bytes /= 1024.0
-            return f"{size_bytes:.2f} PB"
-
-        print(f"文件总大小: {format_size(total_size)}")
         print(f"保存路径: {save_path}")
-
-        # 打开文件，以追加模式写入
-        mode = 'ab' if resume_byte_pos > 0 else 'wb'
-        with open(save_path, mode) as file, tqdm(
-                desc=final_filename,
-                total=total_size,
-                unit='iB',
-                unit_scale=True,
-                unit_divisor=1024,
-                initial=resume_byte_pos,
-                ascii=True,
-                bar_format='{l_bar}{bar}| {n_fmt}/{total_fmt} [{elapsed}<{remaining}, {rate_fmt}]'
-        ) as progress_bar:
-
-            for chunk in response.iter_content(chunk_size=chunk_size):
-                if chunk:  # 过滤掉保持连接的空块
-                    file.write(chunk)
-                    progress_bar.update(len(chunk))
-
+        result = download_resumable(url, save_path, segments=segments, timeout=timeout, chunk_size=chunk_size)
+        print(f"文件总大小: {format_size(result.size)}")
         print(f"文件下载完成，已保存至: {save_path}")
         return save_path
 
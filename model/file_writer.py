@@ -0,0 +1,52 @@
+import hashlib
+import os
+from typing import Optional, Union
+
+from model.metrics import METRICS
+
+HASH_CHUNK_SIZE: int = 1024 * 1024  # 计算磁盘文件摘要时每次读取的字节数
+
+
+def content_digest(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def file_digest(path: str) -> Optional[str]:
+    """磁盘文件内容的SHA-256，文件不存在时返回None"""
+    digest = hashlib.sha256()
+    try:
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+                digest.update(chunk)
+    except FileNotFoundError:
+        return None
+    return digest.hexdigest()
+
+
+def write_if_changed(path: str, content: Union[str, bytes], encoding: str = "utf-8") -> bool:
+    """
+    内容与磁盘上的文件相同时跳过写入（保留mtime，rsync不会再传输或更新时间戳），
+    否则写临时文件并fsync后原子替换
+    :return: 实际写入返回True，内容未变化返回False
+    """
+    data = content.encode(encoding) if isinstance(content, str) else content
+    try:
+        # 大小不同时无需计算摘要
+        if os.path.getsize(path) == len(data) and file_digest(path) == content_digest(data):
+            METRICS.inc("file_writes_total", result="unchanged")
+            return False
+    except OSError:
+        pass
+
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    METRICS.inc("file_writes_total", result="written")
+    METRICS.inc("file_write_bytes_total", len(data))
+    return True
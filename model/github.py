@@ -1,18 +1,78 @@
 import base64
+import hashlib
+import json
 
 import requests
 import os
-import json
-import yaml
-from typing import List, Dict, Optional
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Callable, List, Dict, Optional, Tuple
+from urllib.parse import urlparse
+
+from model import http_client
+from model.asset_filter import AssetFilter, FilterReport
+from model.blob_store import BlobStore, file_sha256, parse_digest
+from model.download import download_resumable
+from model.file_writer import write_if_changed
+from model.github_graphql import GRAPHQL_URL, GraphQLDiscoveryError, discover_releases
+from model.http_cache import ConditionalCache
+from model.metrics import METRICS
+from model.source import Source, WorkItem
+from model.state_store import STATE_FILE, StateStore, open_state_store
+from model.transfer_queue import DEFAULT_POLICY, policy_key
 
 # ------------------- 配置文件路径（核心：指定YAML配置文件位置） -------------------
 REPO_CONFIG_YAML: str = "./repo_configs.yaml"  # 单独的YAML仓库配置文件
 
 # ------------------- 全局配置（所有仓库共用） -------------------
-GITHUB_TOKEN: Optional[str] = ""  # GitHub令牌（无则设为None，避免API请求限制）
-STATE_FILE: str = "./repo_states/downloaded_assets.json"  # 所有仓库共用的下载状态文件
 MAX_VERSIONS: int = 5  # 默认获取最新的5个版本
+HTTP_CACHE_DIR: str = "./repo_states/http_cache"  # GitHub API条件请求缓存目录（ETag/Last-Modified）
+BLOB_STORE_DIR: str = "./Releases/.blobs"  # 内容寻址存储目录（版本目录中的文件是它的硬链接，rsync时排除）
+BLOB_STORE_MAX_BYTES: int = 2 * 1024 ** 3  # 未被引用的blob超过该大小时按时间从旧到新清理
+GRAPHQL_DISCOVERY: bool = True  # 有令牌时用批量GraphQL查询一次性获取所有仓库的Releases（失败自动回退REST）
+README_NS = "github_readmes"  # 状态库命名空间：key=state_key，value=已写出的README的blob SHA
+WATERMARK_NS = "github_watermarks"  # 状态库命名空间：key=state_key，value=已完整镜像的最新Release（id、published_at、配置指纹）
+
+# ------------------- 并发配置 -------------------
+CONCURRENT_MODE: bool = True  # 是否启用并发模式（False则按仓库顺序串行处理）
+MAX_WORKERS: int = 8  # 单独运行时的下载线程池大小（同时传输的附件数量）
+SCAN_WORKERS: int = 4  # 扫描Releases/README的线程数（与下载并行）
+MAX_CONNECTIONS: int = MAX_WORKERS + SCAN_WORKERS  # 全局最大并发连接数
+MAX_CONNECTIONS_PER_HOST: int = 4  # 单个主机的最大并发连接数
+DOWNLOAD_SEGMENTS: int = 4  # 大文件分段并行下载的连接数（1表示关闭分段下载）
+SEGMENTED_DOWNLOAD_THRESHOLD: int = 32 * 1024 * 1024  # 超过该大小（字节）的附件使用分段下载
+
+
+# ------------------- 并发控制：全局 + 按主机限流 -------------------
+class HostLimiter:
+    """全局并发数 + 单主机并发数的双重限流器，所有网络请求都通过它获取连接槽位"""
+
+    def __init__(self, max_total: int, max_per_host: int):
+        self.max_per_host = max_per_host
+        self._total = threading.BoundedSemaphore(max_total)
+        self._hosts: Dict[str, threading.BoundedSemaphore] = {}
+        self._lock = threading.Lock()
+
+    def _host_semaphore(self, url: str) -> threading.BoundedSemaphore:
+        host = urlparse(url).netloc.lower()
+        with self._lock:
+            if host not in self._hosts:
+                self._hosts[host] = threading.BoundedSemaphore(self.max_per_host)
+            return self._hosts[host]
+
+    @contextmanager
+    def slot(self, url: str):
+        """占用一个连接槽位（先按主机、再按全局），退出时释放"""
+        host_semaphore = self._host_semaphore(url)
+        with host_semaphore, self._total:
+            yield
+
+
+HOST_LIMITER = HostLimiter(MAX_CONNECTIONS, MAX_CONNECTIONS_PER_HOST)
+API_CACHE = ConditionalCache(HTTP_CACHE_DIR)
+FILTER_REPORT = FilterReport()
+BLOB_STORE = BlobStore(BLOB_STORE_DIR)
 
 
 # ------------------- 工具函数（新增：加载YAML仓库配置） -------------------
@@ -25,6 +85,8 @@ def load_repo_configs_from_yaml(config_file: str) -> List[Dict]:
     :raises yaml.YAMLError: YAML格式错误
     :raises ValueError: 配置缺少必要字段或格式非法
     """
+    import yaml  # 按需导入：只探测JetBrains/网页版本时不加载
+
     # 1. 检查配置文件是否存在
     if not os.path.exists(config_file):
         raise FileNotFoundError(f"YAML仓库配置文件不存在：{os.path.abspath(config_file)}")
@@ -39,6 +101,9 @@ def load_repo_configs_from_yaml(config_file: str) -> List[Dict]:
     # 3. 校验配置根结构（必须包含"repos"字段且为列表）
     if "repos" not in config_data or not isinstance(config_data["repos"], list):
         raise ValueError("YAML配置文件必须包含『repos』字段，且值为仓库配置列表")
+    defaults = config_data.get("defaults") or {}
+    if not isinstance(defaults, dict):
+        raise ValueError("『defaults』字段必须为字典")
 
     # 4. 校验每个仓库的必要字段（确保配置完整）
     required_fields = ["repo_owner", "repo_name", "base_save_dir", "state_key"]  # 必选字段
@@ -58,6 +123,21 @@ def load_repo_configs_from_yaml(config_file: str) -> List[Dict]:
             if not repo_config[field] or str(repo_config[field]).strip() == "":
                 raise ValueError(f"第{repo_idx}个仓库的『{field}』字段不能为空")
 
+        # 合并全局默认值（仓库自身的配置优先，filters按字段合并）并校验筛选规则
+        repo_config = {**{k: v for k, v in defaults.items() if k != "filters"}, **repo_config}
+        filters = {**(defaults.get("filters") or {}), **(repo_config.get("filters") or {})}
+        repo_config["filters"] = filters  # 合并后的筛选规则（水位线的配置指纹依赖它）
+        if "max_versions" in repo_config and (not isinstance(repo_config["max_versions"], int) or repo_config["max_versions"] < 1):
+            raise ValueError(f"第{repo_idx}个仓库的『max_versions』必须为正整数")
+        if "priority" in repo_config and (isinstance(repo_config["priority"], bool)
+                                          or not isinstance(repo_config["priority"], (int, float))
+                                          or repo_config["priority"] <= 0):
+            raise ValueError(f"第{repo_idx}个仓库的『priority』必须为正数")
+        try:
+            repo_config["asset_filter"] = AssetFilter.from_config(filters)
+        except ValueError as e:
+            raise ValueError(f"第{repo_idx}个仓库的筛选规则非法：{str(e)}")
+
         # 添加到合法配置列表
         valid_repos.append(repo_config)
 
@@ -65,73 +145,134 @@ def load_repo_configs_from_yaml(config_file: str) -> List[Dict]:
 
 
 # ------------------- 工具函数（复用逻辑：状态管理、API请求、下载） -------------------
-def load_all_repos_downloaded_state() -> Dict[str, Dict[int, str]]:
-    """加载所有仓库的已下载状态（从JSON状态文件）"""
-    os.makedirs(os.path.dirname(STATE_FILE), exist_ok=True)  # 确保状态文件目录存在
-    if not os.path.exists(STATE_FILE):
-        return {}
-
+def _fetch_releases_page(api_url: str, page: int, per_page: int) -> List[Dict]:
     try:
-        with open(STATE_FILE, "r", encoding="utf-8") as f:
-            state_data = json.load(f)
-            # 将JSON的字符串Key转为整数（与GitHub Asset ID类型一致）
-            return {
-                repo_key: {int(asset_id): asset_name for asset_id, asset_name in repo_state.items()}
-                for repo_key, repo_state in state_data.items()
-            }
-    except json.JSONDecodeError:
-        # 状态文件损坏时备份并返回空状态
-        backup_file = f"{STATE_FILE}.bak"
-        os.rename(STATE_FILE, backup_file)
-        print(f"⚠️  状态文件损坏，已备份为：{os.path.basename(backup_file)}")
-        return {}
+        with HOST_LIMITER.slot(api_url):
+            # 条件请求：未变化时返回304并使用缓存（触发HTTP错误如403限流、404仓库不存在）
+            return API_CACHE.get_json(api_url, params={"page": page, "per_page": per_page}, timeout=30)
+    except requests.exceptions.RequestException as e:
+        raise Exception(f"GitHub API请求失败：{str(e)}")
 
-def save_all_repos_downloaded_state(state: Dict[str, Dict[int, str]]) -> None:
-    """保存所有仓库的已下载状态（到JSON状态文件）"""
-    # 将整数Key转为字符串（JSON不支持整数Key）
-    state_str_key = {
-        repo_key: {str(asset_id): asset_name for asset_id, asset_name in repo_state.items()}
-        for repo_key, repo_state in state.items()
-    }
-    with open(STATE_FILE, "w", encoding="utf-8") as f:
-        json.dump(state_str_key, f, ensure_ascii=False, indent=2)
 
-def fetch_repo_releases(repo_owner: str, repo_name: str, max_versions: int = MAX_VERSIONS) -> List[Dict]:
+def fetch_repo_releases(repo_owner: str, repo_name: str, max_versions: int = MAX_VERSIONS,
+                        watermark: Optional[Dict] = None) -> List[Dict]:
     """
-    获取仓库的Releases（包含版本信息和附件）
+    获取仓库的Releases（包含版本信息和附件），从新到旧分页列出，到达水位线即停止
     :param repo_owner: 仓库所有者
     :param repo_name: 仓库名称
     :param max_versions: 最多获取的版本数量，默认为全局配置的MAX_VERSIONS
-    :return: Release列表
+    :param watermark: 已完整镜像的最新Release（load_watermark的返回值），为None时列出完整窗口
+    :return: 比水位线新的Release列表（最新的Release就是水位线时为空列表）
     """
-    headers = {"Authorization": f"token {GITHUB_TOKEN}"} if GITHUB_TOKEN else {}
+    api_url = f"{http_client.GITHUB_API_URL}/repos/{repo_owner}/{repo_name}/releases"
+
+    # 有水位线时先只取最新的一个Release：未变化（最常见的情况）时一次条件请求即可跳过整个仓库
+    if watermark:
+        newest = _fetch_releases_page(api_url, page=1, per_page=1)
+        if not newest or reached_watermark(newest[0], watermark):
+            return []
+
     releases = []
     page = 1
-    api_url = f"https://api.github.com/repos/{repo_owner}/{repo_name}/releases"
-
+    per_page = min(100, max_versions)  # 每页数量在翻页过程中必须固定，否则page偏移会跳过或重复Release
     while len(releases) < max_versions:
-        try:
-            response = requests.get(
-                api_url,
-                headers=headers,
-                params={"page": page, "per_page": min(100, max_versions - len(releases))},  # 每页最多获取所需剩余数量
-                timeout=30
-            )
-            response.raise_for_status()  # 触发HTTP错误（如403限流、404仓库不存在）
-        except requests.exceptions.RequestException as e:
-            raise Exception(f"GitHub API请求失败：{str(e)}")
-
-        current_releases = response.json()
-        if not current_releases:
-            break  # 无更多Releases时终止分页
-        
-        # 添加当前页的Releases，但不超过max_versions
-        remaining_slots = max_versions - len(releases)
-        releases.extend(current_releases[:remaining_slots])
+        current_releases = _fetch_releases_page(api_url, page, per_page)
+        for release in current_releases:
+            if len(releases) >= max_versions or (watermark and reached_watermark(release, watermark)):
+                return releases
+            releases.append(release)
+        if len(current_releases) < per_page:
+            break  # 最后一页
         page += 1
 
     return releases
 
+
+# ------------------- Release水位线（每个仓库已完整镜像的最新Release） -------------------
+def watermark_fingerprint(repo_config: Dict, max_versions: int = MAX_VERSIONS) -> str:
+    """筛选规则或版本窗口变化后旧水位线失效（之前被跳过的附件可能需要补下载）"""
+    config = {"filters": repo_config.get("filters") or {}, "max_versions": repo_config.get("max_versions", max_versions)}
+    return hashlib.sha1(json.dumps(config, sort_keys=True, default=str).encode("utf-8")).hexdigest()[:12]
+
+
+def load_watermark(store: StateStore, repo_config: Dict, max_versions: int = MAX_VERSIONS) -> Optional[Dict]:
+    """读取仓库的水位线，配置指纹不一致时视为没有水位线"""
+    watermark = store.get(WATERMARK_NS, repo_config["state_key"])
+    if watermark and watermark.get("config") == watermark_fingerprint(repo_config, max_versions):
+        return watermark
+    return None
+
+
+def reached_watermark(release: Dict, watermark: Dict) -> bool:
+    """Release是水位线本身或比它更早发布（水位线对应的Release被删除时按发布时间判断）"""
+    if release.get("id") == watermark.get("release_id"):
+        return True
+    published_at, watermark_published_at = release.get("published_at"), watermark.get("published_at")
+    return bool(published_at and watermark_published_at and published_at < watermark_published_at)
+
+
+def releases_after_watermark(releases: List[Dict], watermark: Optional[Dict]) -> List[Dict]:
+    """截取比水位线新的Release（用于批量发现得到的完整窗口）"""
+    if not watermark:
+        return releases
+    for index, release in enumerate(releases):
+        if reached_watermark(release, watermark):
+            return releases[:index]
+    return releases
+
+
+def advance_watermark(store: StateStore, repo_config: Dict, releases: List[Dict],
+                      max_versions: int = MAX_VERSIONS) -> Optional[Dict]:
+    """
+    从旧到新推进水位线：遇到仍有未下载附件（按筛选规则保留的）的Release即停止，保证水位线以下全部已镜像；
+    被版本级筛选跳过的Release（如 skip_prerelease 跳过的预发布）也会停止推进：预发布转为正式版时id不变，
+    越过它的水位线会让之后的扫描把它当作已镜像而跳过
+    :param releases: 本次列出的Release（从新到旧）
+    :return: 推进后的水位线，未推进时返回None
+    """
+    state_key = repo_config["state_key"]
+    asset_filter = repo_config.get("asset_filter") or AssetFilter()
+    kept, _ = asset_filter.split(releases)
+    incomplete = {release["id"] for release, asset in kept if not store.is_downloaded(state_key, asset["id"])}
+    newest_complete = None
+    for release in reversed(releases):
+        if release["id"] in incomplete:
+            break
+        if release.get("draft"):
+            continue  # 草稿发布时获得新的发布时间，会排在水位线之后，不影响推进
+        if not asset_filter.accepts_release(release):
+            break
+        newest_complete = release
+    if not newest_complete:
+        return None
+    watermark = {
+        "release_id": newest_complete["id"],
+        "tag_name": newest_complete.get("tag_name"),
+        "published_at": newest_complete.get("published_at"),
+        "config": watermark_fingerprint(repo_config, max_versions),
+    }
+    store.put(WATERMARK_NS, state_key, watermark)
+    return watermark
+
+def discover_all_releases(repos_config: List[Dict], max_versions: int = MAX_VERSIONS) -> Dict[str, Dict]:
+    """
+    扫描阶段：用批量GraphQL查询获取所有仓库的Releases，替代逐个仓库的REST请求
+    :param repos_config: 仓库配置列表
+    :param max_versions: 每个仓库获取的版本数量
+    :return: {state_key: {"releases": [...], "readme_oid": ...}}；不可用时返回空字典（全部回退到REST）
+    """
+    if not GRAPHQL_DISCOVERY or not http_client.GITHUB_TOKEN:
+        return {}
+    try:
+        with HOST_LIMITER.slot(GRAPHQL_URL):
+            discovered = discover_releases(repos_config, max_versions, include_readme=True)
+    except GraphQLDiscoveryError as e:
+        print(f"⚠️  GraphQL批量发现失败，回退到REST接口：{str(e)}")
+        return {}
+    print(f"ℹ️  GraphQL批量发现完成：{len(discovered)}/{len(repos_config)} 个仓库")
+    return discovered
+
+
 def sanitize_version(version: str) -> str:
     """清理版本号中的非法字符，确保可以作为目录名"""
     invalid_chars = '/\\:*?"<>|'
@@ -139,55 +280,98 @@ def sanitize_version(version: str) -> str:
         version = version.replace(char, '-')
     return version
 
-def download_asset(asset: Dict, save_dir: str) -> bool:
-    """下载单个Release附件，返回是否成功"""
+def download_asset(asset: Dict, save_dir: str, show_progress: bool = True) -> Optional[str]:
+    """
+    下载单个Release附件（进度由共享的 PROGRESS 节流输出，并发下载时汇总为一行）
+    :return: 保存内容的SHA-256（文件是存储中该blob的硬链接；已存在的文件无法确认摘要时为空字符串），失败时返回None
+    """
     asset_id = asset["id"]
     asset_name = asset["name"]
     download_url = asset["browser_download_url"]
     asset_size_mb = asset["size"] / (1024 * 1024)  # 转换为MB
     save_path = os.path.join(save_dir, asset_name)
 
-    # 检查本地是否已存在完整文件（避免重复下载）
+    # 已知摘要且内容已在存储中（如同一安装包被发布到多个仓库/标签）：直接建立硬链接（替换已有文件），无需下载
+    expected_sha256 = parse_digest(asset)
+    if BLOB_STORE.has(expected_sha256):
+        BLOB_STORE.link(expected_sha256, save_path)
+        print(f"  ♻️  内容已存在，复用：{asset_name}（{asset_size_mb:.2f}MB）")
+        return expected_sha256
+
+    # 检查本地是否已存在完整文件（避免重复下载）：有GitHub摘要时按SHA-256校验并纳入存储，没有摘要时只能按大小判断
     if os.path.exists(save_path):
-        local_size_mb = os.path.getsize(save_path) / (1024 * 1024)
-        if abs(local_size_mb - asset_size_mb) < 0.01:  # 误差小于0.01MB视为完整
+        if expected_sha256:
+            if file_sha256(save_path) == expected_sha256:
+                BLOB_STORE.adopt(save_path, expected_sha256)
+                print(f"  ✅ 已存在：{asset_name}（{asset_size_mb:.2f}MB，SHA-256校验通过）")
+                return expected_sha256
+            print(f"  ⚠️  已存在的文件与GitHub摘要不一致，重新下载：{asset_name}")
+        elif os.path.getsize(save_path) == asset["size"]:
             print(f"  ✅ 已存在：{asset_name}（{asset_size_mb:.2f}MB）")
-            return True
+            return ""
 
-    # 流式下载（支持大文件，避免内存占用过高）
+    # 下载到存储的临时目录：写入 .part 文件并记录续传信息，中断后（含CI缓存恢复后）从断点继续
     print(f"  📥 下载中：{asset_name}（{asset_size_mb:.2f}MB）")
+    tmp_path = BLOB_STORE.temp_path(f"{asset_id}-{asset_name}")
     try:
-        with requests.get(
-                download_url,
-                headers={"Authorization": f"token {GITHUB_TOKEN}"} if GITHUB_TOKEN else {},
-                stream=True,
-                timeout=60
-        ) as resp:
-            resp.raise_for_status()
-            with open(save_path, "wb") as f:
-                total_size = int(resp.headers.get("content-length", 0))
-                downloaded_size = 0
-                for chunk in resp.iter_content(chunk_size=8192):  # 8KB分片写入
-                    if chunk:
-                        f.write(chunk)
-                        downloaded_size += len(chunk)
-                        # 显示下载进度（仅当能获取总大小时）
-                        if total_size > 0:
-                            progress = (downloaded_size / total_size) * 100
-                            print(f"\r  进度：{progress:.1f}%", end="")
-        print(f"\n  ✅ 下载完成：{asset_name}")
-        return True
+        # 大文件：探测Range支持后多连接分段下载（不支持时自动退化为单连接）
+        segments = DOWNLOAD_SEGMENTS if asset["size"] >= SEGMENTED_DOWNLOAD_THRESHOLD else 1
+        result = download_resumable(
+            download_url,
+            tmp_path,
+            segments=segments,
+            timeout=60,
+            expected_size=asset["size"],
+            show_progress=show_progress,
+            compute_sha256=True,
+            expected_sha256=expected_sha256,  # 有GitHub摘要时由下载引擎比对
+            limiter=HOST_LIMITER  # 探测、镜像竞速与每个分段的连接各占一个槽位
+        )
+        actual_sha256 = result.sha256
+
+        # 校验完整性：比对大小（有GitHub摘要时下载引擎已比对SHA-256）
+        if os.path.getsize(tmp_path) != asset["size"]:
+            raise IOError(f"文件大小不一致：预期 {asset['size']} 字节，实际 {os.path.getsize(tmp_path)} 字节")
+
+        BLOB_STORE.ingest(tmp_path, actual_sha256)
+        BLOB_STORE.link(actual_sha256, save_path)
+        print(f"\n  ✅ 下载完成：{asset_name}（sha256:{actual_sha256[:12]}）")
+        return actual_sha256
     except Exception as e:
         print(f"\n  ❌ 下载失败：{asset_name} - {str(e)}")
-        # 清理未下载完成的文件
-        if os.path.exists(save_path) and os.path.getsize(save_path) < asset["size"]:
-            os.remove(save_path)
-        return False
+        # 已完成但校验失败的文件直接删除；未完成的 .part 文件保留，下次运行续传
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        return None
 
 
 # ------------------- 核心逻辑：单仓库处理 -------------------
-def process_single_repo(repo_config: Dict, all_states: Dict[str, Dict[int, str]], max_versions: int = MAX_VERSIONS) -> Dict[str, Dict[int, str]]:
-    """处理单个仓库的增量下载，返回更新后的全局状态"""
+def collect_undownloaded_assets(releases: List[Dict], repo_state: Dict[int, str],
+                                asset_filter: Optional[AssetFilter] = None) -> List[Dict]:
+    """
+    筛选未下载的附件（基于状态文件中的Asset ID与仓库的筛选规则），并给附件绑定版本信息；
+    被筛选规则跳过的未下载附件计入 FILTER_REPORT
+    """
+    asset_filter = asset_filter or AssetFilter()
+    kept, skipped = asset_filter.split(releases)
+    skipped_assets = [asset for asset in skipped if asset["id"] not in repo_state]
+    if skipped_assets:
+        FILTER_REPORT.record(skipped_assets)
+        skipped_mb = sum(asset.get("size", 0) for asset in skipped_assets) / (1024 * 1024)
+        print(f"  🚫 筛选规则跳过：{len(skipped_assets)} 个附件（{skipped_mb:.2f}MB）")
+
+    undownloaded_assets = []
+    for release, asset in kept:
+        if asset["id"] not in repo_state:
+            asset["version"] = sanitize_version(release["tag_name"])  # 清理版本号并给附件绑定版本信息
+            asset["release_published_at"] = release.get("published_at")  # 用于最新版本优先的调度
+            undownloaded_assets.append(asset)
+    return undownloaded_assets
+
+
+def process_single_repo(repo_config: Dict, store: StateStore, max_versions: int = MAX_VERSIONS,
+                        prefetched_releases: Optional[List[Dict]] = None) -> None:
+    """处理单个仓库的增量下载，每个附件下载成功后立即写入状态库（prefetched_releases为批量发现的结果）"""
     # 提取当前仓库配置
     repo_owner = repo_config["repo_owner"]
     repo_name = repo_config["repo_name"]
@@ -195,6 +379,7 @@ def process_single_repo(repo_config: Dict, all_states: Dict[str, Dict[int, str]]
     state_key = repo_config["state_key"]
     # 最终保存目录：基础目录/仓库名/版本号（如./Releases/dnSpy/v6.2.0）
     repo_root_dir = os.path.join(base_save_dir, repo_name)
+    max_versions = repo_config.get("max_versions", max_versions)  # 仓库单独配置的版本数量优先
 
     # 打印仓库处理信息
     print(f"\n" + "=" * 70)
@@ -208,32 +393,37 @@ def process_single_repo(repo_config: Dict, all_states: Dict[str, Dict[int, str]]
     os.makedirs(repo_root_dir, exist_ok=True)
 
     # 2. 加载当前仓库的已下载状态
-    repo_state = all_states.get(state_key, {})
+    repo_state = store.repo_assets(state_key)
     print(f"  ℹ️  已下载文件数量：{len(repo_state)} 个")
 
     try:
-        # 3. 获取仓库最新的Releases
-        releases = fetch_repo_releases(repo_owner, repo_name, max_versions)
+        # 3. 获取仓库比水位线新的Releases（已批量发现时直接复用）
+        watermark = load_watermark(store, repo_config, max_versions)
+        if prefetched_releases is None:
+            releases = fetch_repo_releases(repo_owner, repo_name, max_versions, watermark)
+        else:
+            releases = releases_after_watermark(prefetched_releases, watermark)
+        if watermark and not releases:
+            print(f"  ⏭️  最新Release未变化（{watermark.get('tag_name')}），跳过")
+            return
         if not releases:
             print(f"  ⚠️  未获取到任何Releases（可能仓库无Release或权限不足）")
-            return all_states
+            return
         print(f"  ℹ️  获取到的Releases数量：{len(releases)} 个")
 
         # 4. 筛选未下载的附件（基于状态文件中的Asset ID）
-        undownloaded_assets = []
-        for release in releases:
-            release_version = sanitize_version(release["tag_name"])  # 清理版本号
-            for asset in release["assets"]:
-                if asset["id"] not in repo_state:
-                    asset["version"] = release_version  # 给附件绑定版本信息
-                    undownloaded_assets.append(asset)
+        undownloaded_assets = collect_undownloaded_assets(releases, repo_state, repo_config.get("asset_filter"))
 
         if not undownloaded_assets:
+            advance_watermark(store, repo_config, releases, max_versions)
             print(f"  🎉 无新文件需要更新，所有附件均已下载")
-            return all_states
+            return
         print(f"  🔍 发现未下载文件：{len(undownloaded_assets)} 个")
 
-        # 5. 下载未下载的附件并更新状态
+        # 5. 按调度策略排序后下载未下载的附件并更新状态
+        undownloaded_assets.sort(key=lambda asset: policy_key(DEFAULT_POLICY, asset["size"],
+                                                              asset.get("release_published_at"),
+                                                              repo_config.get("priority", 1.0)))
         success_count = 0
         for asset in undownloaded_assets:
             # 为当前版本创建单独目录
@@ -241,54 +431,225 @@ def process_single_repo(repo_config: Dict, all_states: Dict[str, Dict[int, str]]
             os.makedirs(version_dir, exist_ok=True)
 
             # 下载附件并记录状态
-            if download_asset(asset, version_dir):
-                repo_state[asset["id"]] = asset["name"]
+            if download_asset(asset, version_dir) is not None:
+                store.mark_downloaded(state_key, asset["id"], asset["name"])
                 success_count += 1
 
-        # 6. 更新全局状态
-        all_states[state_key] = repo_state
-
-        # 7. 打印处理结果
+        # 6. 推进水位线并打印处理结果
+        advance_watermark(store, repo_config, releases, max_versions)
         print(f"\n  📊 仓库处理完成！")
         print(f"  - 本次成功下载：{success_count} 个文件")
-        print(f"  - 累计已下载：{len(repo_state)} 个文件")
+        print(f"  - 累计已下载：{len(store.repo_assets(state_key))} 个文件")
 
     except Exception as e:
         print(f"  ❌ 仓库处理失败：{str(e)}")
 
-    return all_states
 
+# ------------------- 数据源：接入统一的调度器 -------------------
+class GitHubSource(Source):
+    """
+    GitHub Releases 数据源：扫描线程池负责获取Releases和README，发现的附件立即投递到调度器共享的下载线程池，
+    因此扫描与下载相互重叠。每个附件完成后立即提交到状态库（状态库内部加锁），计数器由_lock保护。
+    """
+
+    name = "github"
+
+    def __init__(self, repos_config: Optional[List[Dict]] = None, max_versions: int = MAX_VERSIONS):
+        super().__init__()
+        self.repos_config = repos_config
+        self.max_versions = max_versions
+        self._lock = threading.Lock()
+        self._pending_counts: Dict[str, int] = {}  # 每个仓库尚未完成的附件数量
+        self._success_counts: Dict[str, int] = {}
+        self._scanned: Dict[str, Tuple[Dict, List[Dict]]] = {}  # state_key -> (仓库配置, 本次列出的比水位线新的Release)
+
+    def _load_config(self) -> List[Dict]:
+        if self.repos_config is None:
+            self.repos_config = load_repo_configs_from_yaml(REPO_CONFIG_YAML)
+            print(f"ℹ️  从YAML加载配置成功，共 {len(self.repos_config)} 个仓库")
+        return self.repos_config
+
+    def _make_item(self, repo_config: Dict, asset: Dict) -> WorkItem:
+        repo_owner = repo_config["repo_owner"]
+        repo_name = repo_config["repo_name"]
+        version_dir = os.path.join(repo_config["base_save_dir"], repo_name, asset["version"])
+        return WorkItem(
+            source=self.name,
+            key=f"{repo_config['state_key']}/{asset['id']}",
+            url=asset["browser_download_url"],
+            size=asset["size"],
+            label=f"{repo_owner}/{repo_name} {asset['name']}",
+            group=f"{repo_owner}/{repo_name}",
+            released_at=asset.get("release_published_at"),
+            priority=repo_config.get("priority", 1.0),
+            payload={"repo_config": repo_config, "asset": asset, "version_dir": version_dir},
+            local_path=os.path.join(version_dir, asset["name"]),
+            upload_path=os.path.join(repo_name, asset["version"], asset["name"]),
+        )
+
+    def _submit(self, submit: Callable[[WorkItem], bool], item: WorkItem) -> bool:
+        """投递文件并计入仓库的未完成数量（先计数，避免下载线程先于计数完成）"""
+        state_key = item.payload["repo_config"]["state_key"]
+        with self._lock:
+            self._pending_counts[state_key] = self._pending_counts.get(state_key, 0) + 1
+        if submit(item):
+            return True
+        with self._lock:
+            self._pending_counts[state_key] -= 1
+        return False
 
-def get_github_readme_content(repo_config: Dict):
+    def probe(self, submit: Callable[[WorkItem], bool]) -> None:
+        self._load_config()
+
+        # 批量发现所有仓库的Releases（GraphQL，一到两次请求），缺失的仓库回退到REST接口
+        discovered = discover_all_releases(self.repos_config, self.max_versions)
+        with ThreadPoolExecutor(max_workers=SCAN_WORKERS, thread_name_prefix="scan") as scan_pool:
+            scan_futures = {
+                scan_pool.submit(self._scan_repo, repo_config, discovered, submit): repo_config
+                for repo_config in self.repos_config
+            }
+        for future, repo_config in scan_futures.items():
+            if future.exception():
+                print(f"  ❌ {repo_config['repo_owner']}/{repo_config['repo_name']} 扫描失败：{future.exception()}")
+
+    def _scan_repo(self, repo_config: Dict, discovered: Dict[str, Dict], submit: Callable[[WorkItem], bool]) -> None:
+        repo_owner = repo_config["repo_owner"]
+        repo_name = repo_config["repo_name"]
+        state_key = repo_config["state_key"]
+        watermark = load_watermark(self.store, repo_config, self.max_versions)
+
+        try:
+            with METRICS.timer("repo_scan_seconds", repo=f"{repo_owner}/{repo_name}"):
+                if state_key in discovered:
+                    releases = releases_after_watermark(discovered[state_key]["releases"], watermark)
+                else:
+                    releases = fetch_repo_releases(repo_owner, repo_name,
+                                                   repo_config.get("max_versions", self.max_versions), watermark)
+        except Exception as e:
+            METRICS.inc("repo_scan_errors_total", repo=f"{repo_owner}/{repo_name}")
+            print(f"  ❌ {repo_owner}/{repo_name} 仓库处理失败：{str(e)}")
+            releases = None
+
+        if watermark and releases == []:
+            METRICS.inc("repo_unchanged_total")
+            print(f"  ⏭️  {repo_owner}/{repo_name} 最新Release未变化（{watermark.get('tag_name')}），跳过")
+        releases = releases or []
+
+        with self._lock:
+            if releases:
+                self._scanned[state_key] = (repo_config, releases)
+            undownloaded_assets = collect_undownloaded_assets(releases, self.store.repo_assets(state_key),
+                                                              repo_config.get("asset_filter"))
+
+        if releases and not undownloaded_assets:
+            print(f"  🎉 {repo_owner}/{repo_name} 无新文件需要更新，所有附件均已下载")
+        elif undownloaded_assets:
+            print(f"  🔍 {repo_owner}/{repo_name} 发现未下载文件：{len(undownloaded_assets)} 个")
+
+        for asset in undownloaded_assets:
+            self._submit(submit, self._make_item(repo_config, asset))
+
+        if not self.dry_run:
+            get_github_readme_content(repo_config, self.store, discovered.get(state_key, {}).get("readme_oid"))
+
+    def download(self, item: WorkItem) -> bool:
+        os.makedirs(item.payload["version_dir"], exist_ok=True)
+        sha256 = download_asset(item.payload["asset"], item.payload["version_dir"])
+        if sha256 is None:
+            return False
+        if sha256:
+            # 版本目录中的文件是blob的硬链接：上传阶段据此去重，并在上传后清理blob
+            item.sha256 = sha256
+            item.blob_path = BLOB_STORE.blob_path(sha256)
+        return True
+
+    def complete(self, item: WorkItem, ok: bool) -> None:
+        repo_config = item.payload["repo_config"]
+        asset = item.payload["asset"]
+        state_key = repo_config["state_key"]
+        if ok:
+            self.store.mark_downloaded(state_key, asset["id"], asset["name"])
+        with self._lock:
+            if ok:
+                self._success_counts[state_key] = self._success_counts.get(state_key, 0) + 1
+            self._pending_counts[state_key] -= 1
+            if self._pending_counts[state_key] == 0:
+                print(f"  📊 {repo_config['repo_owner']}/{repo_config['repo_name']} 处理完成，"
+                      f"本次成功下载：{self._success_counts.get(state_key, 0)} 个文件，"
+                      f"累计已下载：{len(self.store.repo_assets(state_key))} 个文件")
+
+    def checkpoint_item(self, item: WorkItem) -> Dict:
+        # 仓库配置含筛选器对象，只保存state_key，恢复时从YAML配置中查找
+        return {"state_key": item.payload["repo_config"]["state_key"], "asset": item.payload["asset"]}
+
+    def restore_item(self, record: Dict) -> Optional[WorkItem]:
+        repo_config = next((config for config in self._load_config() if config["state_key"] == record["state_key"]),
+                           None)
+        if repo_config is None or self.store.is_downloaded(record["state_key"], record["asset"]["id"]):
+            return None  # 仓库已从配置中移除，或附件已下载
+        with self._lock:
+            self._pending_counts[record["state_key"]] = self._pending_counts.get(record["state_key"], 0) + 1
+        return self._make_item(repo_config, record["asset"])
+
+    def finish(self) -> None:
+        for repo_config, releases in self._scanned.values():
+            advance_watermark(self.store, repo_config, releases, self.max_versions)
+        finish_run()
+
+
+def finish_run() -> None:
+    """清理未被引用的存储内容，并打印筛选规则与API缓存的统计"""
+    freed = BLOB_STORE.prune(BLOB_STORE_MAX_BYTES)
+    if freed:
+        print(f"🧹 已清理未引用的存储内容：{freed / (1024 * 1024):.2f}MB")
+    print(f"  - {FILTER_REPORT.report()}")
+    print(f"  - {API_CACHE.report()}")
+
+
+def get_github_readme_content(repo_config: Dict, store: Optional[StateStore] = None,
+                              readme_oid: Optional[str] = None) -> Optional[str]:
+    """
+    保存仓库的README；状态库中记录已写出README的blob SHA：
+    - 批量发现得到的 readme_oid 与记录相同时完全跳过请求
+    - REST响应中的 sha 与记录相同时跳过解码与写入（本地文件已被rsync移走时也不再重写，避免重复上传）
+    :return: README内容，未变化或失败时返回None
+    """
     # 1. 构造 GitHub API 请求 URL（获取 README 信息）
     repo_owner = repo_config["repo_owner"]
     repo_name = repo_config["repo_name"]
     base_save_dir = repo_config["base_save_dir"]
     repo_root_dir = os.path.join(base_save_dir, repo_name)
-    api_url = f"https://api.github.com/repos/{repo_owner}/{repo_name}/readme"
+    api_url = f"{http_client.GITHUB_API_URL}/repos/{repo_owner}/{repo_name}/readme"
+    written_sha = store.get(README_NS, repo_config["state_key"]) if store else None
+    if readme_oid and readme_oid == written_sha:
+        METRICS.inc("readme_total", result="skipped")
+        return None
 
     try:
-        # 2. 发送 GET 请求（无需认证，公开仓库可直接访问）
-        response = requests.get(api_url)
-        # 检查请求是否成功（200 表示成功）
-        response.raise_for_status()
+        # 2. 发送条件 GET 请求（认证头由共享客户端统一附加；未变化时返回304使用缓存）
+        with HOST_LIMITER.slot(api_url):
+            readme_info = API_CACHE.get_json(api_url, timeout=30)
 
         # 3. 解析 JSON 响应，提取 download_url 和 Base64 编码的内容
-        readme_info = response.json()
         download_url = readme_info.get("download_url")  # 提取下载链接
         base64_content = readme_info.get("content")  # 提取 Base64 编码的内容
 
         if not download_url or not base64_content:
             print("Error: 未找到 download_url 或 README 内容")
             return None
+        if readme_info.get("sha") and readme_info["sha"] == written_sha:
+            METRICS.inc("readme_total", result="unchanged")
+            return None
 
         # 4. 解码 Base64 内容（注意去除换行符，Base64 编码不允许多余换行）
         base64_content_clean = base64_content.replace("\n", "")  # 清理编码内容
         decoded_content = base64.b64decode(base64_content_clean).decode("utf-8")  # 解码为 UTF-8 文本
-        # （可选）将内容写入本地文件
-        with open(f"{repo_root_dir}/ReadMe.md", "w", encoding="utf-8") as f:
-            f.write(decoded_content)
+        # 内容与本地文件相同时不写入（保留mtime）
+        if write_if_changed(f"{repo_root_dir}/ReadMe.md", decoded_content):
+            METRICS.inc("readme_total", result="written")
             print(f"README.md 已保存到本地：{repo_root_dir}/ReadMe.md")
+        if store and readme_info.get("sha"):
+            store.put(README_NS, repo_config["state_key"], readme_info["sha"])
 
         return decoded_content
 
@@ -299,9 +660,15 @@ def get_github_readme_content(repo_config: Dict):
 
 # ------------------- 主函数：批量处理所有仓库 -------------------
 def main():
+    import yaml
+
+    from model.orchestrator import Orchestrator  # 入口函数才依赖调度器（数据源模块本身不依赖它）
+
     print("=" * 70)
     print(f"🚀 多仓库GitHub Releases增量下载工具（YAML配置版）")
     print(f"  - 仅获取最新的 {MAX_VERSIONS} 个版本")
+    if CONCURRENT_MODE:
+        print(f"  - 并发模式：全局 {MAX_CONNECTIONS} 个连接，单主机 {MAX_CONNECTIONS_PER_HOST} 个连接")
     print("=" * 70)
     try:
         # 1. 加载YAML仓库配置
@@ -311,18 +678,29 @@ def main():
         print(f"❌ 配置加载失败：{str(e)}")
         return
 
-    # 2. 加载全局下载状态
-    all_states = load_all_repos_downloaded_state()
-
-    # 3. 遍历所有仓库批量处理
-    for repo_idx, repo_config in enumerate(REPOS_CONFIG, 1):
-        print(f"\n【{repo_idx}/{len(REPOS_CONFIG)}】")
-        all_states = process_single_repo(repo_config, all_states)
-        ## 打印ReadME内容
-        get_github_readme_content(repo_config)
-        # 每处理完一个仓库保存一次状态，避免意外丢失
-        save_all_repos_downloaded_state(all_states)
+    # 2. 打开全局下载状态库（每个附件完成后立即提交）
+    store = open_state_store()
 
+    # 3. 批量处理所有仓库（并发模式下由调度器并行扫描与下载）
+    try:
+        if CONCURRENT_MODE:
+            orchestrator = Orchestrator([GitHubSource(REPOS_CONFIG)], store, download_workers=MAX_WORKERS)
+            orchestrator.run()
+            orchestrator.print_report()
+            orchestrator.write_reports()
+        else:
+            # 批量发现所有仓库的Releases（GraphQL，一到两次请求）
+            discovered = discover_all_releases(REPOS_CONFIG)
+            for repo_idx, repo_config in enumerate(REPOS_CONFIG, 1):
+                print(f"\n【{repo_idx}/{len(REPOS_CONFIG)}】")
+                prefetched = discovered.get(repo_config["state_key"], {}).get("releases")
+                process_single_repo(repo_config, store, prefetched_releases=prefetched)
+                ## 打印ReadME内容
+                get_github_readme_content(repo_config, store,
+                                          discovered.get(repo_config["state_key"], {}).get("readme_oid"))
+            finish_run()
+    finally:
+        store.close()
 
     # 4. 打印最终结果
     print(f"\n" + "=" * 70)
@@ -0,0 +1,119 @@
+import json
+import os
+from typing import Dict, List, Optional
+
+import requests
+
+from model import http_client
+
+GRAPHQL_URL: str = os.environ.get("GITHUB_GRAPHQL_URL", f"{http_client.GITHUB_API_URL}/graphql")
+REPOS_PER_QUERY: int = 20  # 每个GraphQL查询合并的仓库数量（别名 r0, r1, ...）
+ASSETS_PER_RELEASE: int = 100  # 每个Release最多获取的附件数量
+README_PATHS = ["README.md", "readme.md", "Readme.md", "README.MD", "README"]  # 探测README blob OID的常见文件名
+
+RELEASE_FIELDS = """
+      releases(first: %(max_versions)d, orderBy: {field: CREATED_AT, direction: DESC}) {
+        nodes {
+          databaseId
+          tagName
+          name
+          isPrerelease
+          isDraft
+          publishedAt
+          releaseAssets(first: %(max_assets)d) {
+            nodes { databaseId name size contentType downloadUrl digest }
+          }
+        }
+      }"""
+
+
+class GraphQLDiscoveryError(Exception):
+    """GraphQL批量发现失败（未配置令牌、网络错误或查询返回errors），调用方应回退到REST接口"""
+
+
+def _build_query(repos: List[Dict], max_versions: int, include_readme: bool) -> str:
+    """为一批仓库构造带别名的GraphQL查询（仓库配置了 max_versions 时优先使用）"""
+    blocks = []
+    for index, repo_config in enumerate(repos):
+        release_fields = RELEASE_FIELDS % {
+            "max_versions": repo_config.get("max_versions", max_versions),
+            "max_assets": ASSETS_PER_RELEASE,
+        }
+        readme_fields = ""
+        if include_readme:
+            readme_fields = "".join(
+                f'\n      readme{path_index}: object(expression: {json.dumps("HEAD:" + path)}) {{ ... on Blob {{ oid }} }}'
+                for path_index, path in enumerate(README_PATHS)
+            )
+        blocks.append(
+            f'  r{index}: repository(owner: {json.dumps(repo_config["repo_owner"])}, '
+            f'name: {json.dumps(repo_config["repo_name"])}) {{{release_fields}{readme_fields}\n  }}'
+        )
+    return "query {\n" + "\n".join(blocks) + "\n}"
+
+
+def _to_rest_release(node: Dict) -> Dict:
+    """把GraphQL的Release节点转换为REST接口的字段格式，便于复用后续的附件筛选逻辑"""
+    return {
+        "id": node["databaseId"],
+        "tag_name": node["tagName"],
+        "name": node.get("name"),
+        "prerelease": node.get("isPrerelease", False),
+        "draft": node.get("isDraft", False),
+        "published_at": node.get("publishedAt"),
+        "assets": [
+            {
+                "id": asset["databaseId"],
+                "name": asset["name"],
+                "size": asset["size"],
+                "content_type": asset.get("contentType"),
+                "browser_download_url": asset["downloadUrl"],
+                "digest": asset.get("digest"),  # 形如 "sha256:<hex>"，用于下载校验与内容去重
+            }
+            for asset in node["releaseAssets"]["nodes"]
+        ],
+    }
+
+
+def discover_releases(repos: List[Dict], max_versions: int, include_readme: bool = False) -> Dict[str, Dict]:
+    """
+    用少量带别名的GraphQL查询批量获取所有仓库最新的Releases（及可选的README blob OID）
+    :param repos: 仓库配置列表
+    :param max_versions: 每个仓库获取的最新版本数量（仓库未单独配置 max_versions 时使用）
+    :param include_readme: 是否同时获取README的blob OID
+    :return: {state_key: {"releases": [REST格式的Release], "readme_oid": Optional[str]}}
+    :raises GraphQLDiscoveryError: 未配置令牌或查询失败
+    """
+    if not http_client.GITHUB_TOKEN:
+        raise GraphQLDiscoveryError("GraphQL接口需要GITHUB_TOKEN")
+
+    results: Dict[str, Dict] = {}
+    for batch_start in range(0, len(repos), REPOS_PER_QUERY):
+        batch = repos[batch_start:batch_start + REPOS_PER_QUERY]
+        query = _build_query(batch, max_versions, include_readme)
+        try:
+            response = http_client.request("POST", GRAPHQL_URL, json={"query": query}, timeout=60)
+            response.raise_for_status()
+            payload = response.json()
+        except (requests.exceptions.RequestException, ValueError) as e:
+            raise GraphQLDiscoveryError(f"GraphQL请求失败：{str(e)}")
+
+        data = payload.get("data") or {}
+        if payload.get("errors") and not data:
+            raise GraphQLDiscoveryError(f"GraphQL查询出错：{payload['errors'][0].get('message')}")
+
+        for index, repo_config in enumerate(batch):
+            repository = data.get(f"r{index}")
+            if repository is None:
+                continue  # 仓库不存在或无权限，交给REST接口单独处理
+            readme_oid: Optional[str] = None
+            for path_index in range(len(README_PATHS) if include_readme else 0):
+                blob = repository.get(f"readme{path_index}")
+                if blob and blob.get("oid"):
+                    readme_oid = blob["oid"]
+                    break
+            results[repo_config["state_key"]] = {
+                "releases": [_to_rest_release(node) for node in repository["releases"]["nodes"]],
+                "readme_oid": readme_oid,
+            }
+    return results
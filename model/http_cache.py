@@ -0,0 +1,100 @@
+import hashlib
+import json
+import os
+import threading
+from typing import Any, Dict, Optional
+
+import requests
+
+from model import http_client
+from model.metrics import METRICS
+
+
+class ConditionalCache:
+    """
+    基于URL的HTTP校验缓存：持久化保存ETag/Last-Modified与响应体，
+    再次请求时发送If-None-Match/If-Modified-Since，服务端返回304时直接使用本地缓存。
+    GitHub API的304响应不计入速率限制，未配置令牌时（每小时60次）尤为重要。
+    """
+
+    def __init__(self, cache_dir: str):
+        """
+        初始化缓存
+        :param cache_dir: 缓存目录（每个URL一个JSON文件，只在内容变化时重写）
+        """
+        self.cache_dir = cache_dir
+        self.hits = 0  # 304命中次数
+        self.misses = 0  # 重新下载次数
+        self._lock = threading.Lock()
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def _entry_path(self, url: str) -> str:
+        return os.path.join(self.cache_dir, f"{hashlib.sha1(url.encode('utf-8')).hexdigest()}.json")
+
+    def _load_entry(self, url: str) -> Optional[Dict[str, Any]]:
+        path = self._entry_path(url)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return None
+        return entry if entry.get("url") == url else None
+
+    def _save_entry(self, url: str, entry: Dict[str, Any]) -> None:
+        path = self._entry_path(url)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(entry, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp_path, path)
+
+    def get_json(self, url: str, headers: Optional[Dict[str, str]] = None,
+                 params: Optional[Dict[str, Any]] = None, timeout: int = 30) -> Any:
+        """
+        发送条件请求并返回解析后的JSON
+        :param url: 请求地址
+        :param headers: 额外请求头（如Authorization）
+        :param params: 查询参数（参与缓存键计算）
+        :param timeout: 超时时间（秒）
+        :return: 响应JSON（304时为缓存内容）
+        :raises requests.exceptions.RequestException: 请求失败或返回错误状态码
+        """
+        full_url = requests.Request("GET", url, params=params).prepare().url
+        entry = self._load_entry(full_url)
+
+        request_headers = dict(headers or {})
+        if entry:
+            if entry.get("etag"):
+                request_headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                request_headers["If-Modified-Since"] = entry["last_modified"]
+
+        response = http_client.get(full_url, headers=request_headers, timeout=timeout)
+        if response.status_code == 304 and entry:
+            with self._lock:
+                self.hits += 1
+            METRICS.inc("http_cache_total", result="hit")
+            return entry["body"]
+
+        response.raise_for_status()
+        body = response.json()
+        with self._lock:
+            self.misses += 1
+        METRICS.inc("http_cache_total", result="miss")
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+        if etag or last_modified:
+            self._save_entry(full_url, {
+                "url": full_url,
+                "etag": etag,
+                "last_modified": last_modified,
+                "body": body,
+            })
+        return body
+
+    def report(self) -> str:
+        """返回本次运行的缓存命中统计"""
+        total = self.hits + self.misses
+        rate = (self.hits / total * 100) if total else 0.0
+        return f"HTTP缓存命中：{self.hits} 次，未命中：{self.misses} 次（命中率 {rate:.1f}%）"
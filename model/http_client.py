@@ -0,0 +1,123 @@
+import os
+import random
+import threading
+import time
+from typing import Dict, Optional
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from config import browser_headers_list
+from model.metrics import METRICS
+from model.request_scheduler import MAX_RETRIES, RETRY_STATUS_CODES, RequestScheduler
+
+# ------------------- 连接与认证配置（所有数据源共用） -------------------
+GITHUB_TOKEN: Optional[str] = os.environ.get("GITHUB_TOKEN", "")  # GitHub令牌（为空时按匿名限额请求）
+GITHUB_API_URL: str = os.environ.get("GITHUB_API_URL", "https://api.github.com").rstrip("/")  # GitHub API地址（Actions中自动设置，基准测试指向本地模拟服务）
+# 需要附带GitHub认证与API头的主机：只限API主机，附件下载地址（github.com 及其重定向的存储主机）按普通下载处理，
+# 不携带令牌与API的Accept头
+GITHUB_HOSTS = {"api.github.com", urlparse(GITHUB_API_URL).netloc.lower()}
+CONNECT_TIMEOUT: float = 10  # 建立连接超时（秒）
+READ_TIMEOUT: float = 60  # 读取数据超时（秒）
+POOL_CONNECTIONS: int = 16  # 缓存的主机连接池数量
+POOL_MAXSIZE: int = 16  # 每个主机连接池保持的keep-alive连接数（需不小于单主机并发数）
+
+GITHUB_API_HEADERS = {
+    "Accept": "application/vnd.github+json",
+    "X-GitHub-Api-Version": "2022-11-28",
+    "User-Agent": "Monitoring-updates",
+}
+
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+SCHEDULER = RequestScheduler()  # 按主机的限流调度与重试（GitHub、JetBrains、网页版本探测共用）
+
+# 可重试的连接层错误（连接被重置、超时、响应体中断）
+RETRYABLE_ERRORS = (
+    requests.exceptions.ConnectionError,
+    requests.exceptions.Timeout,
+    requests.exceptions.ChunkedEncodingError,
+)
+
+
+def get_session() -> requests.Session:
+    """返回进程内共享的Session（按主机复用keep-alive连接，避免每次请求重新TLS握手）"""
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=POOL_CONNECTIONS, pool_maxsize=POOL_MAXSIZE, pool_block=False)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _session = session
+        return _session
+
+
+def default_headers(url: str) -> Dict[str, str]:
+    """
+    按目标主机生成默认请求头
+    :param url: 请求地址
+    :return: GitHub主机使用API头（有令牌时附带认证），其他站点随机使用一组浏览器头
+    """
+    host = urlparse(url).netloc.lower()
+    if host in GITHUB_HOSTS:
+        headers = dict(GITHUB_API_HEADERS)
+        if GITHUB_TOKEN:
+            headers["Authorization"] = f"token {GITHUB_TOKEN}"
+        return headers
+    return dict(random.choice(browser_headers_list))
+
+
+def request(method: str, url: str, headers: Optional[Dict[str, str]] = None, timeout=None, **kwargs) -> requests.Response:
+    """
+    通过共享Session发送请求：发送前由调度器按主机限速/等待限流重置，
+    限流（403/429）、5xx与连接重置时按Retry-After或带抖动的指数退避自动重试
+    :param method: HTTP方法
+    :param url: 请求地址
+    :param headers: 额外请求头（覆盖默认头）
+    :param timeout: 超时时间，默认为 (CONNECT_TIMEOUT, READ_TIMEOUT)
+    :param kwargs: 透传给 requests.Session.request 的参数（stream、params、verify等）
+    :return: 响应对象
+    """
+    merged_headers = default_headers(url)
+    if headers:
+        merged_headers.update(headers)
+    if timeout is None:
+        timeout = (CONNECT_TIMEOUT, READ_TIMEOUT)
+    host = urlparse(url).netloc.lower()
+    for attempt in range(MAX_RETRIES + 1):
+        SCHEDULER.before_request(url)
+        started = time.perf_counter()
+        try:
+            response = get_session().request(method, url, headers=merged_headers, timeout=timeout, **kwargs)
+        except RETRYABLE_ERRORS as e:
+            METRICS.inc("http_errors_total", host=host, error=type(e).__name__)
+            if attempt == MAX_RETRIES:
+                raise
+            METRICS.inc("http_retries_total", host=host)
+            SCHEDULER.wait_before_retry(url, attempt, f"连接失败（{type(e).__name__}）")
+            continue
+        # 流式请求只统计到响应头返回的耗时（响应体的传输计入下载指标）
+        METRICS.observe("http_request_seconds", time.perf_counter() - started, host=host, method=method)
+        METRICS.inc("http_requests_total", host=host, method=method, status=response.status_code)
+
+        retry_delay = SCHEDULER.after_response(url, response)
+        is_retryable = retry_delay is not None or response.status_code in RETRY_STATUS_CODES
+        if not is_retryable or attempt == MAX_RETRIES:
+            return response
+        response.close()
+        METRICS.inc("http_retries_total", host=host)
+        SCHEDULER.wait_before_retry(url, attempt, f"HTTP {response.status_code}", retry_delay)
+    return response
+
+
+def get(url: str, **kwargs) -> requests.Response:
+    """发送GET请求（参数同 request）"""
+    return request("GET", url, **kwargs)
+
+
+def head(url: str, **kwargs) -> requests.Response:
+    """发送HEAD请求（参数同 request）"""
+    kwargs.setdefault("allow_redirects", True)
+    return request("HEAD", url, **kwargs)
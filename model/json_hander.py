@@ -1,18 +1,23 @@
 import json
+from contextlib import contextmanager
 from typing import Any, Optional, Dict, List
 
+from model.file_writer import write_if_changed
+
 class JSONHandler:
     """JSON文件处理接口类，提供读写JSON文件的各种操作"""
-    
+
     def __init__(self, file_path: str):
         """
         初始化JSON处理器
-        
+
         参数:
             file_path: JSON文件路径
         """
         self.file_path = file_path
         self.data: Optional[Dict[str, Any] | List[Any]] = None
+        self._dirty = False  # 内存中的数据是否有尚未写入文件的修改
+        self._depth = 0  # 嵌套事务层数，大于0时修改只记录不落盘
         self.load_json()
     def load_json(self):
         try:
@@ -21,22 +26,66 @@ class JSONHandler:
             # print("JSON解析成功")
         except FileNotFoundError:
             print(f"错误：文件 {self.file_path} 不存在")
+        self._dirty = False
 
+    @contextmanager
+    def transaction(self):
+        """
+        批量修改：事务内的修改只在内存中进行，退出时一次性写入；
+        事务内抛出异常时放弃所有修改（重新加载文件），文件保持原样
+
+        用法:
+            with handler.transaction():
+                handler.set_version(...)
+                handler.update_url(...)
+        """
+        self._depth += 1
+        try:
+            yield self
+        except BaseException:
+            self._depth -= 1
+            if self._depth == 0:
+                self.load_json()
+            raise
+        self._depth -= 1
+        if self._depth == 0:
+            self.flush()
+
+    def flush(self) -> bool:
+        """
+        把修改写入文件：先写临时文件再 os.replace 原子替换，中途崩溃也不会留下截断的文件；
+        序列化结果与文件内容相同时跳过写入（保留mtime）
+
+        返回:
+            实际写入返回True，没有修改或内容未变化时返回False
+        """
+        if not self._dirty:
+            return False
+        written = write_if_changed(self.file_path, json.dumps(self.data, ensure_ascii=False, indent=4))
+        self._dirty = False
+        return written
+
+    def _mark_dirty(self) -> None:
+        """记录修改，不在事务中时立即写入"""
+        self._dirty = True
+        if self._depth == 0:
+            self.flush()
 
     def set_version(self, key: str, value: Any, key1:Any) -> bool:
-        self.data[key][key1] = value
-        with open(self.file_path, "w", encoding="utf-8") as f:
-                json.dump(self.data, f, ensure_ascii=False, indent=4)
+        entry = self.data.setdefault(key, {})  # 新增的软件自动建立条目
+        if entry.get(key1) != value:
+            entry[key1] = value
+            self._mark_dirty()
         return True
     def read_version(self,name):
-        version = self.data[f"{name}"].get("version")
+        version = self.data.get(f"{name}", {}).get("version")
         return version
-    
+
     # 更新URL
     def update_url(self, key: str, url_dict: Dict[str, str]) -> bool:
         if key in self.data:
-            self.data[key]["url"] = url_dict
-            with open(self.file_path, "w", encoding="utf-8") as f:
-                json.dump(self.data, f, ensure_ascii=False, indent=4)
+            if self.data[key].get("url") != url_dict:
+                self.data[key]["url"] = url_dict
+                self._mark_dirty()
             return True
         return False
@@ -0,0 +1,201 @@
+import json
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional, Tuple
+
+RUN_REPORT_FILE: str = os.environ.get("RUN_REPORT_FILE", "./reports/run_report.json")  # 机器可读的运行报告
+PROMETHEUS_TEXTFILE: str = os.environ.get("PROMETHEUS_TEXTFILE", "./reports/monitoring_updates.prom")  # node_exporter textfile
+METRIC_PREFIX: str = "monitoring_updates_"
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _label_key(labels: Dict[str, Any]) -> LabelKey:
+    return tuple(sorted((name, str(value)) for name, value in labels.items() if value is not None))
+
+
+def _escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _prometheus_name(name: str) -> str:
+    return METRIC_PREFIX + re.sub(r"[^a-zA-Z0-9_]", "_", name)
+
+
+def _format_labels(labels: LabelKey) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape_label(value)}"' for name, value in labels) + "}"
+
+
+class _Summary:
+    """耗时/字节数等观测值的累计：次数、总和、最大值"""
+
+    __slots__ = ("count", "total", "max")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, value: float) -> None:
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+
+
+class Metrics:
+    """
+    线程安全的运行指标收集器：
+    - 计数器（inc）：请求数、重试数、缓存命中、错误数等
+    - 观测值（observe / timer）：耗时与字节数，按标签累计次数、总和与最大值
+    - 明细（record_item）：每个下载文件一条记录（来源、分组、字节数、耗时、吞吐、结果）
+    运行结束时输出为JSON运行报告与Prometheus textfile
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started_at = time.time()
+        self._counters: Dict[str, Dict[LabelKey, float]] = {}
+        self._summaries: Dict[str, Dict[LabelKey, _Summary]] = {}
+        self._items: List[Dict[str, Any]] = []
+
+    def inc(self, name: str, value: float = 1.0, **labels) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0.0) + value
+
+    def observe(self, name: str, value: float, **labels) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            self._summaries.setdefault(name, {}).setdefault(key, _Summary()).add(value)
+
+    @contextmanager
+    def timer(self, name: str, **labels):
+        """记录代码块的耗时（秒），异常时同样记录"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started, **labels)
+
+    def record_item(self, source: str, group: str, key: str, ok: bool, seconds: float,
+                    size: Optional[int] = None, error: Optional[str] = None) -> None:
+        """记录单个文件的下载结果，同时累计到按来源/分组的计数器"""
+        size = size or 0
+        self.inc("items_total", source=source, group=group, result="ok" if ok else "failed")
+        self.observe("item_seconds", seconds, source=source, group=group)
+        if ok:
+            self.inc("item_bytes_total", size, source=source, group=group)
+        with self._lock:
+            self._items.append({
+                "source": source,
+                "group": group,
+                "key": key,
+                "ok": ok,
+                "bytes": size,
+                "seconds": round(seconds, 3),
+                "mb_per_s": round(size / (1024 * 1024) / seconds, 2) if ok and size and seconds > 0 else None,
+                "error": error,
+            })
+
+    # ------------------- 输出 -------------------
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            counters = [
+                {"name": name, "labels": dict(key), "value": value}
+                for name, series in sorted(self._counters.items()) for key, value in sorted(series.items())
+            ]
+            summaries = [
+                {"name": name, "labels": dict(key), "count": summary.count,
+                 "sum": round(summary.total, 6), "max": round(summary.max, 6)}
+                for name, series in sorted(self._summaries.items()) for key, summary in sorted(series.items())
+            ]
+            items = list(self._items)
+        return {"counters": counters, "summaries": summaries, "items": items}
+
+    def _group_totals(self, items: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+        """按 来源/分组（仓库、产品版本）汇总明细，便于找出慢仓库"""
+        groups: Dict[str, Dict[str, Any]] = {}
+        for item in items:
+            group = groups.setdefault(f"{item['source']}/{item['group']}",
+                                      {"items": 0, "ok": 0, "failed": 0, "bytes": 0, "seconds": 0.0})
+            group["items"] += 1
+            group["ok" if item["ok"] else "failed"] += 1
+            group["bytes"] += item["bytes"] if item["ok"] else 0
+            group["seconds"] = round(group["seconds"] + item["seconds"], 3)
+        return groups
+
+    def run_report(self, **extra) -> Dict[str, Any]:
+        snapshot = self.snapshot()
+        finished_at = time.time()
+        downloaded = [item for item in snapshot["items"] if item["ok"]]
+        total_bytes = sum(item["bytes"] for item in downloaded)
+        wall_seconds = finished_at - self.started_at
+        return {
+            "started_at": time.strftime("%Y-%m-%dT%H:%M:%S%z", time.localtime(self.started_at)),
+            "finished_at": time.strftime("%Y-%m-%dT%H:%M:%S%z", time.localtime(finished_at)),
+            "duration_seconds": round(wall_seconds, 3),
+            "downloads": {
+                "ok": len(downloaded),
+                "failed": len(snapshot["items"]) - len(downloaded),
+                "bytes": total_bytes,
+                "throughput_mb_s": round(total_bytes / (1024 * 1024) / wall_seconds, 2) if wall_seconds > 0 else 0.0,
+            },
+            "groups": self._group_totals(snapshot["items"]),
+            **extra,
+            **snapshot,
+        }
+
+    def write_json(self, path: str = RUN_REPORT_FILE, **extra) -> str:
+        report = self.run_report(**extra)
+        _atomic_write(path, json.dumps(report, ensure_ascii=False, indent=2))
+        return path
+
+    def prometheus_text(self) -> str:
+        snapshot = self.snapshot()
+        lines = []
+        for name in sorted({entry["name"] for entry in snapshot["counters"]}):
+            metric = _prometheus_name(name)
+            lines.append(f"# TYPE {metric} counter")
+            for entry in (entry for entry in snapshot["counters"] if entry["name"] == name):
+                lines.append(f"{metric}{_format_labels(_label_key(entry['labels']))} {entry['value']}")
+        for name in sorted({entry["name"] for entry in snapshot["summaries"]}):
+            metric = _prometheus_name(name)
+            entries = [entry for entry in snapshot["summaries"] if entry["name"] == name]
+            lines.append(f"# TYPE {metric} summary")
+            for entry in entries:
+                labels = _format_labels(_label_key(entry["labels"]))
+                lines.append(f"{metric}_count{labels} {entry['count']}")
+                lines.append(f"{metric}_sum{labels} {entry['sum']}")
+            # 最大值不属于summary的标准样本，单独作为gauge输出
+            lines.append(f"# TYPE {metric}_max gauge")
+            for entry in entries:
+                lines.append(f"{metric}_max{_format_labels(_label_key(entry['labels']))} {entry['max']}")
+        lines.append(f"# TYPE {METRIC_PREFIX}last_run_timestamp_seconds gauge")
+        lines.append(f"{METRIC_PREFIX}last_run_timestamp_seconds {time.time():.0f}")
+        lines.append(f"# TYPE {METRIC_PREFIX}run_duration_seconds gauge")
+        lines.append(f"{METRIC_PREFIX}run_duration_seconds {time.time() - self.started_at:.3f}")
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path: str = PROMETHEUS_TEXTFILE) -> str:
+        # textfile collector 可能在任意时刻读取，必须原子替换
+        _atomic_write(path, self.prometheus_text())
+        return path
+
+
+def _atomic_write(path: str, content: str) -> None:
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(content)
+    os.replace(tmp_path, path)
+
+
+METRICS = Metrics()  # 进程内共享的指标收集器
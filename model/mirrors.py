@@ -0,0 +1,47 @@
+import os
+from functools import lru_cache
+from typing import List, Tuple
+
+# 项目根目录下的镜像配置
+MIRRORS_FILE: str = os.environ.get(
+    "MIRRORS_FILE", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "mirrors.yaml")
+)  # 下载镜像配置文件（不存在时不使用镜像）
+
+
+@lru_cache(maxsize=None)
+def load_mirror_rules(config_file: str = MIRRORS_FILE) -> Tuple[Tuple[str, Tuple[str, ...]], ...]:
+    """
+    从YAML文件加载并校验镜像规则（进程内只读取一次）
+    :param config_file: YAML配置文件路径
+    :return: ((原地址前缀, (镜像前缀, ...)), ...)
+    :raises ValueError: 配置格式非法
+    """
+    if not os.path.exists(config_file):
+        return ()
+    import yaml  # 按需导入：没有镜像配置时不加载
+
+    with open(config_file, "r", encoding="utf-8") as f:
+        config_data = yaml.safe_load(f) or {}
+    if not isinstance(config_data, dict):
+        raise ValueError("镜像配置文件格式错误：根节点必须为「数据源 -> 规则列表」的字典")
+
+    rules = []
+    for source_name, source_rules in config_data.items():
+        for rule_idx, rule in enumerate(source_rules or [], 1):
+            if not isinstance(rule, dict) or not rule.get("prefix") or not isinstance(rule.get("mirrors"), list):
+                raise ValueError(f"数据源『{source_name}』的第{rule_idx}条镜像规则格式错误：需要 prefix 与 mirrors 列表")
+            rules.append((rule["prefix"], tuple(mirror for mirror in rule["mirrors"] if mirror)))
+    return tuple(rules)
+
+
+def mirror_urls(url: str) -> List[str]:
+    """
+    返回下载地址的所有候选地址：原地址在前，之后是匹配规则中的各个镜像（前缀替换为镜像前缀）
+    :param url: 原下载地址
+    :return: 去重后的候选地址列表，没有匹配的规则时只有原地址
+    """
+    candidates = [url]
+    for prefix, mirrors in load_mirror_rules():
+        if url.startswith(prefix):
+            candidates.extend(f"{mirror}{url[len(prefix):]}" for mirror in mirrors)
+    return list(dict.fromkeys(candidates))
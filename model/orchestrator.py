@@ -0,0 +1,369 @@
+import argparse
+import importlib
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import redirect_stdout
+from dataclasses import asdict, dataclass
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from model import http_client
+from model.bandwidth import HOST_BANDWIDTH_MBPS, MAX_BANDWIDTH_MBPS, SHAPER
+from model.deadline import DEADLINE, RUN_DEADLINE_MINUTES
+from model.file_writer import write_if_changed
+from model.metrics import METRICS, PROMETHEUS_TEXTFILE, RUN_REPORT_FILE
+from model.source import Source, WorkItem
+from model.state_store import StateStore, open_state_store
+from model.transfer_queue import DEFAULT_POLICY, POLICIES, TransferQueue
+from model.upload import DISK_BUDGET_MB, UploadStage, make_sink
+
+PENDING_QUEUE_FILE: str = "./repo_states/pending_queue.json"  # 到达截止时间时顺延到下次运行的文件
+DOWNLOAD_WORKERS: int = 8  # 所有数据源共享的下载线程数
+
+# 数据源注册表：名称 -> "模块:类"（按需导入，只运行部分数据源时不加载其他模块）
+SOURCE_REGISTRY: Dict[str, str] = {
+    "github": "model.github:GitHubSource",
+    "jetbrains": "model.pycharm:JetBrainsSource",
+    "web": "model.web_probe:WebProbeSource",
+}
+# 已改名的数据源：旧名称 -> 新名称（读取旧版顺延记录时迁移）
+LEGACY_SOURCE_ALIASES: Dict[str, str] = {
+    "voidtools": "web",
+}
+
+
+@dataclass
+class SourceReport:
+    """单个数据源的运行结果"""
+    name: str
+    probe_seconds: float = 0.0
+    probe_error: Optional[str] = None
+    found: int = 0
+    succeeded: int = 0
+    failed: int = 0
+    bytes: int = 0
+    resumed: int = 0  # 从上次运行顺延恢复的文件数
+    deferred: int = 0  # 因到达截止时间顺延到下次运行的文件数
+
+
+def load_source(name: str) -> Source:
+    """按注册表导入并实例化数据源"""
+    if name not in SOURCE_REGISTRY:
+        raise ValueError(f"未知的数据源：{name}（可选：{', '.join(SOURCE_REGISTRY)}）")
+    module_name, class_name = SOURCE_REGISTRY[name].split(":")
+    return getattr(importlib.import_module(module_name), class_name)()
+
+
+def load_pending_queue() -> List[Dict[str, Any]]:
+    """读取上次运行顺延的文件记录：[{"source", "in_flight", "item"}]，已改名的数据源迁移为新名称"""
+    try:
+        with open(PENDING_QUEUE_FILE, "r", encoding="utf-8") as f:
+            records = json.load(f)
+    except FileNotFoundError:
+        return []
+    except (OSError, ValueError) as e:
+        print(f"⚠️  顺延队列读取失败，忽略：{str(e)}")
+        return []
+    for record in records:
+        name = LEGACY_SOURCE_ALIASES.get(record.get("source"))
+        if name is not None:
+            record["source"] = name
+            if isinstance(record.get("item"), dict):
+                record["item"]["source"] = name
+    return records
+
+
+def save_pending_queue(records: List[Dict[str, Any]]) -> None:
+    """保存顺延的文件记录，没有顺延的文件时删除记录文件"""
+    if records:
+        write_if_changed(PENDING_QUEUE_FILE, json.dumps(records, ensure_ascii=False, indent=2))
+    elif os.path.exists(PENDING_QUEUE_FILE):
+        os.remove(PENDING_QUEUE_FILE)
+
+
+class Orchestrator:
+    """
+    在同一进程中运行多个数据源：所有数据源的探测并行进行，探测到的文件立即投递到共享的下载队列
+    （按调度策略排序，由固定数量的下载线程执行），共用一个状态库，最后输出一份汇总报告。
+    设置了截止时间（DEADLINE）时，未开始与被中断的文件写入顺延队列，下次运行在探测之前优先恢复
+    """
+
+    def __init__(self, sources: List[Source], store: StateStore, download_workers: int = DOWNLOAD_WORKERS,
+                 upload_stage: Optional[UploadStage] = None, policy: str = DEFAULT_POLICY):
+        self.sources = sources
+        self.store = store
+        self.download_workers = download_workers
+        self.upload_stage = upload_stage
+        self.policy = policy
+        self.reports: Dict[str, SourceReport] = {source.name: SourceReport(source.name) for source in sources}
+        self._lock = threading.Lock()
+        self._submitted: Set[Tuple[str, str]] = set()  # 已投递的 (数据源, 文件键)
+        self._deferred: List[Tuple[Source, WorkItem, bool]] = []  # 顺延的 (数据源, 文件, 是否已开始传输)
+        self._carried: List[Dict[str, Any]] = []  # 本次未运行的数据源的顺延记录（原样保留）
+
+    def _run_item(self, source: Source, item: WorkItem) -> None:
+        ok = False
+        error = None
+        # 未上传的字节数超过磁盘预算时在此阻塞，暂停新的下载
+        reserved = self.upload_stage.reserve(item.size) if self.upload_stage else 0
+        started = time.perf_counter()
+        try:
+            ok = source.download(item)
+        except Exception as e:
+            error = str(e)
+            print(f"  ❌ [{source.name}] {item.label or item.key} 下载异常：{error}")
+        finally:
+            # 到达截止时间被中断的传输已保存断点，顺延到下次运行而不计为失败
+            interrupted = not ok and DEADLINE.expired()
+            if interrupted:
+                self._defer(source, item, in_flight=True)
+            else:
+                METRICS.record_item(source.name, item.group, item.key, ok, time.perf_counter() - started,
+                                    size=item.size, error=error if error or ok else "下载失败")
+            source.complete(item, ok)
+            self._hand_off(item, ok, reserved)
+            with self._lock:
+                report = self.reports[source.name]
+                if ok:
+                    report.succeeded += 1
+                    report.bytes += item.size or 0
+                elif not interrupted:
+                    report.failed += 1
+
+    def _defer(self, source: Source, item: WorkItem, in_flight: bool) -> None:
+        METRICS.inc("deferred_items_total", source=source.name, in_flight=in_flight)
+        with self._lock:
+            self._deferred.append((source, item, in_flight))
+            self.reports[source.name].deferred += 1
+
+    def _accept(self, source: Source, item: WorkItem) -> bool:
+        """同一文件只投递一次（上次顺延的文件恢复后，探测时再次发现会被忽略）"""
+        with self._lock:
+            if (source.name, item.key) in self._submitted:
+                return False
+            self._submitted.add((source.name, item.key))
+            self.reports[source.name].found += 1
+            return True
+
+    def _resume(self, dispatch: Callable[..., None]) -> int:
+        """在探测之前投递上次运行顺延的文件，返回恢复的数量"""
+        sources = {source.name: source for source in self.sources}
+        resumed = 0
+        for record in load_pending_queue():
+            source = sources.get(record.get("source"))
+            if source is None:
+                self._carried.append(record)
+                continue
+            try:
+                item = source.restore_item(record["item"])
+            except Exception as e:
+                print(f"  ⚠️  [{source.name}] 顺延记录恢复失败，忽略：{str(e)}")
+                continue
+            if item is not None and self._accept(source, item):
+                self.reports[source.name].resumed += 1
+                resumed += 1
+                dispatch(source, item, True)
+        return resumed
+
+    def _save_pending_queue(self) -> None:
+        records = list(self._carried)
+        records.extend({"source": source.name, "in_flight": in_flight, "item": source.checkpoint_item(item)}
+                       for source, item, in_flight in self._deferred)
+        save_pending_queue(records)
+        if self._deferred:
+            in_flight = sum(1 for _, _, started in self._deferred if started)
+            print(f"⏸️  已到达运行截止时间：{len(self._deferred)} 个文件顺延到下次运行"
+                  f"（其中 {in_flight} 个已保存断点），记录于 {PENDING_QUEUE_FILE}")
+
+    def _hand_off(self, item: WorkItem, ok: bool, reserved: int) -> None:
+        """下载成功的文件交给上传阶段（状态已在 complete 中记录），否则释放占用的磁盘额度"""
+        if not self.upload_stage:
+            return
+        if ok and item.local_path and item.upload_path and os.path.isfile(item.local_path):
+            self.upload_stage.submit(item.local_path, item.upload_path, reserved, item.sha256, item.blob_path)
+        else:
+            self.upload_stage.release(reserved)
+
+    def _probe(self, source: Source, dispatch: Callable[..., None]) -> None:
+        def submit(item: WorkItem) -> bool:
+            if not self._accept(source, item):
+                return False
+            dispatch(source, item)
+            return True
+
+        started = time.monotonic()
+        try:
+            source.probe(submit)
+        except Exception as e:
+            self.reports[source.name].probe_error = str(e)
+            METRICS.inc("probe_errors_total", source=source.name)
+            print(f"  ❌ [{source.name}] 探测失败：{str(e)}")
+        finally:
+            self.reports[source.name].probe_seconds = time.monotonic() - started
+            METRICS.observe("probe_seconds", self.reports[source.name].probe_seconds, source=source.name)
+
+    def run(self) -> Dict[str, SourceReport]:
+        for source in self.sources:
+            source.open(self.store)
+
+        transfer_queue = TransferQueue(self._run_item, self.download_workers, self.policy)
+        resumed = self._resume(transfer_queue.put)
+        if resumed:
+            print(f"⏯️  恢复上次运行顺延的 {resumed} 个文件")
+        self._probe_all(transfer_queue.put)
+        # 探测线程池退出后所有文件都已投递，等待下载队列清空（到达截止时间时返回未开始的文件）
+        for source, item in transfer_queue.close():
+            self._defer(source, item, in_flight=False)
+            source.complete(item, False)
+        if self.upload_stage:
+            self.upload_stage.close()
+        self._save_pending_queue()
+
+        for source in self.sources:
+            try:
+                source.finish()
+            except Exception as e:
+                print(f"  ❌ [{source.name}] 收尾失败：{str(e)}")
+        return self.reports
+
+    def _probe_all(self, dispatch: Callable[..., None]) -> None:
+        with ThreadPoolExecutor(max_workers=max(1, len(self.sources)), thread_name_prefix="probe") as probe_pool:
+            for source in self.sources:
+                probe_pool.submit(self._probe, source, dispatch)
+
+    def plan(self) -> Dict[str, Any]:
+        """
+        计划模式：只运行探测并汇总待下载的文件（不下载，不调用 complete/finish，因此不推进水位线）
+        :return: 计划（pending 为False表示所有数据源都没有需要下载的文件）
+        """
+        pending: Dict[str, List[WorkItem]] = {source.name: [] for source in self.sources}
+
+        def dispatch(source: Source, item: WorkItem, resumed: bool = False) -> None:
+            with self._lock:
+                pending[source.name].append(item)
+
+        for source in self.sources:
+            source.dry_run = True
+            source.open(self.store)
+        started = time.monotonic()
+        self._resume(dispatch)
+        self._probe_all(dispatch)
+
+        sources = {}
+        for name, items in pending.items():
+            report = self.reports[name]
+            stale: Dict[str, Dict[str, int]] = {}
+            for item in items:
+                group = stale.setdefault(item.group or name, {"items": 0, "bytes": 0})
+                group["items"] += 1
+                group["bytes"] += item.size or 0
+            sources[name] = {
+                "items": len(items),
+                "bytes": sum(item.size or 0 for item in items),
+                "unknown_size": sum(1 for item in items if item.size is None),
+                "resumed": report.resumed,  # 其中来自上次运行顺延的文件数
+                "probe_seconds": round(report.probe_seconds, 3),
+                "probe_error": report.probe_error,
+                "stale": stale,  # 有待下载文件的仓库/产品版本
+                "files": [{"key": item.key, "label": item.label, "url": item.url, "size": item.size} for item in items],
+            }
+        return {
+            # 探测失败时无法确认是否有更新，按有更新处理
+            "pending": any(source["items"] or source["probe_error"] for source in sources.values()),
+            "items": sum(source["items"] for source in sources.values()),
+            "bytes": sum(source["bytes"] for source in sources.values()),
+            "seconds": round(time.monotonic() - started, 3),
+            "sources": sources,
+        }
+
+    def print_report(self) -> None:
+        print("\n" + "=" * 70)
+        print("📊 运行报告")
+        for report in self.reports.values():
+            status = f"❌ 探测失败：{report.probe_error}" if report.probe_error else "✅"
+            deferred = f"顺延 {report.deferred} 个，" if report.deferred else ""
+            print(f"  - {report.name}：发现 {report.found} 个文件，成功 {report.succeeded} 个，失败 {report.failed} 个，"
+                  f"{deferred}{report.bytes / (1024 * 1024):.2f}MB，探测耗时 {report.probe_seconds:.1f} 秒 {status}")
+        print(f"  - {http_client.SCHEDULER.report()}")
+        print(f"  - 调度策略：{self.policy}，{SHAPER.report()}")
+        if self.upload_stage:
+            print(f"  - {self.upload_stage.report()}")
+        print("=" * 70)
+
+    def write_reports(self) -> None:
+        """输出JSON运行报告与Prometheus textfile（写入失败不影响本次运行结果）"""
+        try:
+            report_path = METRICS.write_json(
+                RUN_REPORT_FILE,
+                sources={name: asdict(report) for name, report in self.reports.items()},
+            )
+            textfile_path = METRICS.write_prometheus(PROMETHEUS_TEXTFILE)
+            print(f"📝 运行报告：{report_path}，Prometheus指标：{textfile_path}")
+        except OSError as e:
+            print(f"⚠️  运行报告写入失败：{str(e)}")
+
+
+def run_sources(source_names: List[str], download_workers: int = DOWNLOAD_WORKERS,
+                upload_stage: Optional[UploadStage] = None, policy: str = DEFAULT_POLICY) -> Dict[str, SourceReport]:
+    """运行指定的数据源并打印报告（传入 upload_stage 时下载完成的文件立即上传并删除本地副本）"""
+    store = open_state_store()
+    try:
+        orchestrator = Orchestrator([load_source(name) for name in source_names], store, download_workers,
+                                    upload_stage, policy)
+        reports = orchestrator.run()
+        orchestrator.print_report()
+        orchestrator.write_reports()
+        return reports
+    finally:
+        store.close()
+
+
+def plan_sources(source_names: List[str]) -> Dict[str, Any]:
+    """只探测指定的数据源，返回待下载文件的计划"""
+    store = open_state_store()
+    try:
+        return Orchestrator([load_source(name) for name in source_names], store).plan()
+    finally:
+        store.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="监控常用软件更新并下载（GitHub Releases、JetBrains、网页版本探测）")
+    parser.add_argument("--sources", default=",".join(SOURCE_REGISTRY),
+                        help=f"要运行的数据源，逗号分隔（默认全部：{','.join(SOURCE_REGISTRY)}）")
+    parser.add_argument("--workers", type=int, default=DOWNLOAD_WORKERS, help="共享下载线程数")
+    parser.add_argument("--policy", choices=POLICIES, default=DEFAULT_POLICY,
+                        help="下载顺序：fifo 探测顺序，newest 最新版本优先，smallest 小文件优先，"
+                             "weighted 按仓库 priority 加权的小文件优先")
+    parser.add_argument("--max-bandwidth-mbps", type=float, default=MAX_BANDWIDTH_MBPS,
+                        help="所有下载的总带宽上限（MB/s），0 表示不限制")
+    parser.add_argument("--host-bandwidth-mbps", type=float, default=HOST_BANDWIDTH_MBPS,
+                        help="单个主机的带宽上限（MB/s），0 表示不限制")
+    parser.add_argument("--deadline-minutes", type=float, default=RUN_DEADLINE_MINUTES,
+                        help="下载阶段的时间预算（分钟）：到达后不再开始新的传输，未完成的文件顺延到下次运行，0 表示不限制")
+    parser.add_argument("--plan", action="store_true",
+                        help="只探测上游版本，把待下载的文件以JSON输出到标准输出（日志输出到标准错误），不下载")
+    parser.add_argument("--upload-dir", help="下载完成后复制到该目录并删除本地文件")
+    parser.add_argument("--upload-rsync", help="下载完成后通过rsync上传到 user@host:/path 并删除本地文件")
+    parser.add_argument("--ssh-port", type=int, default=22, help="rsync使用的SSH端口")
+    parser.add_argument("--disk-budget-mb", type=int, default=DISK_BUDGET_MB,
+                        help="未上传文件的磁盘预算（MB），超出时暂停下载，0 表示不限制")
+    args = parser.parse_args()
+    source_names = [name.strip() for name in args.sources.split(",") if name.strip()]
+    if args.plan:
+        with redirect_stdout(sys.stderr):
+            plan = plan_sources(source_names)
+        print(json.dumps(plan, ensure_ascii=False, indent=2))
+        return
+    DEADLINE.configure(args.deadline_minutes)
+    SHAPER.configure(args.max_bandwidth_mbps, args.host_bandwidth_mbps)
+    sink = make_sink(args.upload_dir, args.upload_rsync, args.ssh_port)
+    upload_stage = UploadStage(sink, args.disk_budget_mb * 1024 * 1024) if sink else None
+    run_sources(source_names, args.workers, upload_stage, args.policy)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+import sys
+import threading
+import time
+from typing import Dict, Optional, TextIO
+
+PROGRESS_INTERVAL_TTY: float = 0.5  # 终端中刷新进度的最短间隔（秒）
+PROGRESS_INTERVAL_LOG: float = 15.0  # 输出重定向到文件（CI日志）时打印进度的最短间隔（秒）
+
+
+def format_bytes(size_bytes: float) -> str:
+    for unit in ("B", "KB", "MB", "GB"):
+        if size_bytes < 1024:
+            return f"{size_bytes:.1f}{unit}"
+        size_bytes /= 1024
+    return f"{size_bytes:.1f}TB"
+
+
+class Transfer:
+    """单个传输的进度句柄（由 TransferProgress.start 创建）"""
+
+    __slots__ = ("name", "total", "done")
+
+    def __init__(self, name: str, total: Optional[int], done: int):
+        self.name = name
+        self.total = total
+        self.done = done
+
+
+class TransferProgress:
+    """
+    所有并发传输共用的进度输出：update 只累加计数，按固定间隔最多输出一行
+    （只有一个传输时显示该文件的进度，多个时显示汇总），终端中原地刷新，重定向到文件时逐行追加
+    """
+
+    def __init__(self, stream: TextIO = sys.stdout, interval: Optional[float] = None):
+        self.stream = stream
+        self.is_tty = hasattr(stream, "isatty") and stream.isatty()
+        self.interval = interval if interval is not None else (
+            PROGRESS_INTERVAL_TTY if self.is_tty else PROGRESS_INTERVAL_LOG)
+        self._lock = threading.Lock()
+        self._active: Dict[int, Transfer] = {}
+        self._last_render = time.monotonic()
+        self._bytes_since_render = 0
+        self._line_open = False
+
+    def start(self, name: str, total: Optional[int] = None, initial: int = 0) -> Transfer:
+        transfer = Transfer(name, total, initial)
+        with self._lock:
+            self._active[id(transfer)] = transfer
+        return transfer
+
+    def update(self, transfer: Transfer, size: int) -> None:
+        with self._lock:
+            transfer.done += size
+            self._bytes_since_render += size
+            now = time.monotonic()
+            if now - self._last_render < self.interval:
+                return
+            line = self._render(now)
+        self._write(line)
+
+    def finish(self, transfer: Transfer) -> None:
+        with self._lock:
+            self._active.pop(id(transfer), None)
+            end_line = self._line_open and not self._active
+            self._line_open = self._line_open and not end_line
+        if end_line:
+            self._write_raw("\n")
+
+    def _render(self, now: float) -> str:
+        """生成进度行（调用方持有锁）"""
+        speed = self._bytes_since_render / max(now - self._last_render, 1e-6)
+        self._last_render = now
+        self._bytes_since_render = 0
+        transfers = list(self._active.values())
+        if len(transfers) == 1:
+            transfer = transfers[0]
+            if transfer.total:
+                return (f"⬇️  {transfer.name} {transfer.done / transfer.total * 100:.1f}% "
+                        f"({format_bytes(transfer.done)}/{format_bytes(transfer.total)}) {format_bytes(speed)}/s")
+            return f"⬇️  {transfer.name} {format_bytes(transfer.done)} {format_bytes(speed)}/s"
+        done = sum(transfer.done for transfer in transfers)
+        total = sum(transfer.total or 0 for transfer in transfers)
+        return (f"⬇️  {len(transfers)} 个传输进行中：{format_bytes(done)}/{format_bytes(total)} "
+                f"{format_bytes(speed)}/s")
+
+    def _write(self, line: str) -> None:
+        if self.is_tty:
+            self._line_open = True
+            self._write_raw(f"\r{line:<100}")
+        else:
+            self._write_raw(line + "\n")
+
+    def _write_raw(self, text: str) -> None:
+        try:
+            self.stream.write(text)
+            self.stream.flush()
+        except (OSError, ValueError):
+            pass
+
+
+PROGRESS = TransferProgress()  # 进程内共享的进度输出
@@ -1,102 +1,411 @@
-from collections.abc import dict_items
-from enum import verify
-
-import requests
+import codecs
 import json
+import os
+from contextlib import closing
 from datetime import datetime
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import requests
+
+from model import http_client
+from model.download import download_resumable
+from model.file_writer import write_if_changed
+from model.metrics import METRICS
+from model.source import Source, WorkItem
+
+# ------------------- 配置 -------------------
+# 已知的产品：产品代码 -> (产品名, download 下的目录名)
+PRODUCTS: Dict[str, Tuple[str, str]] = {
+    "PCP": ("PyCharm", "Pycharm"),
+    "IIU": ("IntelliJ IDEA", "IntelliJIDEA"),
+    "GO": ("GoLand", "GoLand"),
+    "WS": ("WebStorm", "WebStorm"),
+    "CL": ("CLion", "CLion"),
+    "PS": ("PhpStorm", "PhpStorm"),
+    "RD": ("Rider", "Rider"),
+    "DG": ("DataGrip", "DataGrip"),
+    "RM": ("RubyMine", "RubyMine"),
+}
+PRODUCT_CODES: List[str] = [code.strip() for code in os.environ.get("JETBRAINS_PRODUCTS", "PCP").split(",")
+                            if code.strip()]  # 要监控的产品代码（逗号分隔，一次请求获取全部）
+RELEASES_API_URL: str = "https://data.services.jetbrains.com/products/releases"
+SAVE_DIR: str = "./download"  # 安装包按「download/产品目录/版本号」保存
+KEEP_LATEST_VERSIONS: int = 1  # 每个产品只关注最新的K个版本（为1时由服务端直接返回最新版本）
+RELEASES_CACHE_FILE: str = "./repo_states/http_cache/jetbrains_releases.json"  # 接口原始响应缓存（校验值记录在同名 .meta 文件）
+RELEASES_CHUNK_SIZE: int = 64 * 1024  # 流式解析时每次读取的字节数
+JETBRAINS_NS = "jetbrains"  # 状态库命名空间：key=(产品代码, "watermark") 记录已完整镜像的最高build
+
+# 定义系统类型与下载地址的映射（覆盖所有支持的系统）
+PLATFORMS: List[Tuple[str, str]] = [
+    ("Linux ARM64", "linuxARM64"),
+    ("Linux", "linux"),
+    ("Windows", "windows"),
+    ("Windows Zip", "windowsZip"),
+    ("Windows ARM64", "windowsARM64"),
+    ("macOS", "mac"),
+    ("macOS M1", "macM1"),
+    ("Windows Zip ARM64", "windowsZipARM64"),
+]
+
+
+def build_key(build: str) -> Tuple[int, ...]:
+    """把build号（如 243.22562.180）转换为可比较的元组"""
+    return tuple(int(part) for part in build.split(".") if part.isdigit())
 
-from model.download import download_file
 
+def product_name(code: str) -> str:
+    return PRODUCTS.get(code, (code, code))[0]
 
-def get_pycharm_professional_versions():
+
+def product_dir(code: str) -> str:
+    return PRODUCTS.get(code, (code, code))[1]
+
+
+def watermark_key(code: str) -> Tuple[str, str]:
+    return code, "watermark"
+
+
+# ------------------- 流式解析 -------------------
+class ReleaseStreamParser:
     """
-    爬取 PyCharm 专业版所有版本及下载地址
-    返回格式：列表，每个元素为字典，包含 version, release_date, os_type, download_url
+    增量解析 releases 接口的响应 {"产品代码": [release, ...], ...}：
+    每解析出一个完整的 release 就交给调用方，缓冲区中只保留尚未解析完整的部分，内存占用与响应大小无关
     """
-    # 目标接口 URL
-    url = "https://data.services.jetbrains.com/products?code=PCP%2CPCC&release.type=release&_=1757503463371"
 
+    def __init__(self):
+        self._decoder = codecs.getincrementaldecoder("utf-8")()
+        self._json = json.JSONDecoder()
+        self._buffer = ""
+        self._pos = 0
+        self._state = "start"  # start -> key -> colon -> value -> (item)* -> key ... -> end
+        self._code: Optional[str] = None
+
+    def _skip_whitespace(self) -> None:
+        while self._pos < len(self._buffer) and self._buffer[self._pos] in " \t\r\n":
+            self._pos += 1
+
+    def _decode(self) -> Tuple[bool, object]:
+        """在当前位置解析一个JSON值，数据不完整时返回 (False, None) 等待下一段"""
+        try:
+            value, end = self._json.raw_decode(self._buffer, self._pos)
+        except json.JSONDecodeError:
+            return False, None
+        if end >= len(self._buffer):  # 数字等标量在块末尾可能被截断，等后续数据确认
+            return False, None
+        self._pos = end
+        return True, value
+
+    def _expect(self, char: str) -> None:
+        if self._buffer[self._pos] != char:
+            raise ValueError(f"响应格式错误：位置 {self._pos} 处应为 {char!r}")
+        self._pos += 1
+
+    def feed(self, data: bytes) -> Iterator[Tuple[str, Dict]]:
+        """输入一段数据，逐个返回其中解析完整的 (产品代码, release)"""
+        self._buffer = self._buffer[self._pos:] + self._decoder.decode(data)
+        self._pos = 0
+        while True:
+            self._skip_whitespace()
+            if self._pos >= len(self._buffer) or self._state == "end":
+                return
+            char = self._buffer[self._pos]
+            if self._state == "start":
+                self._expect("{")
+                self._state = "key"
+            elif self._state == "key":
+                if char in ",}":
+                    self._pos += 1
+                    self._state = "end" if char == "}" else "key"
+                    continue
+                ok, key = self._decode()
+                if not ok:
+                    return
+                self._code, self._state = str(key), "colon"
+            elif self._state == "colon":
+                self._expect(":")
+                self._state = "value"
+            elif self._state == "value":
+                if char == "[":
+                    self._pos += 1
+                    self._state = "item"
+                    continue
+                ok, _ = self._decode()  # 非列表的值与 releases 无关，跳过
+                if not ok:
+                    return
+                self._state = "key"
+            else:  # item
+                if char in ",]":
+                    self._pos += 1
+                    if char == "]":
+                        self._state = "key"
+                    continue
+                ok, release = self._decode()
+                if not ok:
+                    return
+                if isinstance(release, dict):
+                    yield self._code, release
+
+    def close(self) -> None:
+        if self._state != "end":
+            raise ValueError("响应不完整：JSON未正常结束")
+
+
+def compact_release(release: Dict) -> Optional[Dict]:
+    """只保留需要的字段（日期在此解析一次，排序时直接使用），缺少必要字段时返回None"""
+    if not (release.get("version") and release.get("build") and release.get("downloads") and release.get("date")):
+        return None
+    downloads = {}
+    for os_type, platform_key in PLATFORMS:
+        download = release["downloads"].get(platform_key) or {}
+        if download.get("link"):
+            downloads[os_type] = (download["link"], download.get("size"), download.get("checksumLink"))
+    return {
+        "version": release["version"],
+        "build": release["build"],
+        "date": release["date"],
+        "released": datetime.strptime(release["date"], "%Y-%m-%d"),
+        "downloads": downloads,
+    }
+
+
+def index_releases(chunks: Iterable[bytes], product_codes: List[str]) -> Dict[str, List[Dict]]:
+    """流式解析响应，建立 产品代码 -> [精简的release] 的索引（只收录要监控的产品）"""
+    index: Dict[str, List[Dict]] = {code: [] for code in product_codes}
+    parser = ReleaseStreamParser()
+    for chunk in chunks:
+        for code, release in parser.feed(chunk):
+            compact = compact_release(release) if code in index else None
+            if compact:
+                index[code].append(compact)
+    parser.close()
+    return index
+
+
+# ------------------- 接口请求与缓存 -------------------
+def _load_cache_meta(url: str) -> Optional[Dict]:
+    """读取缓存的校验值，请求地址（产品列表）变化或缓存文件缺失时返回None"""
     try:
-        # 发送 GET 请求（模拟浏览器 headers 避免被拦截）
-        headers = {
-            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
-        }
-        response = requests.get(url, headers=headers, timeout=10)
-        response.raise_for_status()  # 若请求失败（如 404/500），抛出异常
-
-        # 解析 JSON 数据
-        data = response.json()
-
-        # 存储结果的列表
-        result = []
-
-        # 遍历数据（只处理 "PyCharm" 产品，且过滤专业版相关版本）
-        for product in data:
-            if product.get("name") == "PyCharm":
-                # 遍历所有版本发布记录
-                for release in product.get("releases", []):
-                    version = release.get("version")
-                    release_date = release.get("date")
-                    downloads = release.get("downloads", {})
-
-                    # 跳过无版本号或无下载地址的记录
-                    if not version or not downloads:
-                        continue
-
-                    # 定义系统类型与下载地址的映射（覆盖所有支持的系统）
-                    os_mappings = [
-                        ("Linux ARM64", downloads.get("linuxARM64", {}).get("link")),
-                        ("Linux", downloads.get("linux", {}).get("link")),
-                        ("Windows", downloads.get("windows", {}).get("link")),
-                        ("Windows Zip", downloads.get("windowsZip", {}).get("link")),
-                        ("Windows ARM64", downloads.get("windowsARM64", {}).get("link")),
-                        ("macOS", downloads.get("mac", {}).get("link")),
-                        ("macOS M1", downloads.get("macM1", {}).get("link")),
-                        ("Windows Zip ARM64", downloads.get("windowsZipARM64", {}).get("link"))
-                    ]
-
-                    # 遍历系统映射，添加有效记录
-                    for os_type, download_url in os_mappings:
-                        if download_url:  # 只保留有有效下载地址的记录
-                            result.append({
-                                "version": version,
-                                "release_date": release_date,
-                                "os_type": os_type,
-                                "download_url": download_url
-                            })
-
-        # 按发布时间倒序排序（最新版本在前）
-        result.sort(key=lambda x: datetime.strptime(x["release_date"], "%Y-%m-%d"), reverse=True)
-        return result
+        with open(f"{RELEASES_CACHE_FILE}.meta", "r", encoding="utf-8") as f:
+            meta = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return None
+    if meta.get("url") != url or not os.path.exists(RELEASES_CACHE_FILE):
+        return None
+    return meta
+
+
+def fetch_release_chunks(params: Dict[str, str]) -> Iterator[bytes]:
+    """
+    条件请求 releases 接口（If-None-Match/If-Modified-Since）：
+    返回304时从磁盘缓存流式读取，否则边读取边写入缓存临时文件，读完后原子替换
+    """
+    full_url = requests.Request("GET", RELEASES_API_URL, params=params).prepare().url
+    meta = _load_cache_meta(full_url)
+    headers = {}
+    if meta and meta.get("etag"):
+        headers["If-None-Match"] = meta["etag"]
+    if meta and meta.get("last_modified"):
+        headers["If-Modified-Since"] = meta["last_modified"]
+
+    with closing(http_client.get(full_url, headers=headers, stream=True)) as response:
+        if response.status_code == 304 and meta:
+            METRICS.inc("http_cache_total", result="hit")
+            print("📦 JetBrains 接口无变化，使用本地缓存")
+            with open(RELEASES_CACHE_FILE, "rb") as f:
+                yield from iter(lambda: f.read(RELEASES_CHUNK_SIZE), b"")
+            return
+        response.raise_for_status()
+        METRICS.inc("http_cache_total", result="miss")
+        os.makedirs(os.path.dirname(RELEASES_CACHE_FILE), exist_ok=True)
+        tmp_path = f"{RELEASES_CACHE_FILE}.tmp"
+        with open(tmp_path, "wb") as f:
+            for chunk in response.iter_content(RELEASES_CHUNK_SIZE):
+                f.write(chunk)
+                yield chunk
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+    if not (etag or last_modified):
+        os.remove(tmp_path)
+        return
+    os.replace(tmp_path, RELEASES_CACHE_FILE)
+    write_if_changed(f"{RELEASES_CACHE_FILE}.meta", json.dumps(
+        {"url": full_url, "etag": etag, "last_modified": last_modified}, ensure_ascii=False))
+
+
+def get_jetbrains_versions(product_codes: List[str] = PRODUCT_CODES,
+                           latest_versions: int = KEEP_LATEST_VERSIONS) -> List[Dict]:
+    """
+    一次请求获取所有产品最新的若干个版本及下载地址（服务端按产品代码、发布类型过滤，只要最新版本时带 latest=true）
+    返回格式：列表，每个元素为字典，包含 product_code, version, build, release_date, os_type, download_url, size, checksum_link
+    """
+    params = {"code": ",".join(product_codes), "type": "release"}
+    if latest_versions == 1:
+        params["latest"] = "true"
 
+    try:
+        index = index_releases(fetch_release_chunks(params), product_codes)
     except requests.exceptions.RequestException as e:
         print(f"请求失败：{e}")
         return []
-    except json.JSONDecodeError:
-        print("JSON 解析失败")
+    except ValueError as e:
+        print(f"JSON 解析失败：{e}")
         return []
 
+    # 存储结果的列表
+    result = []
+    for code in product_codes:
+        # 按发布时间倒序排序（最新版本在前），只保留最新的K个版本
+        releases = sorted(index[code], key=lambda release: release["released"], reverse=True)
+        for release in releases[:latest_versions]:
+            for os_type, (link, size, checksum_link) in release["downloads"].items():
+                result.append({
+                    "product_code": code,
+                    "version": release["version"],
+                    "build": release["build"],
+                    "release_date": release["date"],
+                    "os_type": os_type,
+                    "download_url": link,
+                    "size": size,
+                    "checksum_link": checksum_link,
+                })
+    return result
+
+
+def fetch_checksum(checksum_link: Optional[str]) -> Optional[str]:
+    """读取 JetBrains 发布的 .sha256 文件（格式：<sha256> *<文件名>），失败时返回None"""
+    if not checksum_link:
+        return None
+    try:
+        response = http_client.get(checksum_link)
+        response.raise_for_status()
+    except requests.exceptions.RequestException as e:
+        print(f"  ⚠️  获取校验值失败：{e}")
+        return None
+    checksum = response.text.strip().split()[0].lower() if response.text.strip() else ""
+    return checksum if len(checksum) == 64 else None
+
+
+def select_new_versions(versions: List[Dict], watermark: Optional[str]) -> List[Dict]:
+    """只保留 build 号高于已镜像水位线的记录"""
+    if not watermark:
+        return versions
+    return [item for item in versions if build_key(item["build"]) > build_key(watermark)]
+
+
+def upload_path(item: Dict) -> str:
+    """安装包相对于下载根目录的路径（本地保存与上传目标使用同一结构）"""
+    return os.path.join(product_dir(product_code(item)), item["version"], os.path.basename(item["download_url"]))
+
+
+def download_and_verify(item: Dict) -> bool:
+    """下载单个安装包，并与 checksumLink 中的 SHA-256 比对"""
+    save_path = os.path.join(SAVE_DIR, upload_path(item))
+    os.makedirs(os.path.dirname(save_path), exist_ok=True)
+    expected_sha256 = fetch_checksum(item["checksum_link"])
+    try:
+        # 校验值不一致时下载引擎删除 .part 文件并抛出 ChecksumMismatchError
+        download_resumable(item["download_url"], save_path, expected_size=item.get("size"),
+                           compute_sha256=True, expected_sha256=expected_sha256)
+    except Exception as e:
+        print(f"  ❌ 下载失败：{item['os_type']} - {str(e)}")
+        return False
+    print(f"  ✅ {item['os_type']}: {save_path}" + ("（SHA-256校验通过）" if expected_sha256 else ""))
+    return True
+
+
+def product_code(item: Dict) -> str:
+    return item.get("product_code", "PCP")  # 旧版顺延记录只有 PyCharm，没有产品代码
+
 
-def print_pycharm_versions(versions):
+def file_key(item: Dict) -> Tuple[str, str, str]:
+    """单个安装包在状态库中的键"""
+    return product_code(item), item["build"], item["os_type"]
+
+
+class JetBrainsSource(Source):
+    """
+    JetBrains 数据源（增量同步）：一次请求获取所有监控产品的最新版本，每个产品只处理 build 号高于其水位线的版本，
+    某个版本的所有平台都下载并校验成功后才推进该产品的水位线
+    """
+
+    name = "jetbrains"
+
+    def __init__(self, product_codes: List[str] = PRODUCT_CODES, latest_versions: int = KEEP_LATEST_VERSIONS):
+        super().__init__()
+        self.product_codes = product_codes
+        self.latest_versions = latest_versions
+        self._versions: List[Dict] = []
+
+    def probe(self, submit: Callable[[WorkItem], bool]) -> None:
+        versions = get_jetbrains_versions(self.product_codes, self.latest_versions)
+        self._versions = []
+        for code in self.product_codes:
+            watermark = self.store.get(JETBRAINS_NS, watermark_key(code))
+            new_versions = select_new_versions([item for item in versions if item["product_code"] == code], watermark)
+            if not new_versions:
+                print(f"😒{product_name(code)} 无更新，已镜像的最新 build：{watermark}")
+            self._versions.extend(new_versions)
+
+        print_jetbrains_versions(self._versions)
+        for item in self._versions:
+            if self.store.get(JETBRAINS_NS, file_key(item)):
+                continue
+            submit(WorkItem(
+                source=self.name,
+                key=f"{item['product_code']}/{item['build']}/{item['os_type']}",
+                url=item["download_url"],
+                size=item.get("size"),
+                label=f"{product_name(item['product_code'])} {item['version']} {item['os_type']}",
+                group=f"{product_name(item['product_code'])} {item['version']}",
+                released_at=item["release_date"],
+                payload=item,
+                local_path=os.path.join(SAVE_DIR, upload_path(item)),
+                upload_path=upload_path(item),
+            ))
+
+    def download(self, item: WorkItem) -> bool:
+        return download_and_verify(item.payload)
+
+    def complete(self, item: WorkItem, ok: bool) -> None:
+        if ok:
+            self.store.put(JETBRAINS_NS, file_key(item.payload), os.path.basename(item.url))
+
+    def restore_item(self, record: Dict) -> Optional[WorkItem]:
+        if self.store.get(JETBRAINS_NS, file_key(record["payload"])):
+            return None
+        return super().restore_item(record)
+
+    def finish(self) -> None:
+        # 每个产品从旧到新推进水位线，遇到未完整镜像的版本即停止，保证水位线单调推进
+        for code in self.product_codes:
+            product_versions = [item for item in self._versions if item["product_code"] == code]
+            for build in sorted({item["build"] for item in product_versions}, key=build_key):
+                items = [item for item in product_versions if item["build"] == build]
+                if not all(self.store.get(JETBRAINS_NS, file_key(item)) for item in items):
+                    break
+                self.store.put(JETBRAINS_NS, watermark_key(code), build)
+                print(f"🎉 {product_name(code)} build {build} 已完整镜像")
+
+
+def print_jetbrains_versions(versions):
     """格式化输出版本信息"""
     if not versions:
-        print("未获取到 PyCharm 专业版版本信息")
         return
 
-    # 按版本分组输出（避免重复版本号多次显示）
+    # 按产品与版本分组输出（避免重复版本号多次显示）
     current_version = None
 
     for item in versions:
-        if item["version"] != current_version:
-            current_version = item["version"]
-            print(f"\n=== 版本：{current_version}（发布时间：{item['release_date']}）===")
+        if (item["product_code"], item["version"]) != current_version:
+            current_version = item["product_code"], item["version"]
+            print(f"\n=== {product_name(item['product_code'])} 版本：{item['version']}"
+                  f"（build {item['build']}，发布时间：{item['release_date']}）===")
 
-
-        download_file(f"{item['download_url']}",f"./download/Pycharm/{current_version}/")
         print(f"  {item['os_type']}: {item['download_url']}")
 
 
 if __name__ == "__main__":
-    print("正在获取 PyCharm 专业版所有版本及下载地址...")
-    pycharm_versions = get_pycharm_professional_versions()
-    print_pycharm_versions(pycharm_versions)
\ No newline at end of file
+    from model.orchestrator import run_sources
+
+    print(f"正在检查 JetBrains 更新：{', '.join(product_name(code) for code in PRODUCT_CODES)}...")
+    run_sources([JetBrainsSource.name])
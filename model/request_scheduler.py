@@ -0,0 +1,183 @@
+import email.utils
+import random
+import threading
+import time
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlparse
+
+import requests
+
+from model.deadline import DEADLINE, TransferInterrupted
+
+RETRY_STATUS_CODES = {500, 502, 503, 504}  # 可重试的服务端瞬时错误
+MAX_RETRIES: int = 5  # 单个请求的最大重试次数
+BACKOFF_BASE: float = 1.0  # 指数退避基数（秒）
+BACKOFF_MAX: float = 60.0  # 单次退避的最长等待（秒）
+MAX_RATE_LIMIT_WAIT: float = 3900.0  # 触发限流后愿意等待的最长时间（秒），超过（或超过运行截止时间）则直接返回错误响应
+LOW_REMAINING_THRESHOLD: int = 10  # 剩余额度低于该值时，把剩余请求均匀分布到重置时间之前
+
+# 各主机的令牌桶配置：(每秒补充的令牌数, 桶容量)
+HOST_RATES: Dict[str, Tuple[float, int]] = {
+    "api.github.com": (5.0, 10),
+    "data.services.jetbrains.com": (2.0, 4),
+    "www.voidtools.com": (2.0, 4),
+}
+DEFAULT_RATE: Tuple[float, int] = (10.0, 20)
+
+
+class TokenBucket:
+    """令牌桶：按固定速率补充令牌，取不到令牌时阻塞等待"""
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """取一个令牌，返回等待的秒数"""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return waited
+                delay = (1 - self._tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+
+class _HostState:
+    def __init__(self, rate: float, capacity: int):
+        self.bucket = TokenBucket(rate, capacity)
+        self.remaining: Optional[int] = None  # 服务端告知的剩余额度（X-RateLimit-Remaining）
+        self.reset_at: float = 0.0  # 额度重置的时间戳（X-RateLimit-Reset，墙上时间）
+        self.blocked_until: float = 0.0  # 因限流/Retry-After暂停该主机请求直到此时间（墙上时间）
+        self.lock = threading.Lock()
+
+
+class RequestScheduler:
+    """
+    按主机调度请求：令牌桶平滑请求速率，并根据每个响应的X-RateLimit-Remaining、
+    X-RateLimit-Reset与Retry-After延后请求，而不是让请求因限流失败；
+    只有被限流的主机会等待，其他主机上的请求（其他线程）照常进行。
+    设置了运行截止时间（DEADLINE）时，等待不会越过截止时间：需要等到截止时间之后的请求不再等待，
+    发送前的等待抛出 TransferInterrupted，限流响应直接返回给调用方。
+    """
+
+    def __init__(self):
+        self._hosts: Dict[str, _HostState] = {}
+        self._lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self.retries = 0  # 本次运行的重试次数
+        self.waited_seconds = 0.0  # 本次运行因限流/退避累计等待的秒数
+
+    def _host(self, url: str) -> _HostState:
+        host = urlparse(url).netloc.lower()
+        with self._lock:
+            if host not in self._hosts:
+                rate, capacity = HOST_RATES.get(host, DEFAULT_RATE)
+                self._hosts[host] = _HostState(rate, capacity)
+            return self._hosts[host]
+
+    @staticmethod
+    def _check_deadline(url: str, seconds: float) -> None:
+        """等待 seconds 秒会越过运行截止时间时抛出 TransferInterrupted（不再等待）"""
+        remaining = DEADLINE.remaining()
+        if remaining is not None and seconds >= remaining:
+            raise TransferInterrupted(
+                f"{urlparse(url).netloc} 需要等待 {seconds:.1f} 秒，超过运行截止时间（剩余 {max(0.0, remaining):.1f} 秒）"
+            )
+
+    def _sleep(self, seconds: float) -> None:
+        if seconds <= 0:
+            return
+        remaining = DEADLINE.remaining()
+        if remaining is not None:
+            seconds = min(seconds, max(0.0, remaining))
+        time.sleep(seconds)
+        with self._stats_lock:
+            self.waited_seconds += seconds
+
+    def before_request(self, url: str) -> None:
+        """发送请求前调用：等待主机解除限流、按剩余额度均匀分配，并从令牌桶取令牌"""
+        state = self._host(url)
+        with state.lock:
+            now = time.time()
+            delay = max(0.0, state.blocked_until - now)
+            if state.remaining is not None and state.reset_at > now:
+                if state.remaining <= 0:
+                    delay = max(delay, state.reset_at - now + 1)
+                elif state.remaining < LOW_REMAINING_THRESHOLD:
+                    delay = max(delay, (state.reset_at - now) / state.remaining)
+                state.remaining -= 1  # 乐观扣减，避免并发线程同时用掉最后的额度
+        delay = min(delay, MAX_RATE_LIMIT_WAIT)
+        if delay > 0:
+            self._check_deadline(url, delay)
+            print(f"  ⏳ {urlparse(url).netloc} 接近速率限制，等待 {delay:.1f} 秒")
+        self._sleep(delay)
+        waited = state.bucket.acquire()
+        with self._stats_lock:
+            self.waited_seconds += waited
+
+    def after_response(self, url: str, response: requests.Response) -> Optional[float]:
+        """
+        收到响应后调用：记录限流头，并判断是否需要重试
+        :return: 需要重试时返回等待秒数，否则返回None
+        """
+        state = self._host(url)
+        headers = response.headers
+        retry_after = _parse_retry_after(headers.get("Retry-After"))
+        with state.lock:
+            if headers.get("X-RateLimit-Remaining") is not None:
+                state.remaining = int(headers["X-RateLimit-Remaining"])
+            if headers.get("X-RateLimit-Reset") is not None:
+                state.reset_at = float(headers["X-RateLimit-Reset"])
+
+            rate_limited = response.status_code == 429 or (
+                response.status_code == 403 and (retry_after is not None or state.remaining == 0)
+            )
+            if rate_limited:
+                if retry_after is None:
+                    retry_after = max(0.0, state.reset_at - time.time()) + 1 if state.remaining == 0 else BACKOFF_BASE
+                remaining = DEADLINE.remaining()
+                if retry_after > MAX_RATE_LIMIT_WAIT or remaining is not None and retry_after >= remaining:
+                    return None
+                state.blocked_until = max(state.blocked_until, time.time() + retry_after)
+                return retry_after
+        if response.status_code in RETRY_STATUS_CODES:
+            return retry_after
+        return None
+
+    def backoff_delay(self, attempt: int) -> float:
+        """带抖动的指数退避（full jitter）"""
+        return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * (2 ** attempt)))
+
+    def wait_before_retry(self, url: str, attempt: int, reason: str, delay: Optional[float] = None) -> None:
+        """记录一次重试并等待（delay为None时使用指数退避），等待会越过运行截止时间时抛出 TransferInterrupted"""
+        if delay is None:
+            delay = self.backoff_delay(attempt)
+        self._check_deadline(url, delay)
+        with self._stats_lock:
+            self.retries += 1
+        print(f"  🔁 {urlparse(url).netloc} {reason}，{delay:.1f} 秒后第 {attempt + 1} 次重试")
+        self._sleep(delay)
+
+    def report(self) -> str:
+        return f"请求重试：{self.retries} 次，限流/退避等待：{self.waited_seconds:.1f} 秒"
+
+
+def _parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """解析Retry-After（秒数或HTTP日期）"""
+    if not value:
+        return None
+    if value.strip().isdigit():
+        return float(value)
+    try:
+        return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
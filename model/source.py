@@ -0,0 +1,68 @@
+from abc import ABC, abstractmethod
+from dataclasses import asdict, dataclass, field
+from typing import Any, Callable, Dict, Optional
+
+from model.state_store import StateStore
+
+
+@dataclass
+class WorkItem:
+    """一个待下载的文件（由数据源在探测阶段产生，交给共享的下载线程池执行）"""
+    source: str  # 数据源名称
+    key: str  # 在数据源内唯一的标识（用于日志与报告）
+    url: str  # 下载地址
+    size: Optional[int] = None  # 已知的文件大小（字节）
+    label: str = ""  # 便于阅读的描述
+    group: str = ""  # 指标汇总的分组（仓库、产品版本）
+    payload: Dict[str, Any] = field(default_factory=dict)  # 数据源自己的上下文（附件信息、保存目录等）
+    released_at: Optional[str] = None  # 所属版本的发布时间（ISO 8601），用于最新版本优先的调度
+    priority: float = 1.0  # 调度权重（仓库在YAML中配置的 priority）
+    local_path: Optional[str] = None  # 下载完成后的本地文件（启用上传阶段时上传后删除）
+    upload_path: Optional[str] = None  # 在上传目标中的相对路径
+    sha256: Optional[str] = None  # 已校验的内容摘要（上传阶段据此对本次运行中相同内容的文件建立远端硬链接）
+    blob_path: Optional[str] = None  # local_path 背后的内容寻址文件（上传后没有其他链接时删除，之后才释放磁盘额度）
+
+
+class Source(ABC):
+    """
+    可插拔的数据源接口：
+    - probe：探测上游版本并枚举需要下载的文件，每发现一个就调用 submit 投递（投递后立即开始下载）
+    - download：下载并校验单个文件，返回是否成功
+    - complete：单个文件结束后记录状态（在下载线程中调用）
+    - finish：所有文件结束后收尾（如推进水位线、更新版本记录）
+    - checkpoint_item / restore_item：把到达截止时间仍未完成的文件保存到状态目录，下次运行在探测前恢复
+    计划模式下只调用 probe，且 dry_run 为True：探测时不能产生副作用（写README、建目录等）
+    """
+
+    name: str = ""
+
+    def __init__(self):
+        self.store: Optional[StateStore] = None
+        self.dry_run = False
+
+    def open(self, store: StateStore) -> None:
+        """绑定共享的状态库"""
+        self.store = store
+
+    @abstractmethod
+    def probe(self, submit: Callable[[WorkItem], bool]) -> None:
+        """submit 返回是否已投递（与上次运行顺延的文件重复时返回False）"""
+        ...
+
+    @abstractmethod
+    def download(self, item: WorkItem) -> bool:
+        ...
+
+    def complete(self, item: WorkItem, ok: bool) -> None:
+        pass
+
+    def finish(self) -> None:
+        pass
+
+    def checkpoint_item(self, item: WorkItem) -> Dict[str, Any]:
+        """把未完成的文件转为可JSON序列化的记录（payload 不可序列化的数据源需要覆盖）"""
+        return asdict(item)
+
+    def restore_item(self, record: Dict[str, Any]) -> Optional[WorkItem]:
+        """从记录恢复文件，已经完成或不再需要时返回None"""
+        return WorkItem(**record)
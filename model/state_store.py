@@ -0,0 +1,186 @@
+import json
+import os
+import threading
+from typing import Any, Dict, Hashable, Iterator, Optional, Tuple
+
+from model.file_writer import write_if_changed
+from model.metrics import METRICS
+
+# 日志中的冗余记录（被覆盖/删除的旧值）超过该数量且超过有效记录数时触发压缩
+COMPACT_MIN_STALE_RECORDS: int = 1000
+
+STATE_FILE: str = "./repo_states/downloaded_assets.jsonl"  # 所有数据源共用的状态日志
+LEGACY_STATE_FILE: str = "./repo_states/downloaded_assets.json"  # 旧版状态文件（首次运行时导入）
+
+ASSETS_NS = "assets"  # 已下载附件：key=[state_key, asset_id]，value=附件名
+
+
+class StateStore:
+    """
+    追加写日志（JSON Lines）形式的状态库，替代每次整体重写的downloaded_assets.json：
+    - 每条变更追加一行并fsync，写入开销与变更数量成正比，而不是与历史总量成正比
+    - 加载时在内存中按 (命名空间, 键) 建立索引，例如 (state_key, asset_id)
+    - 写入中途崩溃最多留下末尾一行残缺记录，加载时丢弃并截断，无需回退到.bak
+    - 冗余记录过多时通过临时文件 + os.replace 原子压缩为快照
+    """
+
+    def __init__(self, journal_path: str, legacy_json: Optional[str] = None):
+        """
+        打开（或创建）状态库
+        :param journal_path: 日志文件路径
+        :param legacy_json: 旧版downloaded_assets.json路径，日志不存在时自动导入
+        """
+        self.journal_path = journal_path
+        self._lock = threading.RLock()
+        self._data: Dict[str, Dict[Hashable, Any]] = {}
+        self._record_count = 0  # 日志中的记录行数（含冗余记录）
+        os.makedirs(os.path.dirname(os.path.abspath(journal_path)), exist_ok=True)
+
+        if os.path.exists(journal_path):
+            self._replay()
+        elif legacy_json and os.path.exists(legacy_json):
+            imported = self.import_legacy_json(legacy_json)
+            print(f"ℹ️  已从 {os.path.basename(legacy_json)} 导入 {imported} 条下载记录")
+        self._file = open(journal_path, "a", encoding="utf-8")
+
+    # ------------------- 日志读写 -------------------
+    @staticmethod
+    def _encode_key(key: Hashable) -> Any:
+        return list(key) if isinstance(key, tuple) else key
+
+    @staticmethod
+    def _decode_key(key: Any) -> Hashable:
+        return tuple(key) if isinstance(key, list) else key
+
+    def _apply(self, record: Dict[str, Any]) -> None:
+        namespace = self._data.setdefault(record["ns"], {})
+        key = self._decode_key(record["key"])
+        if record["op"] == "put":
+            namespace[key] = record["value"]
+        else:
+            namespace.pop(key, None)
+
+    def _replay(self) -> None:
+        """重放日志；遇到残缺的末尾记录（写入中途崩溃）时截断到最后一条完整记录"""
+        with METRICS.timer("state_io_seconds", op="load"):
+            self._replay_journal()
+
+    def _replay_journal(self) -> None:
+        valid_length = 0
+        with open(self.journal_path, "rb") as f:
+            for raw_line in f:
+                if not raw_line.endswith(b"\n"):
+                    break
+                try:
+                    record = json.loads(raw_line.decode("utf-8"))
+                    self._apply(record)
+                except (UnicodeDecodeError, json.JSONDecodeError, KeyError, TypeError):
+                    break
+                valid_length += len(raw_line)
+                self._record_count += 1
+        if valid_length != os.path.getsize(self.journal_path):
+            print(f"⚠️  状态日志末尾存在残缺记录，已截断至最后一条完整记录")
+            with open(self.journal_path, "r+b") as f:
+                f.truncate(valid_length)
+
+    def _append(self, record: Dict[str, Any]) -> None:
+        with METRICS.timer("state_io_seconds", op="append"):
+            self._file.write(json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n")
+            self._file.flush()
+            os.fsync(self._file.fileno())
+        self._record_count += 1
+
+    # ------------------- 通用键值接口 -------------------
+    def get(self, ns: str, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            return self._data.get(ns, {}).get(key, default)
+
+    def put(self, ns: str, key: Hashable, value: Any) -> None:
+        """写入一条记录并立即提交（值未变化时不写日志）"""
+        with self._lock:
+            namespace = self._data.setdefault(ns, {})
+            if key in namespace and namespace[key] == value:
+                return
+            record = {"op": "put", "ns": ns, "key": self._encode_key(key), "value": value}
+            self._append(record)
+            self._apply(record)
+
+    def delete(self, ns: str, key: Hashable) -> None:
+        with self._lock:
+            if key not in self._data.get(ns, {}):
+                return
+            record = {"op": "del", "ns": ns, "key": self._encode_key(key)}
+            self._append(record)
+            self._apply(record)
+
+    def items(self, ns: str) -> Iterator[Tuple[Hashable, Any]]:
+        """返回命名空间内所有记录的快照"""
+        with self._lock:
+            return iter(list(self._data.get(ns, {}).items()))
+
+    # ------------------- 已下载附件 -------------------
+    def is_downloaded(self, state_key: str, asset_id: int) -> bool:
+        with self._lock:
+            return (state_key, asset_id) in self._data.get(ASSETS_NS, {})
+
+    def mark_downloaded(self, state_key: str, asset_id: int, asset_name: str) -> None:
+        self.put(ASSETS_NS, (state_key, asset_id), asset_name)
+
+    def repo_assets(self, state_key: str) -> Dict[int, str]:
+        """返回某个仓库已下载的 {asset_id: asset_name}"""
+        with self._lock:
+            return {
+                asset_id: asset_name
+                for (key, asset_id), asset_name in self._data.get(ASSETS_NS, {}).items()
+                if key == state_key
+            }
+
+    def import_legacy_json(self, legacy_json: str) -> int:
+        """导入旧版 {state_key: {asset_id: asset_name}} 状态文件，返回导入的记录数"""
+        with open(legacy_json, "r", encoding="utf-8") as f:
+            legacy_state = json.load(f)
+        with self._lock:
+            namespace = self._data.setdefault(ASSETS_NS, {})
+            for state_key, repo_state in legacy_state.items():
+                for asset_id, asset_name in repo_state.items():
+                    namespace[(state_key, int(asset_id))] = asset_name
+            self.compact()
+            return len(namespace)
+
+    # ------------------- 压缩与关闭 -------------------
+    def compact(self) -> None:
+        """把当前内存快照写入临时文件后原子替换日志（按键排序，便于git diff）"""
+        with self._lock, METRICS.timer("state_io_seconds", op="compact"):
+            lines = []
+            for ns in sorted(self._data):
+                for key in sorted(self._data[ns], key=lambda k: json.dumps(self._encode_key(k))):
+                    record = {"op": "put", "ns": ns, "key": self._encode_key(key), "value": self._data[ns][key]}
+                    lines.append(json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n")
+            file = getattr(self, "_file", None)
+            if file:
+                file.close()
+            # 快照与现有日志相同（例如导入后无变化）时不重写，保留mtime
+            write_if_changed(self.journal_path, "".join(lines))
+            self._record_count = len(lines)
+            if file:
+                self._file = open(self.journal_path, "a", encoding="utf-8")
+
+    def maybe_compact(self) -> bool:
+        """冗余记录过多时压缩日志，返回是否执行了压缩"""
+        with self._lock:
+            live_count = sum(len(namespace) for namespace in self._data.values())
+            stale_count = self._record_count - live_count
+            if stale_count >= COMPACT_MIN_STALE_RECORDS and stale_count > live_count:
+                self.compact()
+                return True
+            return False
+
+    def close(self) -> None:
+        with self._lock:
+            self.maybe_compact()
+            self._file.close()
+
+
+def open_state_store() -> StateStore:
+    """打开所有数据源共用的状态库（旧版JSON状态文件会在首次运行时导入）"""
+    return StateStore(STATE_FILE, legacy_json=LEGACY_STATE_FILE)
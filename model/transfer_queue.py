@@ -0,0 +1,98 @@
+import heapq
+import itertools
+import threading
+from datetime import datetime
+from typing import Callable, List, Optional, Tuple
+
+from model.deadline import DEADLINE
+from model.source import Source, WorkItem
+
+# 调度策略：
+# - fifo：按探测到的顺序
+# - newest：所属版本发布时间从新到旧（同一版本内小文件优先）
+# - smallest：文件从小到大（最短作业优先，固定时间窗口内完成的文件数最多）
+# - weighted：文件大小除以仓库权重（YAML中的 priority）从小到大，权重高的仓库与小文件优先
+POLICIES = ("fifo", "newest", "smallest", "weighted")
+DEFAULT_POLICY: str = "weighted"  # 所有权重相同时等价于 smallest
+
+
+def _timestamp(released_at: Optional[str]) -> float:
+    """ISO 8601 时间（或日期）转为时间戳，无法解析时视为最早"""
+    if not released_at:
+        return 0.0
+    try:
+        return datetime.fromisoformat(released_at.replace("Z", "+00:00")).timestamp()
+    except ValueError:
+        return 0.0
+
+
+def policy_key(policy: str, size: Optional[int], released_at: Optional[str] = None,
+               priority: float = 1.0) -> Tuple[float, ...]:
+    """计算排序键（越小越先下载），大小未知的文件排在已知大小的文件之后"""
+    size_key = float(size) if size is not None else float("inf")
+    if policy == "fifo":
+        return ()
+    if policy == "newest":
+        return -_timestamp(released_at), size_key
+    if policy == "smallest":
+        return (size_key,)
+    if policy == "weighted":
+        return (size_key / max(priority, 1e-6),)
+    raise ValueError(f"未知的调度策略：{policy}（可选：{', '.join(POLICIES)}）")
+
+
+class TransferQueue:
+    """
+    按策略排序的下载队列：探测阶段陆续投递文件，下载线程每次取出队列中排序最靠前的文件；
+    相同排序键按投递顺序，上次运行顺延的文件（resumed）排在所有新文件之前。
+    接近运行截止时间时下载线程不再取出新文件，剩余文件由 close 返回
+    """
+
+    def __init__(self, handler: Callable[[Source, WorkItem], None], workers: int, policy: str = DEFAULT_POLICY):
+        policy_key(policy, None)  # 提前校验策略名
+        self.handler = handler
+        self.policy = policy
+        self._heap: List[Tuple[Tuple[float, ...], int, Source, WorkItem]] = []
+        self._sequence = itertools.count()
+        self._cond = threading.Condition()
+        self._closed = False
+        self._threads = [
+            threading.Thread(target=self._worker, name=f"download-{index}", daemon=True)
+            for index in range(max(1, workers))
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def put(self, source: Source, item: WorkItem, resumed: bool = False) -> None:
+        key = (0 if resumed else 1,) + policy_key(self.policy, item.size, item.released_at, item.priority)
+        with self._cond:
+            heapq.heappush(self._heap, (key, next(self._sequence), source, item))
+            self._cond.notify()
+
+    def _worker(self) -> None:
+        while True:
+            with self._cond:
+                while not self._heap and not self._closed:
+                    self._cond.wait()
+                if not self._heap or not DEADLINE.accepting():
+                    return
+                _, _, source, item = heapq.heappop(self._heap)
+            try:
+                self.handler(source, item)
+            except Exception as e:
+                print(f"  ❌ [{source.name}] {item.label or item.key} 处理异常：{str(e)}")
+
+    def close(self) -> List[Tuple[Source, WorkItem]]:
+        """
+        不再投递新文件，等待下载线程结束
+        :return: 因到达截止时间而没有开始的文件（按原顺序）
+        """
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        for thread in self._threads:
+            thread.join()
+        with self._cond:
+            remaining = [(source, item) for _, _, source, item in sorted(self._heap, key=lambda entry: entry[:2])]
+            self._heap.clear()
+        return remaining
@@ -0,0 +1,286 @@
+import os
+import queue
+import shlex
+import shutil
+import subprocess
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional, Tuple
+
+from model.metrics import METRICS
+from model.progress import format_bytes
+
+UPLOAD_WORKERS: int = 2  # 上传线程数
+UPLOAD_RETRIES: int = 3  # 单个文件的上传重试次数
+UPLOAD_RETRY_DELAY: float = 5.0  # 重试基础间隔（秒），按次数递增
+DISK_BUDGET_MB: int = int(os.environ.get("DISK_BUDGET_MB", "0"))  # 未上传文件的磁盘预算（MB），0 表示不限制
+RSYNC_TIMEOUT: int = 3600  # 单次rsync的超时（秒）
+
+
+# ------------------- 上传目标 -------------------
+class UploadSink(ABC):
+    """上传目标：upload 成功返回即视为远端已确认收到完整文件，失败时抛出异常"""
+
+    name: str = ""
+
+    @abstractmethod
+    def upload(self, local_path: str, relative_path: str) -> None:
+        ...
+
+    def link(self, existing_path: str, relative_path: str) -> bool:
+        """在远端用已上传的相同内容建立硬链接（不传输数据），不支持或失败时返回False（改为完整上传）"""
+        return False
+
+
+class LocalDirSink(UploadSink):
+    """复制到本地目录（挂载盘、NAS或测试用）：先写临时文件并fsync，核对大小后原子替换"""
+
+    name = "local"
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def upload(self, local_path: str, relative_path: str) -> None:
+        target_path = os.path.join(self.root, relative_path)
+        os.makedirs(os.path.dirname(target_path) or ".", exist_ok=True)
+        tmp_path = f"{target_path}.uploading"
+        with open(local_path, "rb") as src, open(tmp_path, "wb") as dst:
+            shutil.copyfileobj(src, dst, 1024 * 1024)
+            dst.flush()
+            os.fsync(dst.fileno())
+        if os.path.getsize(tmp_path) != os.path.getsize(local_path):
+            os.remove(tmp_path)
+            raise IOError(f"复制后大小不一致：{target_path}")
+        os.replace(tmp_path, target_path)
+
+    def link(self, existing_path: str, relative_path: str) -> bool:
+        target_path = os.path.join(self.root, relative_path)
+        os.makedirs(os.path.dirname(target_path) or ".", exist_ok=True)
+        tmp_path = f"{target_path}.uploading"
+        try:
+            os.link(os.path.join(self.root, existing_path), tmp_path)
+        except OSError:
+            return False
+        os.replace(tmp_path, target_path)
+        return True
+
+
+class RsyncSink(UploadSink):
+    """通过 rsync over ssh 上传到远程目录（rsync 退出码为0即视为确认）"""
+
+    name = "rsync"
+
+    def __init__(self, target: str, port: int = 22):
+        self.target = target.rstrip("/")  # 形如 user@host:/remote/path
+        self.port = port
+
+    def upload(self, local_path: str, relative_path: str) -> None:
+        command = [
+            "rsync", "-a", "--partial", "--mkpath",
+            "-e", f"ssh -p {self.port} -o BatchMode=yes",
+            local_path, f"{self.target}/{relative_path.replace(os.sep, '/')}",
+        ]
+        completed = subprocess.run(command, capture_output=True, text=True, timeout=RSYNC_TIMEOUT)
+        if completed.returncode != 0:
+            raise IOError(f"rsync 退出码 {completed.returncode}：{completed.stderr.strip()[-500:]}")
+
+    def link(self, existing_path: str, relative_path: str) -> bool:
+        """通过ssh在远端执行 ln（只允许rsync的受限账号会失败，此时改为完整上传）"""
+        host, separator, root = self.target.partition(":")
+        if not separator:
+            return False  # 本地路径形式的目标
+        existing = shlex.quote(f"{root}/{existing_path.replace(os.sep, '/')}")
+        target = shlex.quote(f"{root}/{relative_path.replace(os.sep, '/')}")
+        command = [
+            "ssh", "-p", str(self.port), "-o", "BatchMode=yes", host,
+            f"mkdir -p \"$(dirname {target})\" && ln -f {existing} {target}",
+        ]
+        try:
+            completed = subprocess.run(command, capture_output=True, text=True, timeout=RSYNC_TIMEOUT)
+        except (OSError, subprocess.TimeoutExpired):
+            return False
+        return completed.returncode == 0
+
+
+def make_sink(upload_dir: Optional[str] = None, rsync_target: Optional[str] = None,
+              ssh_port: int = 22) -> Optional[UploadSink]:
+    """根据命令行参数创建上传目标，均未指定时返回None（不启用上传阶段）"""
+    if upload_dir and rsync_target:
+        raise ValueError("--upload-dir 与 --upload-rsync 只能指定一个")
+    if upload_dir:
+        return LocalDirSink(upload_dir)
+    if rsync_target:
+        return RsyncSink(rsync_target, ssh_port)
+    return None
+
+
+# ------------------- 上传阶段 -------------------
+class UploadStage:
+    """
+    下载流水线的上传阶段：文件下载并校验完成后立即入队，由上传线程推送到目标，
+    远端确认后删除本地文件；上传失败的文件保留在本地（由下次运行或工作流中的rsync兜底）。
+    磁盘预算：下载开始前调用 reserve 占用额度，已占用（下载中+等待上传）的字节数超过预算时阻塞，
+    从而在上传跟不上时暂停新的下载。
+    内容去重：提交时附带SHA-256的文件，若相同内容本次运行中已上传过，则在远端对已上传的文件建立硬链接
+    （各版本目录中的GitHub附件都是blob的硬链接，逐个rsync时无法保留这一关系），目标不支持时仍完整上传。
+    内容寻址存储：提交时附带 blob_path 的文件，数据实际保存在blob中，删除本地硬链接并不释放磁盘；
+    本次运行中引用同一blob的文件全部上传结束后，blob已没有其他链接时删除它，之后才释放这些文件占用的额度
+    """
+
+    def __init__(self, sink: UploadSink, disk_budget_bytes: int = DISK_BUDGET_MB * 1024 * 1024,
+                 workers: int = UPLOAD_WORKERS, delete_after_upload: bool = True):
+        self.sink = sink
+        self.disk_budget_bytes = disk_budget_bytes
+        self.delete_after_upload = delete_after_upload
+        self._queue: "queue.Queue[Optional[Tuple[str, str, int, Optional[str], Optional[str]]]]" = queue.Queue()
+        self._cond = threading.Condition()
+        self._pending_bytes = 0  # 已占用额度：下载中 + 等待/正在上传
+        self.peak_pending_bytes = 0
+        self.wait_seconds = 0.0
+        self.uploaded = 0
+        self.uploaded_bytes = 0
+        self.linked = 0  # 在远端硬链接（未传输数据）的文件数
+        self.failed: List[str] = []
+        self._uploaded_digests: Dict[str, str] = {}  # 本次运行已上传的 SHA-256 -> 远端相对路径
+        self._blob_refs: Dict[str, int] = {}  # blob路径 -> 尚未上传结束的引用文件数
+        self._blob_held: Dict[str, int] = {}  # blob路径 -> 已上传结束、等待blob删除后释放的额度
+        self._threads = [
+            threading.Thread(target=self._worker, name=f"upload-{index}", daemon=True)
+            for index in range(max(1, workers))
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    # ------------------- 磁盘预算 -------------------
+    def reserve(self, size: Optional[int]) -> int:
+        """为即将开始的下载占用额度，超出预算时阻塞（已无占用时总是放行，避免单个大文件死锁）"""
+        size = size or 0
+        with self._cond:
+            if self.disk_budget_bytes > 0:
+                started = time.monotonic()
+                while self._pending_bytes > 0 and self._pending_bytes + size > self.disk_budget_bytes:
+                    self._cond.wait()
+                waited = time.monotonic() - started
+                if waited > 0.01:
+                    self.wait_seconds += waited
+                    METRICS.observe("upload_backpressure_seconds", waited)
+            self._pending_bytes += size
+            self.peak_pending_bytes = max(self.peak_pending_bytes, self._pending_bytes)
+        return size
+
+    def release(self, size: int) -> None:
+        with self._cond:
+            self._pending_bytes -= size
+            self._cond.notify_all()
+
+    def _adjust(self, reserved: int, actual: int) -> None:
+        """下载完成后按实际大小修正占用额度（部分数据源事先不知道文件大小）"""
+        with self._cond:
+            self._pending_bytes += actual - reserved
+            self.peak_pending_bytes = max(self.peak_pending_bytes, self._pending_bytes)
+            self._cond.notify_all()
+
+    # ------------------- 上传 -------------------
+    def submit(self, local_path: str, relative_path: str, reserved: int = 0, sha256: Optional[str] = None,
+               blob_path: Optional[str] = None) -> None:
+        """
+        文件下载完成后入队（额度随文件转交给上传线程，上传结束后释放）
+        :param sha256: 内容摘要，用于远端去重
+        :param blob_path: 本地文件背后的内容寻址文件（本地文件是它的硬链接），额度在它删除后才释放
+        """
+        size = os.path.getsize(local_path)
+        self._adjust(reserved, size)
+        if blob_path:
+            with self._cond:
+                self._blob_refs[blob_path] = self._blob_refs.get(blob_path, 0) + 1
+        self._queue.put((local_path, relative_path, size, sha256, blob_path))
+
+    def _worker(self) -> None:
+        while True:
+            task = self._queue.get()
+            if task is None:
+                return
+            local_path, relative_path, size, sha256, blob_path = task
+            try:
+                if not self._link(local_path, relative_path, sha256):
+                    self._upload(local_path, relative_path, size, sha256)
+            finally:
+                if blob_path:
+                    self._release_blob(blob_path, size)
+                else:
+                    self.release(size)
+
+    def _release_blob(self, blob_path: str, size: int) -> None:
+        """引用blob的文件上传结束：全部结束后删除已没有其他链接的blob，再释放这些文件的额度"""
+        with self._cond:
+            self._blob_refs[blob_path] -= 1
+            self._blob_held[blob_path] = self._blob_held.get(blob_path, 0) + size
+            if self._blob_refs[blob_path] > 0:
+                return
+            del self._blob_refs[blob_path]
+            held = self._blob_held.pop(blob_path)
+        if self.delete_after_upload:
+            try:
+                # 上传失败而保留的本地文件、以往版本目录中的文件仍链接着blob时不删除
+                if os.stat(blob_path).st_nlink <= 1:
+                    os.remove(blob_path)
+            except FileNotFoundError:
+                pass
+        self.release(held)
+
+    def _link(self, local_path: str, relative_path: str, sha256: Optional[str]) -> bool:
+        """相同内容本次运行已上传过时在远端建立硬链接，返回是否已完成"""
+        with self._cond:
+            existing_path = self._uploaded_digests.get(sha256) if sha256 else None
+        if existing_path is None or not self.sink.link(existing_path, relative_path):
+            return False
+        METRICS.inc("upload_linked_total", sink=self.sink.name)
+        with self._cond:
+            self.uploaded += 1
+            self.linked += 1
+        if self.delete_after_upload:
+            os.remove(local_path)
+        print(f"  🔗 已在远端链接：{relative_path}（与 {existing_path} 内容相同）")
+        return True
+
+    def _upload(self, local_path: str, relative_path: str, size: int, sha256: Optional[str] = None) -> None:
+        for attempt in range(1, UPLOAD_RETRIES + 1):
+            started = time.perf_counter()
+            try:
+                self.sink.upload(local_path, relative_path)
+            except Exception as e:
+                METRICS.inc("upload_errors_total", sink=self.sink.name)
+                if attempt == UPLOAD_RETRIES:
+                    self.failed.append(relative_path)
+                    print(f"  ❌ 上传失败（保留本地文件）：{relative_path} - {str(e)}")
+                    return
+                print(f"  ⚠️  上传失败，{UPLOAD_RETRY_DELAY * attempt:.0f}秒后重试（{attempt}/{UPLOAD_RETRIES}）："
+                      f"{relative_path} - {str(e)}")
+                time.sleep(UPLOAD_RETRY_DELAY * attempt)
+                continue
+            METRICS.observe("upload_seconds", time.perf_counter() - started, sink=self.sink.name)
+            METRICS.inc("upload_bytes_total", size, sink=self.sink.name)
+            with self._cond:
+                self.uploaded += 1
+                self.uploaded_bytes += size
+                if sha256:
+                    self._uploaded_digests.setdefault(sha256, relative_path)
+            if self.delete_after_upload:
+                os.remove(local_path)
+            print(f"  ☁️  已上传：{relative_path}（{format_bytes(size)}）")
+            return
+
+    def close(self) -> None:
+        """等待队列中的文件全部上传完毕后停止上传线程"""
+        for _ in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join()
+
+    def report(self) -> str:
+        budget = format_bytes(self.disk_budget_bytes) if self.disk_budget_bytes > 0 else "不限"
+        return (f"上传（{self.sink.name}）：成功 {self.uploaded} 个（传输 {format_bytes(self.uploaded_bytes)}，"
+                f"其中 {self.linked} 个为远端硬链接），"
+                f"失败 {len(self.failed)} 个，磁盘预算 {budget}，峰值占用 {format_bytes(self.peak_pending_bytes)}，"
+                f"因预算暂停下载 {self.wait_seconds:.1f} 秒")
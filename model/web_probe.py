@@ -0,0 +1,256 @@
+import os
+import re
+import time
+from contextlib import closing
+from functools import lru_cache
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+import requests
+
+from model import http_client
+from model.download import download_file
+from model.json_hander import JSONHandler
+from model.metrics import METRICS
+from model.source import Source, WorkItem
+
+# 项目根目录
+ROOT_PATH = Path(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+WEB_PROBES_FILE: str = str(ROOT_PATH / "web_probes.yaml")  # 网页版本探测配置
+SOFTWARE_JSON_PATH = ROOT_PATH / "software.json"  # 各软件已记录的版本号与下载链接
+DOWNLOAD_ROOT = ROOT_PATH / "download"  # 安装包按「download/软件名/版本号」保存
+PROBE_CHUNK_SIZE: int = 4 * 1024  # 流式解析时每次读取的字节数
+PROBE_MAX_BYTES: int = 2 * 1024 * 1024  # 单个页面最多读取的字节数（超出仍未匹配视为失败）
+LEGACY_SOFTWARE_NAME: str = "Everything"  # 旧版 voidtools 数据源的顺延记录没有软件名，对应的软件
+CHARSET_PATTERN = re.compile(r'charset\s*=\s*["\']?([\w.:-]+)', re.IGNORECASE)
+
+
+# ------------------- 配置 -------------------
+def load_probe_configs(config_file: str = WEB_PROBES_FILE) -> List[Dict]:
+    """
+    从YAML文件加载并校验网页版本探测配置
+    :param config_file: YAML配置文件路径
+    :return: 启用的探测配置列表
+    :raises FileNotFoundError: 配置文件不存在
+    :raises ValueError: 配置缺少必要字段或格式非法
+    """
+    import yaml  # 按需导入：只探测GitHub/JetBrains时不加载
+
+    if not os.path.exists(config_file):
+        raise FileNotFoundError(f"网页探测配置文件不存在：{os.path.abspath(config_file)}")
+    with open(config_file, "r", encoding="utf-8") as f:
+        config_data = yaml.safe_load(f) or {}
+    if not isinstance(config_data.get("probes"), list):
+        raise ValueError("网页探测配置文件必须包含『probes』字段，且值为探测配置列表")
+
+    required_fields = ["name", "url", "version_pattern", "url_template", "options"]
+    probes = []
+    for probe_idx, probe in enumerate(config_data["probes"], 1):
+        if not isinstance(probe, dict):
+            raise ValueError(f"第{probe_idx}个探测配置格式错误：必须为字典（键值对）")
+        missing_fields = [field for field in required_fields if field not in probe]
+        if missing_fields:
+            raise ValueError(f"第{probe_idx}个探测配置缺失必要字段：{', '.join(missing_fields)}")
+        if ("xpath" in probe) == ("css" in probe):
+            raise ValueError(f"探测『{probe['name']}』必须且只能指定 xpath 或 css 其中一个")
+        if not isinstance(probe["options"], list) or not probe["options"]:
+            raise ValueError(f"探测『{probe['name']}』的 options 必须为非空列表")
+        if "{version}" not in probe["url_template"]:
+            raise ValueError(f"探测『{probe['name']}』的 url_template 必须包含 {{version}}")
+        if not probe.get("enabled", True):
+            continue
+        # 提前编译，配置错误在探测之前暴露
+        compile_selector(*selector_of(probe))
+        compile_pattern(probe["version_pattern"])
+        probes.append(probe)
+    return probes
+
+
+def selector_of(probe: Dict) -> Tuple[str, str]:
+    """返回 (选择器类型, 表达式)"""
+    return ("xpath", probe["xpath"]) if "xpath" in probe else ("css", probe["css"])
+
+
+@lru_cache(maxsize=None)
+def compile_selector(kind: str, expression: str) -> Callable:
+    """编译并缓存选择器（CSS选择器依赖可选的 cssselect 包）"""
+    from lxml import etree  # 按需导入：只在解析网页时加载
+
+    if kind == "xpath":
+        return etree.XPath(expression)
+    try:
+        from lxml.cssselect import CSSSelector
+    except ImportError:
+        raise ValueError(f"CSS选择器『{expression}』需要安装 cssselect（pip install cssselect），或改用 xpath")
+    return CSSSelector(expression)
+
+
+@lru_cache(maxsize=None)
+def compile_pattern(pattern: str) -> "re.Pattern":
+    return re.compile(pattern)
+
+
+def download_urls(probe: Dict, version: str) -> Dict[str, str]:
+    """
+    按 url_template 生成各安装包的下载链接
+    :return: {software.json 中的键: 下载链接}，键由选项名中的 . 和 - 替换为 _ 得到
+    """
+    return {
+        option.replace(".", "_").replace("-", "_"): probe["url_template"].format(version=version, option=option)
+        for option in probe["options"]
+    }
+
+
+# ------------------- 流式解析 -------------------
+def header_encoding(response: requests.Response) -> Optional[str]:
+    """从 Content-Type 响应头取编码，未声明时返回None（由解析器按页面 meta 标签识别）"""
+    match = CHARSET_PATTERN.search(response.headers.get("Content-Type", ""))
+    return match.group(1) if match else None
+
+
+def _match_version(element, probe: Dict) -> Optional[str]:
+    attribute = probe.get("attribute")
+    text = element.get(attribute, "") if attribute else "".join(element.itertext())
+    version_match = compile_pattern(probe["version_pattern"]).search(text)
+    if not version_match:
+        return None
+    return version_match.group(1) if version_match.groups() else version_match.group()
+
+
+def probe_version(probe: Dict) -> Tuple[str, int]:
+    """
+    流式下载并增量解析页面，选择器命中的元素解析完整且匹配到版本号后立即停止读取
+    :param probe: 探测配置
+    :return: (版本号, 实际读取的字节数)
+    :raises ValueError: 页面中找不到匹配的元素或版本号
+    """
+    from lxml import etree  # 按需导入：只在解析网页时加载
+
+    selector = compile_selector(*selector_of(probe))
+    read_bytes = 0
+    with closing(http_client.get(probe["url"], stream=True)) as response:
+        response.raise_for_status()
+        parser = etree.HTMLPullParser(events=("end",), encoding=header_encoding(response))
+        for chunk in response.iter_content(PROBE_CHUNK_SIZE):
+            read_bytes += len(chunk)
+            parser.feed(chunk)
+            # 只检查本段数据中解析完整的元素：更早完成的元素已在之前的段中检查过
+            ended = {element for _, element in parser.read_events()}
+            if ended:
+                root = next(iter(ended)).getroottree().getroot()
+                for element in selector(root):
+                    if element in ended:
+                        version = _match_version(element, probe)
+                        if version:
+                            METRICS.inc("web_probe_bytes_total", read_bytes, probe=probe["name"])
+                            return version, read_bytes
+            if read_bytes >= PROBE_MAX_BYTES:
+                break
+        METRICS.inc("web_probe_bytes_total", read_bytes, probe=probe["name"])
+        # 页面读完（或超出上限）时补全未闭合的元素再检查一次
+        root = parser.close()
+        if root is not None:
+            for element in selector(root):
+                version = _match_version(element, probe)
+                if version:
+                    return version, read_bytes
+    kind, expression = selector_of(probe)
+    raise ValueError(f"未在页面中找到版本号（{kind}：{expression}，已读取 {read_bytes} 字节）")
+
+
+# ------------------- 数据源 -------------------
+def record_update(name: str, version: str, urls: Dict[str, str]) -> None:
+    """把新版本号、更新时间和下载链接写入 software.json"""
+    json_handler = JSONHandler(str(SOFTWARE_JSON_PATH))
+    # 三处修改合并为一次原子写入
+    with json_handler.transaction():
+        json_handler.set_version(name, version, "version")
+        json_handler.set_version(name, time.strftime('%Y-%m-%d %H:%M:%S', time.localtime()), "updateTime")
+        json_handler.update_url(name, urls)
+    print(f"{name} 更新下载链接成功")
+
+
+class WebProbeSource(Source):
+    """
+    网页版本探测数据源：按 web_probes.yaml 中的配置从官网页面解析最新版本号（voidtools Everything 等），
+    有更新时按 url_template 生成各安装包并投递到共享下载队列，
+    某个软件的安装包全部下载成功后才写入 software.json（失败时下次运行重试）
+    """
+
+    name = "web"
+
+    def __init__(self, config_file: str = WEB_PROBES_FILE):
+        super().__init__()
+        self.config_file = config_file
+        self._versions: Dict[str, str] = {}  # 本次检测到更新的 软件名 -> 新版本号
+        self._download_urls: Dict[str, Dict[str, str]] = {}
+        self._failed: set = set()  # 有安装包下载失败的软件名
+
+    def probe(self, submit: Callable[[WorkItem], bool]) -> None:
+        json_handler = JSONHandler(str(SOFTWARE_JSON_PATH))
+        errors = []
+        for probe in load_probe_configs(self.config_file):
+            name = probe["name"]
+            print("-" * 50)
+            try:
+                current_version, read_bytes = probe_version(probe)
+            except (requests.exceptions.RequestException, ValueError) as e:
+                # 单个网站失败不影响其他软件的探测
+                print(f"❌ {name} 获取版本号失败：{str(e)}")
+                errors.append(f"{name}：{str(e)}")
+                continue
+            print(f"🎉获取 {name} 网站信息成功（读取 {read_bytes / 1024:.1f}KB）")
+
+            stored_version = json_handler.read_version(name)
+            if current_version == stored_version:
+                print(f"😒{name} 无更新,当前版本：{stored_version}")
+                continue
+            print(f"🎉{name} 检查到更新,{stored_version}  -->  {current_version}")
+
+            self._versions[name] = current_version
+            self._download_urls[name] = download_urls(probe, current_version)
+            save_dir = DOWNLOAD_ROOT / name / current_version
+            for key, url in self._download_urls[name].items():
+                print(url)
+                submit(WorkItem(
+                    source=self.name,
+                    key=f"{name}/{key}",
+                    url=url,
+                    label=f"{name} {os.path.basename(url)}",
+                    group=f"{name} {current_version}",
+                    payload={"software": name, "save_dir": str(save_dir), "version": current_version},
+                ))
+        if errors:
+            raise Exception("；".join(errors))
+
+    def download(self, item: WorkItem) -> bool:
+        save_path = download_file(item.url, item.payload["save_dir"])
+        if save_path is None:
+            return False
+        item.size = os.path.getsize(save_path)  # 官网不提供文件大小，下载后补充用于统计
+        item.local_path = save_path
+        item.upload_path = os.path.relpath(save_path, DOWNLOAD_ROOT)
+        return True
+
+    def complete(self, item: WorkItem, ok: bool) -> None:
+        if not ok:
+            self._failed.add(item.payload["software"])
+
+    def restore_item(self, record: Dict) -> Optional[WorkItem]:
+        payload = record["payload"]
+        if "software" not in payload:
+            # 旧版 voidtools 数据源的记录：补全软件名，键改为「软件名/键」
+            payload["software"] = LEGACY_SOFTWARE_NAME
+            record = dict(record, key=f"{LEGACY_SOFTWARE_NAME}/{record['key']}")
+        # 顺延记录对应的版本已记录到 software.json 时说明已完整下载
+        if payload.get("version") == JSONHandler(str(SOFTWARE_JSON_PATH)).read_version(payload["software"]):
+            return None
+        return super().restore_item(record)
+
+    def finish(self) -> None:
+        for name, version in self._versions.items():
+            if name in self._failed:
+                print(f"⚠️  {name} {version} 有安装包下载失败，暂不更新版本记录，下次运行重试")
+                continue
+            record_update(name, version, self._download_urls[name])
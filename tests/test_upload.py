@@ -0,0 +1,142 @@
+import os
+import threading
+
+import pytest
+
+from model import upload
+from model.upload import LocalDirSink, UploadStage
+
+
+class FailingSink(LocalDirSink):
+    """总是上传失败的目标"""
+
+    name = "failing"
+
+    def upload(self, local_path: str, relative_path: str) -> None:
+        raise IOError("远端不可用")
+
+
+@pytest.fixture(autouse=True)
+def no_retry_delay(monkeypatch):
+    monkeypatch.setattr(upload, "UPLOAD_RETRY_DELAY", 0)
+
+
+def write_file(path, size):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(os.urandom(size))
+    return str(path)
+
+
+def test_upload_copies_and_deletes_local_file(tmp_path):
+    local_path = write_file(tmp_path / "download" / "a.bin", 1024)
+    with open(local_path, "rb") as f:
+        content = f.read()
+    stage = UploadStage(LocalDirSink(str(tmp_path / "remote")), disk_budget_bytes=0)
+
+    stage.submit(local_path, os.path.join("repo", "v1", "a.bin"))
+    stage.close()
+
+    target_path = tmp_path / "remote" / "repo" / "v1" / "a.bin"
+    assert target_path.read_bytes() == content
+    assert not os.path.exists(f"{target_path}.uploading")
+    assert not os.path.exists(local_path)
+    assert (stage.uploaded, stage.uploaded_bytes, stage.failed) == (1, 1024, [])
+
+
+def test_failed_upload_keeps_local_file(tmp_path):
+    local_path = write_file(tmp_path / "download" / "a.bin", 1024)
+    stage = UploadStage(FailingSink(str(tmp_path / "remote")), disk_budget_bytes=0)
+
+    stage.submit(local_path, "a.bin")
+    stage.close()
+
+    assert os.path.exists(local_path)
+    assert stage.uploaded == 0
+    assert stage.failed == ["a.bin"]
+
+
+def test_reserve_blocks_until_release(tmp_path):
+    stage = UploadStage(LocalDirSink(str(tmp_path / "remote")), disk_budget_bytes=1000)
+    first = stage.reserve(800)
+    reserved = threading.Event()
+
+    def reserve_second():
+        stage.reserve(400)
+        reserved.set()
+
+    thread = threading.Thread(target=reserve_second, daemon=True)
+    thread.start()
+    assert not reserved.wait(0.2)  # 800 + 400 超出预算，阻塞
+
+    stage.release(first)
+    assert reserved.wait(5)  # 释放后放行
+    thread.join(5)
+    assert stage.peak_pending_bytes == 800
+    stage.close()
+
+
+def test_reserve_over_budget_passes_when_nothing_pending(tmp_path):
+    stage = UploadStage(LocalDirSink(str(tmp_path / "remote")), disk_budget_bytes=1000)
+    assert stage.reserve(5000) == 5000  # 单个文件超出预算时不死锁
+    stage.release(5000)
+    stage.close()
+
+
+def test_same_digest_is_linked_on_remote(tmp_path):
+    first_path = write_file(tmp_path / "download" / "v1" / "a.bin", 2048)
+    second_path = str(tmp_path / "download" / "v2" / "a.bin")
+    os.makedirs(os.path.dirname(second_path))
+    os.link(first_path, second_path)  # 版本目录中的文件都是同一个blob的硬链接
+    stage = UploadStage(LocalDirSink(str(tmp_path / "remote")), disk_budget_bytes=0, workers=1)
+
+    stage.submit(first_path, os.path.join("v1", "a.bin"), sha256="ab" * 32)
+    stage.submit(second_path, os.path.join("v2", "a.bin"), sha256="ab" * 32)
+    stage.close()
+
+    first_target = os.stat(tmp_path / "remote" / "v1" / "a.bin")
+    second_target = os.stat(tmp_path / "remote" / "v2" / "a.bin")
+    assert first_target.st_ino == second_target.st_ino
+    assert (stage.uploaded, stage.linked, stage.uploaded_bytes) == (2, 1, 2048)
+    assert not os.path.exists(first_path) and not os.path.exists(second_path)
+
+
+def test_blob_removed_before_budget_released(tmp_path):
+    blob_path = write_file(tmp_path / "blobs" / "ab" / ("ab" * 32), 1024)
+    first_path = str(tmp_path / "download" / "v1" / "a.bin")
+    second_path = str(tmp_path / "download" / "v2" / "a.bin")
+    for path in (first_path, second_path):
+        os.makedirs(os.path.dirname(path))
+        os.link(blob_path, path)
+    stage = UploadStage(LocalDirSink(str(tmp_path / "remote")), disk_budget_bytes=4096, workers=1)
+    releases = []
+    release = stage.release
+
+    def record_release(size):
+        releases.append((size, os.path.exists(blob_path)))
+        release(size)
+
+    stage.release = record_release
+    stage.submit(first_path, os.path.join("v1", "a.bin"), stage.reserve(1024), blob_path=blob_path)
+    stage.submit(second_path, os.path.join("v2", "a.bin"), stage.reserve(1024), blob_path=blob_path)
+    stage.close()
+
+    assert not os.path.exists(blob_path)
+    assert releases == [(2048, False)]  # 两个文件都上传后删除blob，再一次性释放额度
+    assert stage._pending_bytes == 0
+
+
+def test_blob_kept_while_other_links_remain(tmp_path):
+    blob_path = write_file(tmp_path / "blobs" / "ab" / ("ab" * 32), 1024)
+    local_path = str(tmp_path / "download" / "v1" / "a.bin")
+    os.makedirs(os.path.dirname(local_path))
+    os.link(blob_path, local_path)
+    os.link(blob_path, str(tmp_path / "download" / "v1" / "old.bin"))  # 以往版本目录中的链接
+    stage = UploadStage(LocalDirSink(str(tmp_path / "remote")), disk_budget_bytes=0)
+
+    stage.submit(local_path, "a.bin", blob_path=blob_path)
+    stage.close()
+
+    assert os.path.exists(blob_path)
+    assert not os.path.exists(local_path)
+    assert stage._pending_bytes == 0